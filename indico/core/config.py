@@ -43,6 +43,8 @@ DEFAULTS = {
     'BASE_URL': None,
     'CACHE_BACKEND': 'files',
     'CACHE_DIR': '/opt/indico/cache',
+    'CACHE_LOCAL_SIZE': 0,
+    'CACHE_LOCAL_TTL': 60,
     'CATEGORY_CLEANUP': {},
     'CELERY_BROKER': None,
     'CELERY_CONFIG': {},
@@ -73,6 +75,8 @@ DEFAULTS = {
     'NO_REPLY_EMAIL': None,
     'PLUGINS': set(),
     'PROFILE': False,
+    'PROFILE_SAMPLE_ENDPOINTS': set(),
+    'PROFILE_SAMPLE_RATE': 0,
     'PROVIDER_MAP': {},
     'PUBLIC_SUPPORT_EMAIL': None,
     'REDIS_CACHE_URL': None,
@@ -94,6 +98,7 @@ DEFAULTS = {
     'SQLALCHEMY_POOL_SIZE': 5,
     'SQLALCHEMY_POOL_TIMEOUT': 10,
     'STATIC_FILE_METHOD': None,
+    'STATIC_FILE_STORAGE_MAP': {},
     'STATIC_SITE_STORAGE': None,
     'STORAGE_BACKENDS': {'default': 'fs:/opt/indico/archive'},
     'STRICT_LATEX': False,
@@ -16,7 +16,11 @@
 
 from __future__ import unicode_literals
 
-from flask import has_request_context, session
+from collections import defaultdict
+from hashlib import sha1
+from uuid import uuid4
+
+from flask import g, has_app_context, has_request_context, request, session
 from sqlalchemy import inspect
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import declared_attr
@@ -26,8 +30,9 @@ from sqlalchemy.orm.base import NEVER_SET, NO_VALUE
 from indico.core import signals
 from indico.core.db import db
 from indico.core.db.sqlalchemy import PyIntEnum
-from indico.core.db.sqlalchemy.principals import EmailPrincipal, PrincipalType
+from indico.core.db.sqlalchemy.principals import EmailPrincipal, PrincipalMixin, PrincipalType
 from indico.core.permissions import get_available_permissions
+from indico.legacy.common.cache import GenericCache
 from indico.util.caching import memoize_request
 from indico.util.i18n import _
 from indico.util.signals import values_from_signal
@@ -36,6 +41,145 @@ from indico.util.user import iter_acl
 from indico.web.util import jsonify_template
 
 
+#: How long (in seconds) access/management decisions are cached
+ACL_CACHE_TTL = 1800
+
+_acl_cache = GenericCache('acl-decisions', local=True)
+
+
+def _get_acl_cache_version_key(scope_item=None):
+    return 'version' if scope_item is None else 'version:{}[{}]'.format(*scope_item)
+
+
+def invalidate_acl_cache(obj=None):
+    """Invalidate cached access and management decisions.
+
+    ACL entries and protected objects invalidate the cache when they
+    are committed.  This function needs to be called after committing
+    any other change affecting the result of `can_access` or
+    `can_manage`, e.g. a setting or the members of a group.
+
+    :param obj: A protected object such as an event or category.  If
+                specified, only the decisions for objects within its
+                protection scope are invalidated (for an event this
+                includes e.g. its contributions and attachments; for a
+                category the events and subcategories in it).  If
+                omitted, all decisions are invalidated.
+    """
+    if obj is None:
+        scope_item = None
+    else:
+        scope = obj._get_acl_cache_scope()
+        scope_item = scope[-1] if scope else None
+    key = _get_acl_cache_version_key(scope_item)
+    version = uuid4().hex
+    _acl_cache.set(key, version)
+    if has_app_context():
+        g.setdefault('acl_cache_versions', {})[key] = version
+
+
+def _get_acl_cache_versions(keys):
+    versions = g.setdefault('acl_cache_versions', {})
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key, version in _acl_cache.get_multi(missing).iteritems():
+            if version is None:
+                _acl_cache.add(key, uuid4().hex)
+                version = _acl_cache.get(key)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def get_acl_cache_version(obj):
+    """Get the version of the cached decisions for a protected object.
+
+    The version changes whenever the cached access or management
+    decisions of the object are invalidated, so it can be used to
+    version other cached data depending on them.
+
+    :param obj: A protected object
+    :return: A string, or ``None`` if decisions for the object cannot
+             be cached.
+    """
+    if not has_app_context():
+        return None
+    scope = obj._get_acl_cache_scope()
+    if scope is None:
+        return None
+    keys = [_get_acl_cache_version_key()] + map(_get_acl_cache_version_key, scope)
+    versions = _get_acl_cache_versions(keys)
+    if None in versions:
+        return None
+    return sha1(':'.join(versions)).hexdigest()
+
+
+def _mark_acl_uncacheable(key):
+    """Prevent a decision from being cached.
+
+    This is needed for decisions depending on something specific to
+    the current request, such as the client's IP address.  Decisions
+    of child objects inherit this from their protection parents.
+    """
+    if key is not None and has_app_context():
+        g.setdefault('acl_uncacheable', set()).add(key)
+
+
+def _is_acl_uncacheable(key):
+    return key is None or not has_app_context() or key in g.get('acl_uncacheable', ())
+
+
+def _get_cached_acl_decision(obj, key, fn):
+    """Get an access/management decision, caching it if possible.
+
+    :param obj: The object the decision is for
+    :param key: The cache key of the decision
+    :param fn: A callable performing the actual check
+    """
+    if _is_acl_uncacheable(key):
+        return fn()
+    version = get_acl_cache_version(obj)
+    if version is None:
+        return fn()
+    cache_key = '{}:{}'.format(version, key)
+    rv = _acl_cache.get(cache_key)
+    if rv is not None:
+        return rv
+    rv = fn()
+    if not _is_acl_uncacheable(key):
+        _acl_cache.set(cache_key, rv, ACL_CACHE_TTL)
+    return rv
+
+
+def _get_acl_entry_object(entry):
+    """Get the protected object an ACL entry belongs to.
+
+    Only the foreign key of the entry is used since the relationship
+    is already cleared when the entry has been removed from the ACL.
+    """
+    for rel in inspect(type(entry)).relationships:
+        cls = rel.mapper.class_
+        if not issubclass(cls, ProtectionMixin):
+            continue
+        object_id = getattr(entry, next(iter(rel.local_columns)).key)
+        return cls.get(object_id) if object_id is not None else None
+    return None
+
+
+@signals.model_committed.connect
+def _model_committed(sender, obj, change, **kwargs):
+    if isinstance(obj, ProtectionMixin):
+        if change == 'update':
+            # this covers changes of the protection mode and the parent
+            invalidate_acl_cache(obj)
+        elif change == 'delete':
+            # a deleted object cannot be used to find its protection scope
+            invalidate_acl_cache()
+    elif isinstance(obj, PrincipalMixin):
+        protected_object = _get_acl_entry_object(obj)
+        if protected_object is not None:
+            invalidate_acl_cache(protected_object)
+
+
 class ProtectionMode(RichIntEnum):
     __titles__ = [_('Public'), _('Inheriting'), _('Protected')]
     public = 0
@@ -174,13 +318,188 @@ class ProtectionMixin(object):
         if override is not None:
             return override
 
+        cache_key = self._get_acl_cache_key('access', user, allow_admin)
+        if signals.acl.can_access.has_receivers_for(type(self)):
+            # signal handlers may override the decision based on anything
+            _mark_acl_uncacheable(cache_key)
+        if self.allow_access_key and self.access_key:
+            # access keys are stored in the session
+            _mark_acl_uncacheable(cache_key)
+
         # Usually admins can access everything, so no need for checks
         if allow_admin and user and type(self).is_user_admin(user):
+            _mark_acl_uncacheable(cache_key)
             rv = True
         # If there's a valid access key we can skip all other ACL checks
         elif self.allow_access_key and self.check_access_key():
             rv = True
-        elif self.protection_mode == ProtectionMode.public:
+        else:
+            rv = _get_cached_acl_decision(self, cache_key,
+                                          lambda: self._check_protection(user, allow_admin, cache_key))
+
+        override = self._check_can_access_override(user, allow_admin=allow_admin, authorized=rv)
+        return override if override is not None else rv
+
+    @classmethod
+    def filter_accessible(cls, objects, user, allow_admin=True):
+        """Get the objects from a list which the user can access.
+
+        This gives the same result as calling `can_access` for each
+        object.  Objects which are effectively public are identified
+        using their effective protection mode (if the model provides
+        one), and the ACLs of the other objects are matched against the
+        user's principals using a single query.  Only objects whose own
+        ACL does not grant access are checked one by one; their access
+        depends on their protection parent whose decision is cached.
+
+        :param objects: An iterable (or query) containing objects of
+                        this class.
+        :param user: The :class:`.User` to check. May be None if the
+                     user is not logged in.
+        :param allow_admin: If admin users should always have access
+        :return: A list containing the accessible objects in their
+                 original order.
+        """
+        objects = list(objects)
+        if not objects or signals.acl.can_access.has_receivers_for(cls):
+            return [obj for obj in objects if obj.can_access(user, allow_admin=allow_admin)]
+        if allow_admin and user and cls.is_user_admin(user):
+            return objects
+        public_ids = cls._get_public_ids(objects)
+        acl_modes = {ProtectionMode.protected}
+        if cls.inheriting_have_acl:
+            acl_modes.add(ProtectionMode.inheriting)
+        acl_ids = {obj.id for obj in objects if obj.id not in public_ids and obj.protection_mode in acl_modes}
+        granted_ids = cls._query_acl_granted_ids(acl_ids, user)
+        return [obj for obj in objects
+                if obj.id in public_ids or obj.id in granted_ids or obj.can_access(user, allow_admin=allow_admin)]
+
+    @classmethod
+    def _query_acl_granted_ids(cls, object_ids, user):
+        """Get the ids of the objects whose ACL contains the user.
+
+        The ACL entries of all objects are matched in a single query
+        against the user, the local groups and event roles the user is
+        a member of, the user's emails and the IP networks containing
+        the client's address.  Membership in multipass groups cannot be
+        checked in the database, so entries for such groups are loaded
+        as well and checked afterwards.
+
+        :param object_ids: The ids of the objects to check
+        :param user: The :class:`.User` to check. May be None if the
+                     user is not logged in.
+        """
+        from indico.modules.events.models.roles import role_members_table
+        from indico.modules.groups import GroupProxy
+        from indico.modules.groups.models.groups import group_members_table
+        from indico.modules.networks.models.networks import IPNetwork
+        from indico.modules.users.models.emails import UserEmail
+
+        if not object_ids:
+            return set()
+        entry_cls = cls.acl_entries.prop.mapper.class_
+        object_id_column = next(iter(cls.acl_entries.prop.remote_side))
+        criteria = []
+        if user is not None:
+            criteria += [entry_cls.user_id == user.id,
+                         entry_cls.local_group_id.in_(db.session.query(group_members_table.c.group_id)
+                                                      .filter(group_members_table.c.user_id == user.id)),
+                         entry_cls.type == PrincipalType.multipass_group]
+            if entry_cls.allow_emails:
+                criteria.append(entry_cls.email.in_(db.session.query(UserEmail.email)
+                                                    .filter(UserEmail.user_id == user.id)))
+            if entry_cls.allow_event_roles:
+                criteria.append(entry_cls.event_role_id.in_(db.session.query(role_members_table.c.role_id)
+                                                            .filter(role_members_table.c.user_id == user.id)))
+        if entry_cls.allow_networks and has_request_context() and request.remote_addr and session.user == user:
+            # like in `IPNetworkGroup.__contains__` only the current user's IP address is known
+            network_query = (db.session.query(IPNetwork.group_id)
+                             .filter(IPNetwork.network.op('>>=')(request.remote_addr)))
+            criteria.append(entry_cls.ip_network_group_id.in_(network_query))
+        if not criteria:
+            return set()
+        query = (db.session.query(object_id_column, entry_cls.type, entry_cls.multipass_group_provider,
+                                  entry_cls.multipass_group_name)
+                 .filter(object_id_column.in_(object_ids), db.or_(*criteria)))
+        granted_ids = set()
+        multipass_groups = defaultdict(set)
+        for object_id, type_, provider, name in query:
+            if type_ == PrincipalType.multipass_group:
+                multipass_groups[object_id].add((provider, name))
+            else:
+                granted_ids.add(object_id)
+        for object_id, groups in multipass_groups.iteritems():
+            if object_id not in granted_ids and any(user in GroupProxy(name, provider) for provider, name in groups):
+                granted_ids.add(object_id)
+        return granted_ids
+
+    @classmethod
+    def _get_public_ids(cls, objects):
+        """Get the ids of the objects which are effectively public.
+
+        This is used by `filter_accessible` and may be overridden by
+        models which can determine it efficiently.
+        """
+        return set()
+
+    @classmethod
+    def _query_public_ids(cls, objects):
+        """Get the ids of public objects using `effective_protection_mode`.
+
+        The protection mode is taken from the objects if it has already
+        been loaded; for all other objects it is retrieved using a
+        single query.
+        """
+        public_ids = set()
+        unknown_ids = set()
+        for obj in objects:
+            mode = obj.__dict__.get('effective_protection_mode')
+            if mode is None:
+                unknown_ids.add(obj.id)
+            elif mode == ProtectionMode.public:
+                public_ids.add(obj.id)
+        if unknown_ids:
+            query = (db.session.query(cls.id)
+                     .filter(cls.id.in_(unknown_ids), cls.effective_protection_mode == ProtectionMode.public))
+            public_ids.update(id_ for id_, in query)
+        return public_ids
+
+    def _get_acl_cache_scope(self):
+        """Get the protection scope used to version cached decisions.
+
+        The scope consists of the objects whose changes invalidate the
+        cached decisions of this object.  By default it is the scope of
+        the protection parent; models at the top of a protection chain
+        (e.g. events and categories) override this.
+
+        :return: A list of ``(type_name, id)`` tuples, starting with the
+                 outermost object, or ``None`` if decisions for this
+                 object cannot be cached.
+        """
+        parent = self.protection_parent
+        if not isinstance(parent, ProtectionMixin):
+            return None
+        return parent._get_acl_cache_scope()
+
+    def _get_acl_cache_key(self, *args):
+        identity_key = inspect(self).identity_key
+        if identity_key is None:
+            return None
+        cls, pks = identity_key[:2]
+        return '{}-{}:{}'.format(cls.__name__, '-'.join(map(unicode, pks)),
+                                 ':'.join(unicode(getattr(arg, 'id', arg)) for arg in args))
+
+    def _check_acl_entries(self, user, cache_key, entries):
+        entries = list(entries)
+        if any(entry.type in {PrincipalType.network, PrincipalType.multipass_group} for entry in entries):
+            # networks are checked against the client's IP address and
+            # multipass group membership does not invalidate the cache
+            _mark_acl_uncacheable(cache_key)
+        return any(user in entry.principal for entry in entries)
+
+    def _check_protection(self, user, allow_admin, cache_key):
+        """Check access based on the protection mode and ACL."""
+        if self.protection_mode == ProtectionMode.public:
             # if it's public we completely ignore the parent protection
             # this is quite ugly which is why it should only be allowed
             # in rare cases (e.g. events which might be in a protected
@@ -189,17 +508,20 @@ class ProtectionMixin(object):
         elif self.protection_mode == ProtectionMode.protected:
             # if it's protected, we also ignore the parent protection
             # and only check our own ACL
-            if any(user in entry.principal for entry in iter_acl(self.acl_entries)):
+            if self._check_acl_entries(user, cache_key, iter_acl(self.acl_entries)):
                 rv = True
             elif isinstance(self, ProtectionManagersMixin):
                 rv = self.can_manage(user, allow_admin=allow_admin)
+                if user and _is_acl_uncacheable(self._get_acl_cache_key('manage', user, None, allow_admin, True,
+                                                                        False)):
+                    _mark_acl_uncacheable(cache_key)
             else:
                 rv = False
         elif self.protection_mode == ProtectionMode.inheriting:
             # if it's inheriting, we only check the parent protection
             # unless `inheriting_have_acl` is set, in which case we
             # might not need to check the parents at all
-            if self.inheriting_have_acl and any(user in entry.principal for entry in iter_acl(self.acl_entries)):
+            if self.inheriting_have_acl and self._check_acl_entries(user, cache_key, iter_acl(self.acl_entries)):
                 rv = True
             else:
                 # the parent can be either an object inheriting from this
@@ -212,6 +534,9 @@ class ProtectionMixin(object):
                     raise TypeError('protection_parent of {} is None'.format(self))
                 elif hasattr(parent, 'can_access'):
                     rv = parent.can_access(user, allow_admin=allow_admin)
+                    if (not hasattr(parent, '_get_acl_cache_key') or
+                            _is_acl_uncacheable(parent._get_acl_cache_key('access', user, allow_admin))):
+                        _mark_acl_uncacheable(cache_key)
                 else:
                     raise TypeError('protection_parent of {} is of invalid type {} ({})'.format(self, type(parent),
                                                                                                 parent))
@@ -219,9 +544,7 @@ class ProtectionMixin(object):
             # should never happen, but since this is a sensitive area
             # we better fail loudly if we have garbage
             raise ValueError('Invalid protection mode: {}'.format(self.protection_mode))
-
-        override = self._check_can_access_override(user, allow_admin=allow_admin, authorized=rv)
-        return override if override is not None else rv
+        return rv
 
     def check_access_key(self, access_key=None):
         """Check whether an access key is valid for the object.
@@ -370,14 +693,27 @@ class ProtectionManagersMixin(ProtectionMixin):
             # we stay on the safe side and deny access
             return all(rv)
 
+        cache_key = self._get_acl_cache_key('manage', user, permission, allow_admin, check_parent, explicit_permission)
+        if signals.acl.can_manage.has_receivers_for(type(self)):
+            # signal handlers may override the decision based on anything
+            _mark_acl_uncacheable(cache_key)
+
         # Usually admins can access everything, so no need for checks
         if not explicit_permission and allow_admin and type(self).is_user_admin(user):
+            _mark_acl_uncacheable(cache_key)
             return True
 
-        if any(user in entry.principal
-               for entry in iter_acl(self.acl_entries)
-               if entry.has_management_permission(permission,
-                                                  explicit=(explicit_permission and permission is not None))):
+        return _get_cached_acl_decision(self, cache_key,
+                                        lambda: self._check_management(user, permission, allow_admin, check_parent,
+                                                                       explicit_permission, cache_key))
+
+    def _check_management(self, user, permission, allow_admin, check_parent, explicit_permission, cache_key):
+        """Check management permissions based on the ACL."""
+        entries = [entry
+                   for entry in iter_acl(self.acl_entries)
+                   if entry.has_management_permission(permission,
+                                                      explicit=(explicit_permission and permission is not None))]
+        if self._check_acl_entries(user, cache_key, entries):
             return True
 
         if not check_parent or explicit_permission:
@@ -391,7 +727,11 @@ class ProtectionManagersMixin(ProtectionMixin):
             # i.e. the root category
             return False
         elif hasattr(parent, 'can_manage'):
-            return parent.can_manage(user, allow_admin=allow_admin)
+            rv = parent.can_manage(user, allow_admin=allow_admin)
+            if (not hasattr(parent, '_get_acl_cache_key') or
+                    _is_acl_uncacheable(parent._get_acl_cache_key('manage', user, None, allow_admin, True, False))):
+                _mark_acl_uncacheable(cache_key)
+            return rv
         else:
             raise TypeError('protection_parent of {} is of invalid type {} ({})'.format(self, type(parent), parent))
 
@@ -36,6 +36,14 @@ def versioned_cache(cache, primary_key_attr='id'):
         return 'version:{}[{}]'.format(type(obj).__name__, getattr(obj, primary_key_attr))
 
     class _CacheVersionMixin(object):
+        @classmethod
+        def preload_cache_versions(cls, objs):
+            """Load the cache versions of many objects at once."""
+            objs = [obj for obj in objs if not hasattr(obj, '_cache_version')]
+            versions = cache.get_multi(map(_get_key, objs), 0, asdict=False)
+            for obj, version in zip(objs, versions):
+                obj._cache_version = version
+
         def __committed__(self, change):
             super(_CacheVersionMixin, self).__committed__(change)
             if change == 'delete':
@@ -67,6 +75,11 @@ def cached(cache, primary_key_attr='id', base_ttl=86400*31):
     It is usually a good idea to expunge cache entries when the object is modified.
     To do so, make the model inherit from the mixin created by :func:`versioned_cache`.
 
+    When the function is about to be called for many objects, use the ``queue``
+    method of the decorated function to retrieve all cached values at once::
+
+        SomeModel.expensive_method.queue(objs, *args, **kwargs)
+
     :param cache: A :class:`GenericCache` instance
     :param primary_key_attr: The attribute containing the an unique identifier for the object
     :param base_ttl: The time after which a cached property expires
@@ -74,8 +87,7 @@ def cached(cache, primary_key_attr='id', base_ttl=86400*31):
     _not_cached = object()
 
     def decorator(f):
-        @wraps(f)
-        def wrapper(self, *args, **kwargs):
+        def _get_key(self, args, kwargs):
             primary_key = getattr(self, primary_key_attr)
             if hasattr(self, 'cache_version'):
                 key = u'{}[{}.{}].{}'.format(type(self).__name__, primary_key, self.cache_version, f.__name__)
@@ -86,7 +98,17 @@ def cached(cache, primary_key_attr='id', base_ttl=86400*31):
                                   [u'{}={}'.format(k, make_hashable(v)) for k, v in sorted(kwargs.viewitems())])
             if args_key:
                 key = '{}({})'.format(key, args_key)
+            return key
+
+        def _queue(objs, *args, **kwargs):
+            objs = list(objs)
+            if objs and hasattr(objs[0], 'preload_cache_versions'):
+                objs[0].preload_cache_versions(objs)
+            cache.queue(*(_get_key(obj, args, kwargs) for obj in objs))
 
+        @wraps(f)
+        def wrapper(self, *args, **kwargs):
+            key = _get_key(self, args, kwargs)
             result = cache.get(key, _not_cached)
             if result is _not_cached:
                 result = f(self, *args, **kwargs)
@@ -95,6 +117,7 @@ def cached(cache, primary_key_attr='id', base_ttl=86400*31):
                 cache.set(key, result, base_ttl + 300 * random.randint(0, 200))
             return result
 
+        wrapper.queue = _queue
         return wrapper
 
     return decorator
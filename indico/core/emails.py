@@ -18,7 +18,12 @@ from __future__ import absolute_import, unicode_literals
 
 import cPickle
 import os
+import smtplib
+import socket
 import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from datetime import date
 
 import click
@@ -38,17 +43,25 @@ from indico.util.string import truncate
 logger = Logger.get('emails')
 MAX_TRIES = 10
 DELAYS = [30, 60, 120, 300, 600, 1800, 3600, 3600, 7200]
+#: Connections idle for longer than this are checked using NOOP before reusing them
+SMTP_NOOP_INTERVAL = 10
+#: Connections idle for longer than this are never reused
+SMTP_MAX_IDLE = 120
+
+_smtp_pool = threading.local()
 
 
 @celery.task(name='send_email', bind=True, max_retries=None)
-def send_email_task(task, email, log_entry=None):
-    attempt = task.request.retries + 1
+def send_email_task(task, email, log_entry=None, prior_attempts=0):
+    # `prior_attempts` is set when the email already failed to send
+    # e.g. as part of a batch so those attempts count towards the limit
+    attempt = prior_attempts + task.request.retries + 1
     try:
         do_send_email(email, log_entry, _from_task=True)
     except Exception as exc:
-        delay = (DELAYS + [0])[task.request.retries] if not config.DEBUG else 1
+        delay = (DELAYS + [0])[attempt - 1] if not config.DEBUG else 1
         try:
-            task.retry(countdown=delay, max_retries=(MAX_TRIES - 1))
+            task.retry(countdown=delay, max_retries=(MAX_TRIES - 1 - prior_attempts))
         except MaxRetriesExceededError:
             if log_entry:
                 update_email_log_state(log_entry, failed=True)
@@ -64,7 +77,7 @@ def send_email_task(task, email, log_entry=None):
                            truncate(email['subject'], 100), attempt, MAX_TRIES, delay, exc)
             raise
     else:
-        if task.request.retries:
+        if attempt > 1:
             logger.info('Sent email "%s" (attempt %d/%d)', truncate(email['subject'], 100), attempt, MAX_TRIES)
         else:
             logger.info('Sent email "%s"', truncate(email['subject'], 100))
@@ -73,6 +86,89 @@ def send_email_task(task, email, log_entry=None):
             db.session.commit()
 
 
+@celery.task(name='send_emails')
+def send_emails_task(emails, log_entry_ids):
+    """Send many emails using the same SMTP connection.
+
+    Emails which could not be sent are passed on to `send_email_task`
+    so they are retried individually.
+
+    :param emails: A list of emails as created by `make_email`
+    :param log_entry_ids: A list containing the id of the
+                          `EventLogEntry` of each email (or None)
+    """
+    from indico.modules.events.logs import EventLogEntry
+    ids = {id_ for id_ in log_entry_ids if id_ is not None}
+    log_entries = {e.id: e for e in EventLogEntry.find(EventLogEntry.id.in_(ids))} if ids else {}
+    start = time.time()
+    failed = 0
+    for email, log_entry_id in zip(emails, log_entry_ids):
+        log_entry = log_entries.get(log_entry_id)
+        try:
+            do_send_email(email, log_entry, _from_task=True)
+        except Exception as exc:
+            failed += 1
+            delay = DELAYS[0] if not config.DEBUG else 1
+            logger.warning('Could not send email "%s" (attempt 1/%d); retry in %ds [%s]',
+                           truncate(email['subject'], 100), MAX_TRIES, delay, exc)
+            send_email_task.apply_async((email, log_entry), {'prior_attempts': 1}, countdown=delay)
+        else:
+            logger.info('Sent email "%s"', truncate(email['subject'], 100))
+    db.session.commit()
+    duration = time.time() - start
+    sent = len(emails) - failed
+    logger.info('Sent %d/%d emails in %.2fs (%.1f emails/s)', sent, len(emails), duration,
+                sent / duration if duration else 0)
+
+
+def _is_smtp_connection_usable(conn):
+    if (conn.host, conn.port) != tuple(config.SMTP_SERVER):
+        return False
+    idle = time.time() - _smtp_pool.last_used
+    if idle > SMTP_MAX_IDLE:
+        return False
+    elif idle > SMTP_NOOP_INTERVAL:
+        try:
+            return conn.connection.noop()[0] == 250
+        except (smtplib.SMTPException, socket.error):
+            return False
+    return True
+
+
+def _discard_smtp_connection(conn):
+    _smtp_pool.connection = None
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+@contextmanager
+def _get_smtp_connection():
+    """Get an open SMTP connection.
+
+    The connection is kept open after sending an email so it can be
+    reused for subsequent emails sent from the same thread.  Whether
+    an existing connection has been reused is stored in the pool so
+    callers can retry if the server dropped it in the meantime.
+    """
+    conn = getattr(_smtp_pool, 'connection', None)
+    if conn is not None and not _is_smtp_connection_usable(conn):
+        _discard_smtp_connection(conn)
+        conn = None
+    _smtp_pool.reused = conn is not None
+    if conn is None:
+        conn = _smtp_pool.connection = EmailBackend(timeout=config.SMTP_TIMEOUT)
+    try:
+        conn.open()
+        yield conn
+    except Exception:
+        # the connection may be in an unusable state
+        _discard_smtp_connection(conn)
+        raise
+    _smtp_pool.last_used = time.time()
+
+
 def do_send_email(email, log_entry=None, _from_task=False):
     """Send an email.
 
@@ -90,7 +186,23 @@ def do_send_email(email, log_entry=None, _from_task=False):
     :param _from_task: Indicates that this function is called from
                        the celery task responsible for sending emails.
     """
-    with EmailBackend(timeout=config.SMTP_TIMEOUT) as conn:
+    try:
+        _send_email_message(email)
+    except smtplib.SMTPServerDisconnected as exc:
+        # the server may close an idle connection at any time, even
+        # right after it passed our checks, so we reconnect once
+        if not _smtp_pool.reused:
+            raise
+        logger.info('Pooled SMTP connection was closed by the server; reconnecting [%s]', exc)
+        _send_email_message(email)
+    if not _from_task:
+        logger.info('Sent email "%s"', truncate(email['subject'], 100))
+    if log_entry:
+        update_email_log_state(log_entry)
+
+
+def _send_email_message(email):
+    with _get_smtp_connection() as conn:
         msg = EmailMessage(subject=email['subject'], body=email['body'], from_email=email['from'],
                            to=email['to'], cc=email['cc'], bcc=email['bcc'], reply_to=email['reply_to'],
                            attachments=email['attachments'], connection=conn)
@@ -99,10 +211,6 @@ def do_send_email(email, log_entry=None, _from_task=False):
         if email['html']:
             msg.content_subtype = 'html'
         msg.send()
-    if not _from_task:
-        logger.info('Sent email "%s"', truncate(email['subject'], 100))
-    if log_entry:
-        update_email_log_state(log_entry)
 
 
 def update_email_log_state(log_entry, failed=False):
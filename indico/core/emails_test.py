@@ -0,0 +1,129 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import smtplib
+import threading
+
+import pytest
+
+from indico.core import emails
+from indico.core.notifications import make_email
+from indico.testing.util import extract_emails
+from indico.util.emails.backend import EmailBackend
+
+
+@pytest.fixture
+def email_backend(mocker):
+    mocker.patch('indico.core.emails._smtp_pool', threading.local())
+    return mocker.patch('indico.core.emails.EmailBackend', side_effect=EmailBackend)
+
+
+def _make_email(n):
+    return make_email('test{}@example.com'.format(n), from_address='noreply@example.com', subject='Test {}'.format(n),
+                      body='Hello world')
+
+
+@pytest.mark.usefixtures('request_context')
+def test_do_send_email_reuses_connection(smtp, email_backend):
+    emails.do_send_email(_make_email(1))
+    emails.do_send_email(_make_email(2))
+    assert email_backend.call_count == 1
+    extract_emails(smtp, count=1, to='test1@example.com')
+    extract_emails(smtp, count=1, to='test2@example.com')
+
+
+@pytest.mark.usefixtures('request_context')
+def test_do_send_email_checks_idle_connection(smtp, email_backend, mocker):
+    emails.do_send_email(_make_email(1))
+    conn = emails._smtp_pool.connection
+    # pretend the server closed the connection while it was idle
+    emails._smtp_pool.last_used -= emails.SMTP_NOOP_INTERVAL + 1
+    mocker.patch.object(conn.connection, 'noop', return_value=(421, b'Timeout'))
+    emails.do_send_email(_make_email(2))
+    assert email_backend.call_count == 2
+    assert emails._smtp_pool.connection is not conn
+    extract_emails(smtp, count=2)
+
+
+@pytest.mark.usefixtures('request_context')
+def test_do_send_email_reconnects(smtp, email_backend, mocker):
+    emails.do_send_email(_make_email(1))
+    conn = emails._smtp_pool.connection
+    # pretend the server closed the connection right after the NOOP check
+    mocker.patch.object(conn.connection, 'sendmail', side_effect=smtplib.SMTPServerDisconnected)
+    emails.do_send_email(_make_email(2))
+    assert email_backend.call_count == 2
+    assert emails._smtp_pool.connection is not conn
+    extract_emails(smtp, count=1, to='test1@example.com')
+    extract_emails(smtp, count=1, to='test2@example.com')
+
+
+@pytest.mark.usefixtures('request_context')
+def test_do_send_email_no_reconnect_new_connection(smtp, email_backend, mocker):
+    mocker.patch('smtplib.SMTP.sendmail', side_effect=smtplib.SMTPServerDisconnected)
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        emails.do_send_email(_make_email(1))
+    assert email_backend.call_count == 1
+    assert emails._smtp_pool.connection is None
+
+
+@pytest.mark.usefixtures('request_context')
+def test_send_emails_task(smtp, email_backend, mocker):
+    retry = mocker.patch.object(emails.send_email_task, 'apply_async')
+    orig_do_send_email = emails.do_send_email
+
+    def _do_send_email(email, *args, **kwargs):
+        if email['subject'] == 'Test 2':
+            raise Exception('Sending failed')
+        return orig_do_send_email(email, *args, **kwargs)
+
+    mocker.patch('indico.core.emails.do_send_email', side_effect=_do_send_email)
+    mocker.patch('indico.core.emails.db')
+    batch = [_make_email(n) for n in range(1, 4)]
+    emails.send_emails_task.run(batch, [None, None, None])
+    assert email_backend.call_count == 1
+    assert retry.call_count == 1
+    assert retry.call_args[0][0][0]['subject'] == 'Test 2'
+    # the failed attempt counts towards the retry limit
+    assert retry.call_args[0][1] == {'prior_attempts': 1}
+    extract_emails(smtp, count=2)
+
+
+@pytest.mark.parametrize(('prior_attempts', 'retries', 'gives_up'), (
+    (0, 0, False),
+    (0, emails.MAX_TRIES - 1, True),
+    (1, emails.MAX_TRIES - 3, False),
+    (1, emails.MAX_TRIES - 2, True),
+))
+def test_send_email_task_max_tries(mocker, prior_attempts, retries, gives_up):
+    mocker.patch('indico.core.emails.do_send_email', side_effect=Exception('Sending failed'))
+    store_failed_email = mocker.patch('indico.core.emails.store_failed_email')
+    retry = mocker.patch.object(emails.send_email_task, 'retry', side_effect=emails.Retry)
+    emails.send_email_task.push_request(retries=retries)
+    try:
+        if gives_up:
+            retry.side_effect = emails.MaxRetriesExceededError
+            emails.send_email_task.run(_make_email(1), prior_attempts=prior_attempts)
+            assert store_failed_email.called
+        else:
+            with pytest.raises(emails.Retry):
+                emails.send_email_task.run(_make_email(1), prior_attempts=prior_attempts)
+            assert not store_failed_email.called
+    finally:
+        emails.send_email_task.pop_request()
+    assert retry.call_args[1]['max_retries'] == emails.MAX_TRIES - 1 - prior_attempts
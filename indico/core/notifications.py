@@ -30,6 +30,8 @@ from indico.util.string import to_unicode, truncate
 
 
 logger = Logger.get('emails')
+#: The maximum number of queued emails sent by a single celery task
+EMAIL_BATCH_SIZE = 100
 
 
 def email_sender(fn):
@@ -59,15 +61,18 @@ def send_email(email, event=None, module=None, user=None):
     :param module: The module name to show in the email log
     :param user: The user to show in the email log
     """
-    from indico.core.emails import do_send_email, send_email_task
-    fn = send_email_task.delay if config.SMTP_USE_CELERY else do_send_email
     # we log the email immediately (as pending).  if we don't commit,
     # the log message will simply be thrown away later
     log_entry = _log_email(email, event, module, user)
     if 'email_queue' in g:
-        g.email_queue.append((fn, email, log_entry))
+        g.email_queue.append((email, log_entry))
     else:
-        fn(email, log_entry)
+        _get_email_sender()(email, log_entry)
+
+
+def _get_email_sender():
+    from indico.core.emails import do_send_email, send_email_task
+    return send_email_task.delay if config.SMTP_USE_CELERY else do_send_email
 
 
 def _log_email(email, event, module, user):
@@ -103,31 +108,52 @@ def flush_email_queue():
     doing a commit/rollback of any other changes that might have
     been pending.
     """
-    from indico.core.emails import store_failed_email, update_email_log_state
     queue = g.get('email_queue', [])
     if not queue:
         return
     logger.debug('Sending %d queued emails', len(queue))
-    for fn, email, log_entry in queue:
-        try:
-            fn(email, log_entry)
-        except Exception:
-            # Flushing the email queue happens after a commit.
-            # If anything goes wrong here we keep going and just log
-            # it to avoid losing (more) emails in case celery is not
-            # used for email sending or there is a temporary issue
-            # with celery.
-            if log_entry:
-                update_email_log_state(log_entry, failed=True)
-            path = store_failed_email(email, log_entry)
-            logger.exception('Flushing queued email "%s" failed; stored data in %s',
-                             truncate(email['subject'], 100), path)
-            # Wait for a short moment in case it's a very temporary issue
-            time.sleep(0.25)
+    if config.SMTP_USE_CELERY and len(queue) > 1:
+        # send the emails in batches so they are sent using only
+        # a few SMTP connections instead of one per email
+        for i in xrange(0, len(queue), EMAIL_BATCH_SIZE):
+            _send_email_batch(queue[i:i + EMAIL_BATCH_SIZE])
+    else:
+        fn = _get_email_sender()
+        for email, log_entry in queue:
+            try:
+                fn(email, log_entry)
+            except Exception:
+                _handle_failed_queued_email(email, log_entry)
     del queue[:]
     db.session.commit()
 
 
+def _send_email_batch(batch):
+    from indico.core.emails import send_emails_task
+    emails, log_entries = zip(*batch)
+    try:
+        send_emails_task.delay(list(emails), [e.id if e else None for e in log_entries])
+    except Exception:
+        for email, log_entry in batch:
+            _handle_failed_queued_email(email, log_entry)
+
+
+def _handle_failed_queued_email(email, log_entry):
+    # Flushing the email queue happens after a commit.
+    # If anything goes wrong here we keep going and just log
+    # it to avoid losing (more) emails in case celery is not
+    # used for email sending or there is a temporary issue
+    # with celery.
+    from indico.core.emails import store_failed_email, update_email_log_state
+    if log_entry:
+        update_email_log_state(log_entry, failed=True)
+    path = store_failed_email(email, log_entry)
+    logger.exception('Flushing queued email "%s" failed; stored data in %s',
+                     truncate(email['subject'], 100), path)
+    # Wait for a short moment in case it's a very temporary issue
+    time.sleep(0.25)
+
+
 def make_email(to_list=None, cc_list=None, bcc_list=None, from_address=None, reply_address=None, attachments=None,
                subject=None, body=None, template=None, html=False):
     """Creates an email.
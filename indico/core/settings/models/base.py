@@ -61,13 +61,16 @@ class SettingsBase(object):
     def delete(cls, module, *names, **kwargs):
         if not names:
             return
-        cls.find(cls.name.in_(names), cls.module == module, **kwargs).delete(synchronize_session='fetch')
+        # deleting through the session triggers `model_committed` for the settings
+        for setting in cls.find(cls.name.in_(names), cls.module == module, **kwargs):
+            db.session.delete(setting)
         db.session.flush()
         cls._clear_cache()
 
     @classmethod
     def delete_all(cls, module, **kwargs):
-        cls.find(module=module, **kwargs).delete()
+        for setting in cls.find(module=module, **kwargs):
+            db.session.delete(setting)
         db.session.flush()
         cls._clear_cache()
 
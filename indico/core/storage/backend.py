@@ -29,7 +29,7 @@ from indico.core import signals
 from indico.core.config import config
 from indico.util.signals import named_objects_from_signal
 from indico.util.string import return_ascii
-from indico.web.flask.util import send_file
+from indico.web.flask.util import send_file, send_file_via_server
 
 
 def get_storage(backend_name):
@@ -52,7 +52,9 @@ def get_storage(backend_name):
         backend = get_storage_backends()[name]
     except KeyError:
         raise RuntimeError('Storage backend {} has invalid type {}'.format(backend_name, name))
-    return backend(data)
+    storage = backend(data)
+    storage.internal_uri = config.STATIC_FILE_STORAGE_MAP.get(backend_name)
+    return storage
 
 
 def get_storage_backends():
@@ -94,6 +96,9 @@ class Storage(object):
     plugin = None
     #: if the backend uses a simple data string instead of key-value pairs
     simple_data = True
+    #: internal URI of the web server from which files of this backend
+    #: can be served - assigned automatically from the config
+    internal_uri = None
 
     def __init__(self, data):  # pragma: no cover
         pass
@@ -139,6 +144,10 @@ class Storage(object):
         operations and MUST NOT be used after existing this function's
         contextmanager.
 
+        Unless the file is stored on the local file system, this needs
+        to copy the whole file to a temporary file, so `open` should be
+        used instead whenever the file's contents are sufficient.
+
         :param file_id: The ID of the file within the storage backend.
         """
         with self.open(file_id) as fd:
@@ -147,6 +156,22 @@ class Storage(object):
                 tmpfile.flush()
                 yield tmpfile.name
 
+    def get_internal_uri(self, file_id):
+        """Returns the web server URI from which the file can be served.
+
+        If the web server is able to access the files of this backend,
+        e.g. through an internal location in nginx, backends should
+        use this in `send_file` to let the web server deliver the file
+        instead of sending its contents from Python.
+
+        :param file_id: The ID of the file within the storage backend.
+        :return: The internal URI or ``None`` if the file cannot be
+                 served by the web server.
+        """
+        if not self.internal_uri:
+            return None
+        return safe_join(self.internal_uri, file_id)
+
     def save(self, name, content_type, filename, fileobj):  # pragma: no cover
         """Creates a new file in the storage.
 
@@ -277,6 +302,9 @@ class FileSystemStorage(Storage):
 
     def send_file(self, file_id, content_type, filename, inline=True):
         try:
+            uri = self.get_internal_uri(file_id)
+            if uri:
+                return send_file_via_server(filename, uri, content_type, inline=inline)
             return send_file(filename, self._resolve_path(file_id).encode('utf-8'), content_type, inline=inline)
         except Exception as e:
             raise StorageError('Could not send "{}": {}'.format(file_id, e)), None, sys.exc_info()[2]
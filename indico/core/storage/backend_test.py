@@ -137,6 +137,28 @@ def test_fs_send_file(fs_storage):
     assert ''.join(response.response) == 'hello world'
 
 
+@pytest.mark.usefixtures('request_context')
+@pytest.mark.parametrize('inline', (True, False))
+def test_fs_send_file_via_server(fs_storage, inline):
+    fs_storage.internal_uri = '/.xsf/archive/'
+    f1, __ = fs_storage.save('foo/bar baz.txt', 'unused/unused', 'unused', b'hello world')
+    response = fs_storage.send_file(f1, 'text/plain', 'filename.txt', inline=inline)
+    assert response.headers['X-Accel-Redirect'] == '/.xsf/archive/foo/bar%20baz.txt'
+    assert 'text/plain' in response.headers['Content-type']
+    disposition = 'inline' if inline else 'attachment'
+    assert response.headers['Content-disposition'] == '{}; filename=filename.txt'.format(disposition)
+    assert 'Content-Security-Policy' in response.headers
+    assert response.cache_control.no_cache
+    assert not response.get_data()
+
+
+def test_get_internal_uri(fs_storage):
+    assert fs_storage.get_internal_uri('foo/bar.txt') is None
+    fs_storage.internal_uri = '/.xsf/archive'
+    assert fs_storage.get_internal_uri('foo/bar.txt') == '/.xsf/archive/foo/bar.txt'
+    assert fs_storage.get_internal_uri('../bar.txt') is None
+
+
 @pytest.mark.usefixtures('request_context')
 def test_fs_readonly(fs_storage):
     f, __ = fs_storage.save('test.txt', 'unused/unused', 'unused', b'hello world')
@@ -28,6 +28,8 @@ specifying, among others, which storage backend to use.
 
 from __future__ import unicode_literals
 
+import calendar
+
 from sqlalchemy.event import listen
 from sqlalchemy.ext.declarative import declared_attr
 
@@ -35,6 +37,7 @@ from indico.core.db import db
 from indico.core.db.sqlalchemy import UTCDateTime
 from indico.core.storage.backend import get_storage
 from indico.util.date_time import now_utc
+from indico.web.flask.util import is_not_modified, make_conditional_file_response, make_not_modified_response
 
 
 class VersionedResourceMixin(object):
@@ -214,10 +217,19 @@ class StoredFileMixin(object):
         return self.storage.open(self.storage_file_id)
 
     def send(self, inline=True):
-        """Sends the file to the user"""
+        """Sends the file to the user.
+
+        The response can be revalidated using the MD5 hash and the
+        creation date of the file and supports range requests.
+        """
         if self.storage_file_id is None:
             raise Exception('There is no file to send')
-        return self.storage.send_file(self.storage_file_id, self.content_type, self.filename, inline=inline)
+        created_dt = getattr(self, 'created_dt', None)
+        last_modified = calendar.timegm(created_dt.utctimetuple()) if created_dt else None
+        if is_not_modified(self.md5, last_modified):
+            return make_not_modified_response(self.md5, last_modified)
+        rv = self.storage.send_file(self.storage_file_id, self.content_type, self.filename, inline=inline)
+        return make_conditional_file_response(rv, self.md5, last_modified, self.size)
 
     def delete(self):
         """Delete the file from storage"""
@@ -16,13 +16,17 @@
 
 import cPickle as pickle
 import datetime
+import errno
 import hashlib
 import os
+import threading
 import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
 from itertools import izip
 
 import redis
-from flask import g
+from flask import g, has_request_context
 
 from indico.core.config import config
 from indico.core.logger import Logger
@@ -71,6 +75,13 @@ class CacheClient(object):
         for key in keys:
             self.delete(key)
 
+    def add(self, key, val, ttl=0):
+        # not atomic, backends should override it if possible
+        if self.get(key) is not None:
+            return False
+        self.set(key, val, ttl)
+        return True
+
     def set(self, key, val, ttl=0):
         raise NotImplementedError
 
@@ -84,6 +95,9 @@ class CacheClient(object):
 class NullCacheClient(CacheClient):
     """Does nothing"""
 
+    def add(self, key, val, ttl=0):
+        return True
+
     def set(self, key, val, ttl=0):
         pass
 
@@ -112,6 +126,32 @@ class RedisCacheClient(CacheClient):
         # Redis keys are even binary-safe, no need to hash anything
         return key
 
+    def get_raw_multi(self, keys):
+        """Get the pickled values and remaining TTLs of some keys.
+
+        :return: A dict mapping keys to ``(data, ttl)`` tuples; the
+                 TTL is ``None`` if the key does not expire.  Keys
+                 which are not in the cache are omitted.
+        """
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+                pipe.ttl(key)
+            res = pipe.execute()
+        except redis.RedisError:
+            Logger.get('cache.redis').exception('get_raw_multi(%r) failed', keys)
+            return {}
+        return {key: (data, ttl if ttl >= 0 else None)
+                for key, data, ttl in izip(keys, res[::2], res[1::2])
+                if data is not None}
+
+    def publish(self, channel, message):
+        try:
+            self._client.publish(channel, message)
+        except redis.RedisError:
+            Logger.get('cache.redis').exception('publish(%r, %r) failed', channel, message)
+
     def set_multi(self, mapping, ttl=0):
         try:
             self._client.mset(dict((k, pickle.dumps(v)) for k, v in mapping.iteritems()))
@@ -133,6 +173,14 @@ class RedisCacheClient(CacheClient):
         except redis.RedisError:
             Logger.get('cache.redis').exception('delete_multi(%r) failed', keys)
 
+    def add(self, key, val, ttl=0):
+        try:
+            return bool(self._client.set(key, pickle.dumps(val), ex=(ttl or None), nx=True))
+        except redis.RedisError:
+            val_repr = truncate(repr(val), 1000)
+            Logger.get('cache.redis').exception('add(%r, %s, %r) failed', key, val_repr, ttl)
+            return False
+
     def set(self, key, val, ttl=0):
         try:
             if ttl:
@@ -182,12 +230,11 @@ class FileCacheClient(CacheClient):
                     raise
         return os.path.join(dir, filename)
 
-    def set(self, key, val, ttl=0):
+    def _write(self, key, val, expiry):
         try:
             f = open(self._getFilePath(key), 'wb')
             OSSpecific.lockFile(f, 'LOCK_EX')
             try:
-                expiry = int(time.time()) + ttl if ttl else None
                 data = (expiry, val)
                 pickle.dump(data, f)
             finally:
@@ -198,13 +245,14 @@ class FileCacheClient(CacheClient):
             return 0
         return 1
 
-    def get(self, key):
+    def _read(self, key, now):
+        try:
+            f = open(self._getFilePath(key, False), 'rb')
+        except IOError as exc:
+            if exc.errno != errno.ENOENT:
+                Logger.get('cache.files').exception('Error getting cached value')
+            return None
         try:
-            path = self._getFilePath(key, False)
-            if not os.path.exists(path):
-                return None
-
-            f = open(path, 'rb')
             OSSpecific.lockFile(f, 'LOCK_SH')
             expiry = val = None
             try:
@@ -212,7 +260,7 @@ class FileCacheClient(CacheClient):
             finally:
                 OSSpecific.lockFile(f, 'LOCK_UN')
                 f.close()
-            if expiry and time.time() > expiry:
+            if expiry and now > expiry:
                 return None
         except (IOError, OSError):
             Logger.get('cache.files').exception('Error getting cached value')
@@ -220,13 +268,30 @@ class FileCacheClient(CacheClient):
         except (EOFError, pickle.UnpicklingError):
             Logger.get('cache.files').exception('Cached information seems corrupted. Overwriting it.')
             return None
-
         return val
 
+    def set_multi(self, mapping, ttl=0):
+        expiry = int(time.time()) + ttl if ttl else None
+        for key, val in mapping.iteritems():
+            self._write(key, val, expiry)
+
+    def get_multi(self, keys):
+        now = time.time()
+        values = ((key, self._read(key, now)) for key in keys)
+        return {key: val for key, val in values if val is not None}
+
+    def delete_multi(self, keys):
+        for key in keys:
+            silentremove(self._getFilePath(key, False))
+
+    def set(self, key, val, ttl=0):
+        return self._write(key, val, int(time.time()) + ttl if ttl else None)
+
+    def get(self, key):
+        return self._read(key, time.time())
+
     def delete(self, key):
-        path = self._getFilePath(key, False)
-        if os.path.exists(path):
-            silentremove(path)
+        silentremove(self._getFilePath(key, False))
         return 1
 
 
@@ -242,6 +307,18 @@ class MemcachedCacheClient(CacheClient):
         import memcache
         self._client = memcache.Client(servers)
 
+    def set_multi(self, mapping, ttl=0):
+        self._client.set_multi(mapping, self.convert_ttl(ttl))
+
+    def get_multi(self, keys):
+        return self._client.get_multi(keys)
+
+    def delete_multi(self, keys):
+        self._client.delete_multi(keys)
+
+    def add(self, key, val, ttl=0):
+        return bool(self._client.add(key, val, self.convert_ttl(ttl)))
+
     def set(self, key, val, ttl=0):
         return self._client.set(key, val, self.convert_ttl(ttl))
 
@@ -252,14 +329,214 @@ class MemcachedCacheClient(CacheClient):
         return self._client.delete(key)
 
 
+class LocalCache(object):
+    """A thread-safe in-process LRU cache for pickled cache values.
+
+    Entries are stored together with their expiry time and evicted in
+    least-recently-used order once `maxsize` is exceeded.  Hits, misses
+    and evictions are counted per cache namespace.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'evictions': 0})
+
+    @staticmethod
+    def _get_namespace(key):
+        return key[len(RedisCacheClient.key_prefix):].split('.', 1)[0]
+
+    def get(self, key):
+        with self._lock:
+            stats = self._stats[self._get_namespace(key)]
+            entry = self._data.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                stats['misses'] += 1
+                return None
+            self._data[key] = entry
+            stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, data, ttl):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + ttl, data)
+            while len(self._data) > self.maxsize:
+                evicted_key = self._data.popitem(last=False)[0]
+                self._stats[self._get_namespace(evicted_key)]['evictions'] += 1
+
+    def delete_multi(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        """Get the hit/miss/eviction counters and sizes of each namespace."""
+        with self._lock:
+            sizes = Counter(self._get_namespace(key) for key in self._data)
+            return {namespace: dict(stats, size=sizes[namespace]) for namespace, stats in self._stats.iteritems()}
+
+
+class LocalCacheInvalidator(threading.Thread):
+    """Evict local cache entries that have been modified by other processes.
+
+    Every process using a local cache layer publishes the keys it sets
+    or deletes in Redis; this thread listens for these notifications
+    and removes the affected keys from the local cache of this process.
+    """
+
+    channel = 'cache/gen/invalidate'
+
+    def __init__(self, url, local_cache):
+        super(LocalCacheInvalidator, self).__init__(name='cache-invalidator')
+        self.daemon = True
+        self.token = uuid.uuid4().hex
+        self._url = url
+        self._local_cache = local_cache
+
+    def make_message(self, keys):
+        return pickle.dumps((self.token, list(keys)))
+
+    def run(self):
+        logger = Logger.get('cache.local')
+        client = redis.StrictRedis.from_url(self._url)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    token, keys = pickle.loads(message['data'])
+                    if token != self.token:
+                        self._local_cache.delete_multi(keys)
+            except redis.RedisError:
+                logger.exception('Local cache invalidation failed')
+            # we may have missed invalidations while not being subscribed
+            self._local_cache.clear()
+            time.sleep(1)
+
+
+_local_cache_state = {'pid': None, 'cache': None, 'invalidator': None}
+_local_cache_lock = threading.Lock()
+
+
+def _get_local_cache():
+    """Get the local cache and invalidator of the current process.
+
+    Both are created lazily since threads do not survive forking
+    the worker processes.
+    """
+    with _local_cache_lock:
+        if _local_cache_state['pid'] != os.getpid():
+            local_cache = LocalCache(config.CACHE_LOCAL_SIZE)
+            invalidator = LocalCacheInvalidator(config.REDIS_CACHE_URL, local_cache)
+            invalidator.start()
+            _local_cache_state.update(pid=os.getpid(), cache=local_cache, invalidator=invalidator)
+        return _local_cache_state['cache'], _local_cache_state['invalidator']
+
+
+def get_local_cache_stats():
+    """Get the local cache statistics of the current process.
+
+    :return: A dict mapping namespaces to dicts containing the number
+             of hits, misses and evictions in the local cache layer
+             as well as the number of entries currently cached.
+    """
+    local_cache = _local_cache_state['cache']
+    if local_cache is None or _local_cache_state['pid'] != os.getpid():
+        return {}
+    return local_cache.get_stats()
+
+
+class LocalCacheClient(CacheClient):
+    """Two-tier cache client with an in-process LRU in front of Redis.
+
+    Values are stored pickled in the local cache so callers never share
+    mutable objects.  Local entries expire after `ttl` seconds or when
+    the Redis entry expires, whichever happens first, and are evicted
+    in all processes whenever a key is set or deleted.
+    """
+
+    def __init__(self, client, ttl):
+        self._client = client
+        self._ttl = ttl
+        self._local_cache, self._invalidator = _get_local_cache()
+
+    @property
+    def key_prefix(self):
+        return self._client.key_prefix
+
+    def hash_key(self, key):
+        return self._client.hash_key(key)
+
+    def _local_ttl(self, ttl):
+        return min(ttl, self._ttl) if ttl else self._ttl
+
+    def _invalidate(self, keys):
+        self._local_cache.delete_multi(keys)
+        self._client.publish(self._invalidator.channel, self._invalidator.make_message(keys))
+
+    def set_multi(self, mapping, ttl=0):
+        self._client.set_multi(mapping, ttl)
+        self._invalidate(mapping)
+        for key, val in mapping.iteritems():
+            self._local_cache.set(key, pickle.dumps(val), self._local_ttl(ttl))
+
+    def get_multi(self, keys):
+        values = {}
+        missing = []
+        for key in keys:
+            data = self._local_cache.get(key)
+            if data is None:
+                missing.append(key)
+            else:
+                values[key] = pickle.loads(data)
+        for key, (data, ttl) in self._client.get_raw_multi(missing).iteritems():
+            self._local_cache.set(key, data, self._local_ttl(ttl))
+            values[key] = pickle.loads(data)
+        return values
+
+    def delete_multi(self, keys):
+        self._client.delete_multi(keys)
+        self._invalidate(keys)
+
+    def add(self, key, val, ttl=0):
+        if not self._client.add(key, val, ttl):
+            return False
+        self._invalidate([key])
+        return True
+
+    def set(self, key, val, ttl=0):
+        self.set_multi({key: val}, ttl)
+
+    def get(self, key):
+        return self.get_multi([key]).get(key)
+
+    def delete(self, key):
+        self.delete_multi([key])
+
+
 class GenericCache(object):
     """A simple cache interface that supports various backends.
 
     The backends are accessed through the CacheClient interface.
+
+    :param namespace: The namespace of the cache entries
+    :param local: Whether to keep recently used entries in an
+                  in-process cache in addition to the Redis cache.
+                  Only use this for data where reading a value that
+                  is slightly outdated is acceptable.  The local
+                  cache is only used if :data:`CACHE_LOCAL_SIZE`
+                  is set and the ``redis`` backend is used.
     """
-    def __init__(self, namespace):
+    def __init__(self, namespace, local=False):
         self._client = None
         self._namespace = namespace
+        self._local = local
 
     def __repr__(self):
         return 'GenericCache(%r)' % self._namespace
@@ -273,23 +550,24 @@ class GenericCache(object):
         if self._client is not None:
             return
         # If not, we might have one from another instance
-        self._client = g.get('generic_cache_client', None)
-
-        if self._client is not None:
-            return
-
-        # If not, create a new one
-        backend = config.CACHE_BACKEND
-        if backend == 'memcached':
-            self._client = MemcachedCacheClient(config.MEMCACHED_SERVERS)
-        elif backend == 'redis':
-            self._client = RedisCacheClient(config.REDIS_CACHE_URL)
-        elif backend == 'files':
-            self._client = FileCacheClient(config.CACHE_DIR)
-        else:
-            self._client = NullCacheClient()
+        client = g.get('generic_cache_client', None)
+
+        if client is None:
+            # If not, create a new one
+            backend = config.CACHE_BACKEND
+            if backend == 'memcached':
+                client = MemcachedCacheClient(config.MEMCACHED_SERVERS)
+            elif backend == 'redis':
+                client = RedisCacheClient(config.REDIS_CACHE_URL)
+            elif backend == 'files':
+                client = FileCacheClient(config.CACHE_DIR)
+            else:
+                client = NullCacheClient()
+            g.generic_cache_client = client
 
-        g.generic_cache_client = self._client
+        if self._local and config.CACHE_LOCAL_SIZE and isinstance(client, RedisCacheClient):
+            client = LocalCacheClient(client, config.CACHE_LOCAL_TTL)
+        self._client = client
 
     def _hashKey(self, key):
         if hasattr(self._client, 'hash_key'):
@@ -304,6 +582,57 @@ class GenericCache(object):
         key = key.encode('utf-8')
         return '%s%s.%s' % (getattr(self._client, 'key_prefix', ''), self._namespace, self._hashKey(key))
 
+    def _get_batch(self):
+        if not has_request_context():
+            return None
+        batches = g.setdefault('generic_cache_batches', {})
+        return batches.setdefault(self._namespace, {'queued': set(), 'values': {}})
+
+    def _forget_batched(self, real_keys):
+        batch = self._get_batch()
+        if batch is None:
+            return
+        for real_key in real_keys:
+            batch['queued'].discard(real_key)
+            batch['values'].pop(real_key, None)
+
+    def _fetch_batched(self, real_key):
+        """Get a value from the request-level read batch.
+
+        If the key has been queued, all queued keys are retrieved
+        using a single `get_multi` call.
+
+        :return: A ``(found, value)`` tuple
+        """
+        batch = self._get_batch()
+        if batch is None:
+            return False, None
+        if real_key in batch['queued']:
+            real_keys = list(batch['queued'])
+            batch['queued'].clear()
+            data = self._client.get_multi(real_keys) or {}
+            Logger.get('cache.generic').debug('MGET %s (%d keys)', self._namespace, len(real_keys))
+            batch['values'].update((rk, data.get(rk)) for rk in real_keys)
+        if real_key not in batch['values']:
+            return False, None
+        return True, batch['values'][real_key]
+
+    def queue(self, *keys):
+        """Queue keys to be retrieved together during the current request.
+
+        The first time one of the queued keys is retrieved using :meth:`get`,
+        all keys queued in this namespace are fetched from the cache at once.
+        Outside a request context this method does nothing.
+
+        :param keys: the keys of the cache entries that will be retrieved
+        """
+        batch = self._get_batch()
+        if batch is None:
+            return
+        self._connect()
+        batch['queued'].update(real_key for real_key in map(self._makeKey, keys)
+                               if real_key not in batch['values'])
+
     def _processTime(self, ts):
         if isinstance(ts, datetime.timedelta):
             ts = ts.seconds + (ts.days * 24 * 3600)
@@ -319,17 +648,42 @@ class GenericCache(object):
         self._connect()
         time = self._processTime(time)
         Logger.get('cache.generic').debug('SET %s %r (%d)', self._namespace, key, time)
-        self._client.set(self._makeKey(key), _NoneValue.replace(val), time)
+        real_key = self._makeKey(key)
+        self._forget_batched([real_key])
+        self._client.set(real_key, _NoneValue.replace(val), time)
+
+    def add(self, key, val, time=0):
+        """Set key to val unless it already exists.
+
+        With the ``redis`` and ``memcached`` backends this is an atomic
+        operation and can thus be used for locking.
+
+        :param key: the key of the cache entry
+        :param val: any python object that can be pickled
+        :param time: number of seconds or a datetime.timedelta
+        :return: ``True`` if the value has been set, ``False`` if the
+                 key already existed.
+        """
+        self._connect()
+        time = self._processTime(time)
+        Logger.get('cache.generic').debug('ADD %s %r (%d)', self._namespace, key, time)
+        real_key = self._makeKey(key)
+        self._forget_batched([real_key])
+        return self._client.add(real_key, _NoneValue.replace(val), time)
 
     def set_multi(self, mapping, time=0):
         self._connect()
         time = self._processTime(time)
         mapping = dict(((self._makeKey(key), _NoneValue.replace(val)) for key, val in mapping.iteritems()))
+        self._forget_batched(mapping)
         self._client.set_multi(mapping, time)
 
     def get(self, key, default=None):
         self._connect()
-        res = self._client.get(self._makeKey(key))
+        real_key = self._makeKey(key)
+        found, res = self._fetch_batched(real_key)
+        if not found:
+            res = self._client.get(real_key)
         Logger.get('cache.generic').debug('GET %s %r (%s)', self._namespace, key, 'HIT' if res is not None else 'MISS')
         if res is None:
             return default
@@ -338,7 +692,7 @@ class GenericCache(object):
     def get_multi(self, keys, default=None, asdict=True):
         self._connect()
         real_keys = map(self._makeKey, keys)
-        data = self._client.get_multi(real_keys)
+        data = self._client.get_multi(real_keys) or {}
         # Add missing keys
         for real_key in real_keys:
             if real_key not in data:
@@ -353,9 +707,12 @@ class GenericCache(object):
     def delete(self, key):
         self._connect()
         Logger.get('cache.generic').debug('DEL %s %r', self._namespace, key)
-        self._client.delete(self._makeKey(key))
+        real_key = self._makeKey(key)
+        self._forget_batched([real_key])
+        self._client.delete(real_key)
 
     def delete_multi(self, keys):
         self._connect()
         keys = map(self._makeKey, keys)
+        self._forget_batched(keys)
         self._client.delete_multi(keys)
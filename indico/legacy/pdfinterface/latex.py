@@ -69,6 +69,15 @@ class PDFLaTeXBase(object):
         latex = LatexRunner(has_toc=self._table_of_contents)
         return latex.run(self.LATEX_TEMPLATE, **self._args)
 
+    def prepare(self):
+        """Render the LaTeX source without compiling it yet.
+
+        :return: A `LatexRunner` whose `compile` method creates the PDF
+        """
+        latex = LatexRunner(has_toc=self._table_of_contents)
+        latex.prepare(self.LATEX_TEMPLATE, **self._args)
+        return latex
+
 
 class LaTeXRuntimeException(Exception):
     def __init__(self, source_file, log_file):
@@ -172,30 +181,45 @@ class LatexRunner(object):
         font_dir = os.path.join(distribution.location, 'indico_fonts', '')  # XXX: trailing slash required
         return template.render(font_dir=font_dir, **kwargs)
 
-    def run(self, template_name, **kwargs):
+    def prepare(self, template_name, **kwargs):
+        """Render the LaTeX source of a document.
+
+        Only the `compile` step is expensive and it does not use the
+        database, so it can be run in a separate thread.  It still
+        requires an application context though.
+        """
         self._dir = tempfile.mkdtemp(prefix="indico-texgen-", dir=config.TEMP_DIR)
         chmod_umask(self._dir, execute=True)
-        source_filename = os.path.join(self._dir, template_name + '.tex')
-        target_filename = os.path.join(self._dir, template_name + '.pdf')
+        self.source_filename = os.path.join(self._dir, template_name + '.tex')
+        self.target_filename = os.path.join(self._dir, template_name + '.pdf')
+
+        self.source = self._render_template(template_name + '.tex', kwargs)
+        with codecs.open(self.source_filename, 'wb', encoding='utf-8') as f:
+            f.write(self.source)
 
-        source = self._render_template(template_name + '.tex', kwargs)
-        with codecs.open(source_filename, 'wb', encoding='utf-8') as f:
-            f.write(source)
+    def compile(self):
+        """Compile the document created by `prepare`.
 
+        :return: The path of the generated PDF file
+        """
         log_filename = os.path.join(self._dir, 'output.log')
         log_file = open(log_filename, 'a+')
         try:
-            self.run_latex(source_filename, log_file)
+            self.run_latex(self.source_filename, log_file)
             if self.has_toc:
-                self.run_latex(source_filename, log_file)
+                self.run_latex(self.source_filename, log_file)
         finally:
             log_file.close()
 
-            if not os.path.exists(target_filename):
+            if not os.path.exists(self.target_filename):
                 # something went terribly wrong, no LaTeX file was produced
-                raise LaTeXRuntimeException(source_filename, log_filename)
+                raise LaTeXRuntimeException(self.source_filename, log_filename)
 
-        return target_filename
+        return self.target_filename
+
+    def run(self, template_name, **kwargs):
+        self.prepare(template_name, **kwargs)
+        return self.compile()
 
 
 def extract_affiliations(contrib):
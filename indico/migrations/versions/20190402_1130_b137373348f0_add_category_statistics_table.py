@@ -0,0 +1,69 @@
+"""Add category statistics table
+
+Revision ID: b137373348f0
+Revises: fe73a07da0b4
+Create Date: 2019-04-02 11:30:12.319254
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+from indico.core.db.sqlalchemy import UTCDateTime
+
+
+# revision identifiers, used by Alembic.
+revision = 'b137373348f0'
+down_revision = 'fe73a07da0b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'statistics',
+        sa.Column('category_id', sa.Integer(), nullable=False, index=True, autoincrement=False),
+        sa.Column('year', sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column('events', sa.Integer(), nullable=False),
+        sa.Column('contributions', sa.Integer(), nullable=False),
+        sa.Column('attachments', sa.Integer(), nullable=False),
+        sa.Column('updated_dt', UTCDateTime, nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.categories.id']),
+        sa.PrimaryKeyConstraint('category_id', 'year'),
+        schema='categories'
+    )
+    op.execute('''
+        INSERT INTO categories.statistics (category_id, year, events, contributions, attachments, updated_dt)
+        SELECT category_id, year, SUM(events), SUM(contributions), SUM(attachments), now()
+        FROM (
+            SELECT e.category_id, extract(year FROM e.start_dt)::int AS year,
+                   COUNT(*) AS events, 0 AS contributions, 0 AS attachments
+            FROM events.events e
+            WHERE NOT e.is_deleted AND e.category_id IS NOT NULL
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT e.category_id, extract(year FROM tte.start_dt)::int, 0, COUNT(*), 0
+            FROM events.timetable_entries tte
+            JOIN events.events e ON (e.id = tte.event_id)
+            WHERE tte.type = 2 AND NOT e.is_deleted AND e.category_id IS NOT NULL
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT e.category_id, extract(year FROM e.start_dt)::int, 0, 0, COUNT(*)
+            FROM attachments.attachments a
+            JOIN attachments.folders f ON (f.id = a.folder_id)
+            JOIN events.events e ON (e.id = f.event_id)
+            LEFT JOIN events.sessions s ON (s.id = f.session_id)
+            LEFT JOIN events.contributions c ON (c.id = f.contribution_id)
+            LEFT JOIN events.subcontributions sc ON (sc.id = f.subcontribution_id)
+            LEFT JOIN events.contributions scc ON (scc.id = sc.contribution_id)
+            WHERE f.link_type != 1 AND NOT a.is_deleted AND NOT f.is_deleted AND NOT e.is_deleted AND
+                  e.category_id IS NOT NULL AND
+                  NOT COALESCE(s.is_deleted, c.is_deleted, sc.is_deleted, false) AND
+                  (scc.is_deleted IS NULL OR NOT scc.is_deleted)
+            GROUP BY 1, 2
+        ) stats
+        GROUP BY category_id, year
+    ''')
+
+
+def downgrade():
+    op.drop_table('statistics', schema='categories')
@@ -0,0 +1,25 @@
+"""Add GiST index for reservation occurrence time ranges
+
+Revision ID: 5d0a7e1c2b94
+Revises: b137373348f0
+Create Date: 2019-04-03 10:15:12.481203
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0a7e1c2b94'
+down_revision = 'b137373348f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_reservation_occurrences_tsrange', 'reservation_occurrences',
+                    [sa.text('tsrange(start_dt, end_dt)')], schema='roombooking', postgresql_using='gist')
+
+
+def downgrade():
+    op.drop_index('ix_reservation_occurrences_tsrange', table_name='reservation_occurrences', schema='roombooking')
@@ -0,0 +1,92 @@
+"""Add chain_ids column to categories
+
+Revision ID: a3f9c1d8e602
+Revises: 5d0a7e1c2b94
+Create Date: 2019-04-04 12:45:38.102718
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f9c1d8e602'
+down_revision = '5d0a7e1c2b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('categories', sa.Column('chain_ids', postgresql.ARRAY(sa.Integer()), nullable=True),
+                  schema='categories')
+    op.execute('''
+        WITH RECURSIVE chains(id, path) AS (
+            SELECT id, ARRAY[id]
+            FROM categories.categories
+            WHERE parent_id IS NULL
+
+            UNION ALL
+
+            SELECT cat.id, chains.path || cat.id
+            FROM categories.categories cat, chains
+            WHERE cat.parent_id = chains.id
+        )
+        UPDATE categories.categories cat
+        SET chain_ids = chains.path
+        FROM chains
+        WHERE chains.id = cat.id;
+    ''')
+    op.alter_column('categories', 'chain_ids', nullable=False, schema='categories')
+    op.create_index(None, 'categories', ['chain_ids'], schema='categories', postgresql_using='gin')
+    op.execute('''
+        CREATE FUNCTION categories.update_chain_ids() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+                RETURN NEW;
+            END IF;
+            IF NEW.parent_id IS NULL THEN
+                NEW.chain_ids := ARRAY[NEW.id];
+            ELSE
+                SELECT chain_ids || NEW.id INTO NEW.chain_ids
+                FROM categories.categories
+                WHERE id = NEW.parent_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $BODY$
+        LANGUAGE plpgsql;
+
+        CREATE FUNCTION categories.update_descendant_chain_ids() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            UPDATE categories.categories
+            SET chain_ids = NEW.chain_ids || chain_ids[cardinality(OLD.chain_ids) + 1:cardinality(chain_ids)]
+            WHERE chain_ids @> ARRAY[NEW.id] AND id != NEW.id;
+            RETURN NULL;
+        END;
+        $BODY$
+        LANGUAGE plpgsql;
+
+        CREATE TRIGGER update_chain_ids
+        BEFORE INSERT OR UPDATE OF parent_id
+        ON categories.categories
+        FOR EACH ROW
+        EXECUTE PROCEDURE categories.update_chain_ids();
+
+        CREATE TRIGGER update_descendant_chain_ids
+        AFTER UPDATE OF parent_id
+        ON categories.categories
+        FOR EACH ROW
+        WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE PROCEDURE categories.update_descendant_chain_ids();
+    ''')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER update_descendant_chain_ids ON categories.categories')
+    op.execute('DROP TRIGGER update_chain_ids ON categories.categories')
+    op.execute('DROP FUNCTION categories.update_descendant_chain_ids()')
+    op.execute('DROP FUNCTION categories.update_chain_ids()')
+    op.drop_column('categories', 'chain_ids', schema='categories')
@@ -0,0 +1,60 @@
+"""Add search vector to event log entries
+
+Revision ID: c8e2f4a9b371
+Revises: a3f9c1d8e602
+Create Date: 2019-04-05 14:10:27.530914
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2f4a9b371'
+down_revision = 'a3f9c1d8e602'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('logs', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True), schema='events')
+    op.execute('''
+        CREATE FUNCTION events.update_log_search_vector() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            NEW.search_vector := to_tsvector('simple', indico.indico_unaccent(concat_ws(' ',
+                NEW.module,
+                NEW.type,
+                NEW.summary,
+                (SELECT first_name || ' ' || last_name FROM users.users WHERE id = NEW.user_id),
+                NEW.data->>'body',
+                NEW.data->>'subject',
+                NEW.data->>'from',
+                NEW.data->>'to',
+                NEW.data->>'cc'
+            )));
+            RETURN NEW;
+        END;
+        $BODY$
+        LANGUAGE plpgsql;
+
+        CREATE TRIGGER update_search_vector
+        BEFORE INSERT OR UPDATE OF module, type, summary, user_id, data
+        ON events.logs
+        FOR EACH ROW
+        EXECUTE PROCEDURE events.update_log_search_vector();
+    ''')
+    # fire the trigger for all existing entries
+    op.execute('UPDATE events.logs SET module = module')
+    op.alter_column('logs', 'search_vector', nullable=False, schema='events')
+    op.create_index(None, 'logs', ['search_vector'], schema='events', postgresql_using='gin')
+    op.create_index(None, 'logs', ['event_id', 'logged_dt', 'id'], schema='events')
+
+
+def downgrade():
+    op.drop_index('ix_logs_event_id_logged_dt_id', table_name='logs', schema='events')
+    op.drop_index('ix_logs_search_vector', table_name='logs', schema='events')
+    op.execute('DROP TRIGGER update_search_vector ON events.logs')
+    op.execute('DROP FUNCTION events.update_log_search_vector()')
+    op.drop_column('logs', 'search_vector', schema='events')
@@ -16,7 +16,7 @@
 
 from __future__ import unicode_literals
 
-from flask import session
+from flask import g, session
 
 from indico.core import signals
 from indico.core.logger import Logger
@@ -42,6 +42,36 @@ def _import_tasks(sender, **kwargs):
     import indico.modules.categories.tasks
 
 
+def _schedule_stats_update(category_ids=(), event_ids=()):
+    from indico.modules.categories.tasks import category_stats_update
+    scheduled = g.setdefault('category_stats_scheduled', set())
+    items = {('category', x) for x in category_ids} | {('event', x) for x in event_ids if x is not None}
+    if items <= scheduled:
+        return
+    scheduled |= items
+    # events may still be modified in the same request; since they
+    # are not scheduled again we give this request time to finish
+    category_stats_update.apply_async((category_ids, event_ids), countdown=30)
+
+
+@signals.model_committed.connect
+def _model_committed(sender, obj, change, **kwargs):
+    from indico.modules.attachments import Attachment
+    from indico.modules.events import Event
+    from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
+    if sender is Event:
+        _schedule_stats_update(event_ids={obj.id})
+    elif sender is TimetableEntry and obj.type == TimetableEntryType.CONTRIBUTION:
+        _schedule_stats_update(event_ids={obj.event_id})
+    elif sender is Attachment:
+        _schedule_stats_update(event_ids={obj.folder.event_id})
+
+
+@signals.event.moved.connect
+def _event_moved(event, old_parent, **kwargs):
+    _schedule_stats_update(category_ids={old_parent.id})
+
+
 @signals.users.merged.connect
 def _merge_users(target, source, **kwargs):
     from indico.modules.categories.models.principals import CategoryPrincipal
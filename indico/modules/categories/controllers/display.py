@@ -16,6 +16,7 @@
 
 from __future__ import unicode_literals
 
+import hashlib
 from datetime import date, datetime, time, timedelta
 from functools import partial
 from io import BytesIO
@@ -53,7 +54,7 @@ from indico.util.fs import secure_filename
 from indico.util.i18n import _
 from indico.util.string import to_unicode
 from indico.web.flask.templating import get_template_module
-from indico.web.flask.util import send_file, url_for
+from indico.web.flask.util import add_validators, is_not_modified, make_not_modified_response, send_file, url_for
 from indico.web.rh import RH
 from indico.web.util import jsonify_data
 
@@ -438,7 +439,12 @@ class RHExportCategoryAtom(RHDisplayCategoryBase):
                                       url_for(request.endpoint, self.category, _external=True),
                                       session.user,
                                       Event.end_dt >= now_utc())
-        return send_file(filename, buf, 'application/atom+xml')
+        # the feed has no modification date, but its content only depends
+        # on the events in it so clients polling it can get a 304 response
+        etag = hashlib.sha1(buf.getvalue()).hexdigest()
+        if is_not_modified(etag, None):
+            return make_not_modified_response(etag, None)
+        return add_validators(send_file(filename, buf, 'application/atom+xml'), etag, None)
 
 
 class RHXMLExportCategoryInfo(RH):
@@ -117,3 +117,44 @@ def _create_check_cycles(sender, connection, **kwargs):
         LANGUAGE plpgsql
     """)
     DDL(sql).execute(connection)
+
+
+@signals.db_schema_created.connect_via('categories')
+def _create_update_chain_ids(sender, connection, **kwargs):
+    sql = textwrap.dedent("""
+        CREATE FUNCTION categories.update_chain_ids() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            IF TG_OP = 'UPDATE' AND NEW.parent_id IS NOT DISTINCT FROM OLD.parent_id THEN
+                RETURN NEW;
+            END IF;
+            IF NEW.parent_id IS NULL THEN
+                NEW.chain_ids := ARRAY[NEW.id];
+            ELSE
+                SELECT chain_ids || NEW.id INTO NEW.chain_ids
+                FROM categories.categories
+                WHERE id = NEW.parent_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $BODY$
+        LANGUAGE plpgsql
+    """)
+    DDL(sql).execute(connection)
+
+
+@signals.db_schema_created.connect_via('categories')
+def _create_update_descendant_chain_ids(sender, connection, **kwargs):
+    sql = textwrap.dedent("""
+        CREATE FUNCTION categories.update_descendant_chain_ids() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            UPDATE categories.categories
+            SET chain_ids = NEW.chain_ids || chain_ids[cardinality(OLD.chain_ids) + 1:cardinality(chain_ids)]
+            WHERE chain_ids @> ARRAY[NEW.id] AND id != NEW.id;
+            RETURN NULL;
+        END;
+        $BODY$
+        LANGUAGE plpgsql
+    """)
+    DDL(sql).execute(connection)
@@ -18,7 +18,7 @@ from __future__ import unicode_literals
 
 import pytz
 from sqlalchemy import DDL, orm
-from sqlalchemy.dialects.postgresql import ARRAY, JSON, array
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, aggregate_order_by, array
 from sqlalchemy.event import listens_for
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -86,6 +86,7 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
                 db.CheckConstraint("(id != 0) OR (protection_mode != {})".format(ProtectionMode.inheriting),
                                    'root_not_inheriting'),
                 db.CheckConstraint('visibility IS NULL OR visibility > 0', 'valid_visibility'),
+                db.Index(None, 'chain_ids', postgresql_using='gin'),
                 {'schema': 'categories'})
 
     @declared_attr
@@ -102,6 +103,15 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         index=True,
         nullable=True
     )
+    #: The ids of all categories from the root category down to (and
+    #: including) this category.  This is maintained by a database
+    #: trigger whenever a category is created or moved.
+    chain_ids = db.Column(
+        ARRAY(db.Integer),
+        nullable=False,
+        server_default=db.FetchedValue(),
+        server_onupdate=db.FetchedValue()
+    )
     is_deleted = db.Column(
         db.Boolean,
         nullable=False,
@@ -217,6 +227,7 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
     # - legacy_mapping (LegacyCategoryMapping.category)
     # - parent (Category.children)
     # - settings (CategorySetting.category)
+    # - statistics (CategoryStatistics.category)
     # - suggestions (SuggestedCategory.category)
 
     @hybrid_property
@@ -239,6 +250,13 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
     def protection_parent(self):
         return self.parent if not self.is_root else None
 
+    def _get_acl_cache_scope(self):
+        return [('Category', category_id) for category_id in self.chain_ids]
+
+    @classmethod
+    def _get_public_ids(cls, categories):
+        return cls._query_public_ids(categories)
+
     @locator_property
     def locator(self):
         return {'category_id': self.id}
@@ -304,37 +322,55 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
         self.position = (max(x.position for x in target.children) + 1) if target.children else 1
         self.parent = target
         db.session.flush()
+        # the chains of all subcategories have been updated by the database
+        for obj in db.session.identity_map.values():
+            if isinstance(obj, Category) and obj is not self:
+                db.session.expire(obj, ['chain_ids'])
         signals.category.moved.send(self, old_parent=old_parent)
 
     @classmethod
     def get_tree_cte(cls, col='id'):
-        """Create a CTE for the category tree.
+        """Create a subquery for the category tree.
 
-        The CTE contains the following columns:
+        The subquery contains the following columns:
 
         - ``id`` -- the category id
         - ``path`` -- an array containing the path from the root to
                       the category itself
         - ``is_deleted`` -- whether the category is deleted
 
+        Since the chain of each category is stored in `chain_ids`, this
+        does not need to recurse through the tree.  Whenever possible
+        you should query `chain_ids` directly though, as it is indexed.
+
         :param col: The name of the column to use in the path or a
                     callable receiving the category alias that must
                     return the expression used for the 'path'
                     retrieved by the CTE.
         """
+        path = cls.chain_ids if col == 'id' else cls._get_chain_path_query(cls, col)
+        return select([cls.id, path.label('path'), cls.is_deleted]).alias('category_tree')
+
+    @classmethod
+    def _get_chain_path_query(cls, category, col):
+        """Create a subquery for an array of values from a category chain.
+
+        :param category: The category (or category alias) whose chain
+                         is used
+        :param col: The name of the column to use in the array or a
+                    callable receiving the category alias of the chain
+                    element that must return the expression to use.
+        """
         cat_alias = db.aliased(cls)
         if callable(col):
             path_column = col(cat_alias)
         else:
             path_column = getattr(cat_alias, col)
-        cte_query = (select([cat_alias.id, array([path_column]).label('path'), cat_alias.is_deleted])
-                     .where(cat_alias.parent_id.is_(None))
-                     .cte(recursive=True))
-        rec_query = (select([cat_alias.id,
-                             cte_query.c.path.op('||')(path_column),
-                             cte_query.c.is_deleted | cat_alias.is_deleted])
-                     .where(cat_alias.parent_id == cte_query.c.id))
-        return cte_query.union_all(rec_query)
+        order = func.array_position(category.chain_ids, cat_alias.id)
+        return (select([func.array_agg(aggregate_order_by(path_column, order), type_=ARRAY(path_column.type))])
+                .where(category.chain_ids.any(cat_alias.id))
+                .correlate_except(cat_alias)
+                .as_scalar())
 
     @classmethod
     def get_protection_cte(cls):
@@ -379,22 +415,18 @@ class Category(SearchableTitleMixin, DescriptionMixin, ProtectionManagersMixin,
 
         This includes subcategories at any level of nesting.
         """
-        cte = Category.get_tree_cte()
-        return (Category.query
-                .join(cte, Category.id == cte.c.id)
-                .filter(cte.c.path.contains([self.id]),
-                        cte.c.id != self.id,
-                        ~cte.c.is_deleted))
+        return Category.query.filter(Category.chain_ids.contains([self.id]),
+                                     Category.id != self.id,
+                                     ~Category.is_deleted)
 
     @staticmethod
     def _get_chain_query(start_criterion):
-        cte_query = (select([Category.id, Category.parent_id, literal(0).label('level')])
-                     .where(start_criterion)
-                     .cte('category_chain', recursive=True))
-        parent_query = (select([Category.id, Category.parent_id, cte_query.c.level + 1])
-                        .where(Category.id == cte_query.c.parent_id))
-        cte_query = cte_query.union_all(parent_query)
-        return Category.query.join(cte_query, Category.id == cte_query.c.id).order_by(cte_query.c.level.desc())
+        chain_query = (select([func.unnest(Category.chain_ids)])
+                       .where(start_criterion)
+                       .correlate(None))
+        return (Category.query
+                .filter(Category.id.in_(chain_query))
+                .order_by(func.cardinality(Category.chain_ids)))
 
     @property
     def chain_query(self):
@@ -559,33 +591,32 @@ def _mappers_configured():
 
     # Category.chain_titles -- a list of the titles in the parent chain,
     # starting with the root category down to the current category.
-    cte = Category.get_tree_cte('title')
-    query = select([cte.c.path]).where(cte.c.id == Category.id).correlate_except(cte)
+    query = Category._get_chain_path_query(Category, 'title')
     Category.chain_titles = column_property(query, deferred=True)
 
     # Category.chain -- a list of the ids and titles in the parent
     # chain, starting with the root category down to the current
     # category.  Each chain entry is a dict containing 'id' and `title`.
-    cte = Category.get_tree_cte(lambda cat: db.func.json_build_object('id', cat.id, 'title', cat.title))
-    query = select([cte.c.path]).where(cte.c.id == Category.id).correlate_except(cte)
+    query = Category._get_chain_path_query(Category, lambda cat: db.func.json_build_object('id', cat.id,
+                                                                                           'title', cat.title))
     Category.chain = column_property(query, deferred=True)
 
     # Category.deep_events_count -- the number of events in the category
     # or any child category (excluding deleted events)
-    cte = Category.get_tree_cte()
-    crit = db.and_(cte.c.id == Event.category_id,
-                   cte.c.path.contains(array([Category.id])),
-                   ~cte.c.is_deleted,
+    cat_alias = db.aliased(Category)
+    crit = db.and_(cat_alias.id == Event.category_id,
+                   cat_alias.chain_ids.contains(array([Category.id])),
+                   ~cat_alias.is_deleted,
                    ~Event.is_deleted)
-    query = select([db.func.count()]).where(crit).correlate_except(Event)
+    query = select([db.func.count()]).where(crit).correlate_except(Event, cat_alias)
     Category.deep_events_count = column_property(query, deferred=True)
 
     # Category.deep_children_count -- the number of subcategories in the
     # category or any child category (excluding deleted ones)
-    cte = Category.get_tree_cte()
-    crit = db.and_(cte.c.path.contains(array([Category.id])),
-                   cte.c.id != Category.id, ~cte.c.is_deleted)
-    query = select([db.func.count()]).where(crit).correlate_except(cte)
+    cat_alias = db.aliased(Category)
+    crit = db.and_(cat_alias.chain_ids.contains(array([Category.id])),
+                   cat_alias.id != Category.id, ~cat_alias.is_deleted)
+    query = select([db.func.count()]).where(crit).correlate_except(cat_alias)
     Category.deep_children_count = column_property(query, deferred=True)
 
 
@@ -613,3 +644,22 @@ def _add_cycle_check_trigger(target, conn, **kw):
         EXECUTE PROCEDURE categories.check_cycles();
     """.format(table=target.fullname)
     DDL(sql).execute(conn)
+
+
+@listens_for(Category.__table__, 'after_create')
+def _add_chain_ids_triggers(target, conn, **kw):
+    sql = """
+        CREATE TRIGGER update_chain_ids
+        BEFORE INSERT OR UPDATE OF parent_id
+        ON {table}
+        FOR EACH ROW
+        EXECUTE PROCEDURE categories.update_chain_ids();
+
+        CREATE TRIGGER update_descendant_chain_ids
+        AFTER UPDATE OF parent_id
+        ON {table}
+        FOR EACH ROW
+        WHEN (OLD.parent_id IS DISTINCT FROM NEW.parent_id)
+        EXECUTE PROCEDURE categories.update_descendant_chain_ids();
+    """.format(table=target.fullname)
+    DDL(sql).execute(conn)
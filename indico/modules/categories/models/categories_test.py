@@ -129,6 +129,22 @@ def test_is_descendant_of(category_family):
     assert dad.is_descendant_of(grandpa)
 
 
+def test_chain_ids(category_family, create_category, db):
+    grandpa, dad, son, sibling = category_family
+    grandson = create_category(4, title='Grandson', parent=son)
+    db.session.flush()
+    assert grandson.chain_ids == [0, 1, 2, 4]
+    assert [c.id for c in grandson.chain_query] == [0, 1, 2, 4]
+    assert [c.id for c in grandson.parent_chain_query] == [0, 1, 2]
+    assert set(dad.deep_children_query) == {son, sibling, grandson}
+    son.move(sibling)
+    assert son.chain_ids == [0, 1, 3, 2]
+    assert grandson.chain_ids == [0, 1, 3, 2, 4]
+    assert grandson.chain_titles == ['Home', 'Dad', 'Sibling', 'Son', 'Grandson']
+    assert set(sibling.deep_children_query) == {son, grandson}
+    assert son.is_descendant_of(sibling)
+
+
 def test_visibility_horizon_default(category_family):
     grandpa, dad, son, sibling = category_family
 
@@ -0,0 +1,86 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from indico.core.db import db
+from indico.core.db.sqlalchemy import UTCDateTime
+from indico.util.date_time import now_utc
+from indico.util.string import format_repr, return_ascii
+
+
+class CategoryStatistics(db.Model):
+    """Precomputed statistics for the events in a category.
+
+    Each row contains the counts for one year and only includes
+    events directly inside the category.  To get the statistics
+    of a category including its subcategories, the rows of all
+    categories in the subtree need to be summed up.
+    """
+
+    __tablename__ = 'statistics'
+    __table_args__ = {'schema': 'categories'}
+
+    category_id = db.Column(
+        db.Integer,
+        db.ForeignKey('categories.categories.id'),
+        primary_key=True,
+        index=True,
+        autoincrement=False
+    )
+    year = db.Column(
+        db.Integer,
+        primary_key=True,
+        autoincrement=False
+    )
+    #: The number of events starting in this year
+    events = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The number of contributions scheduled in this year
+    contributions = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The number of attachments in events starting in this year
+    attachments = db.Column(
+        db.Integer,
+        nullable=False,
+        default=0
+    )
+    #: The date/time when the statistics were calculated
+    updated_dt = db.Column(
+        UTCDateTime,
+        nullable=False,
+        default=now_utc
+    )
+
+    category = db.relationship(
+        'Category',
+        lazy=True,
+        backref=db.backref(
+            'statistics',
+            lazy=True,
+            cascade='all, delete-orphan'
+        )
+    )
+
+    @return_ascii
+    def __repr__(self):
+        return format_repr(self, 'category_id', 'year', 'events', 'contributions', 'attachments')
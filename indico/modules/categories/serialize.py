@@ -17,7 +17,6 @@
 from __future__ import unicode_literals
 
 from io import BytesIO
-from itertools import ifilter
 
 import icalendar as ical
 from flask import session
@@ -28,14 +27,23 @@ from sqlalchemy.orm import joinedload, load_only, subqueryload, undefer
 from werkzeug.urls import url_parse
 
 from indico.core.config import config
+from indico.core.db import db
 from indico.modules.categories import Category
 from indico.modules.events import Event
 from indico.util.date_time import now_utc
+from indico.util.struct.iterables import grouper
+
+
+ICAL_CHUNK_SIZE = 500
 
 
 def serialize_categories_ical(category_ids, user, event_filter=True, event_filter_fn=None, update_query=None):
     """Export the events in a category to iCal
 
+    The events are loaded and serialized in chunks, so the returned
+    generator can be streamed to the client without ever keeping all
+    the events in memory.
+
     :param category_ids: Category IDs to export
     :param user: The user who needs to be able to access the events
     :param event_filter: A SQLalchemy criterion to restrict which
@@ -43,71 +51,91 @@ def serialize_categories_ical(category_ids, user, event_filter=True, event_filte
                          involving the start/end date of the event.
     :param event_filter_fn: A callable that determines which events to include (after querying)
     :param update_query: A callable that can update the query used to retrieve the events.
-                         Must return the updated query object.
+                         Must return the updated query object.  Since the events are loaded
+                         in chunks, it may only change the filtering, ordering, limit and
+                         offset of the query.
+    :return: A generator yielding the iCalendar data in chunks
     """
-    own_room_strategy = joinedload('own_room')
-    own_room_strategy.load_only('building', 'floor', 'number', 'name')
-    own_room_strategy.lazyload('owner')
-    own_venue_strategy = joinedload('own_venue').load_only('name')
-    query = (Event.query
+    query = (db.session.query(Event.id)
              .filter(Event.category_chain_overlaps(category_ids),
                      ~Event.is_deleted,
                      event_filter)
-             .options(load_only('id', 'category_id', 'start_dt', 'end_dt', 'title', 'description', 'own_venue_name',
-                                'own_room_name', 'protection_mode', 'access_key'),
-                      subqueryload('acl_entries'),
-                      joinedload('person_links'),
-                      own_room_strategy,
-                      own_venue_strategy)
              .order_by(Event.start_dt))
     if update_query:
         query = update_query(query)
-    it = iter(query)
+    event_ids = [event_id for event_id, in query]
+    return _iter_categories_ical(event_ids, user, event_filter_fn)
+
+
+def _iter_categories_ical(event_ids, user, event_filter_fn):
+    cal = ical.Calendar()
+    cal.add('version', '2.0')
+    cal.add('prodid', '-//CERN//INDICO//EN')
+    # the events are inserted right before the closing line of the empty calendar
+    footer = b'END:VCALENDAR\r\n'
+    yield cal.to_ical()[:-len(footer)]
+    now = now_utc(False)
+    for chunk in grouper(event_ids, ICAL_CHUNK_SIZE, skip_missing=True):
+        yield b''.join(_serialize_event_ical(event, now) for event in _get_ical_events(chunk, user, event_filter_fn))
+    yield footer
+
+
+def _get_ical_events(event_ids, user, event_filter_fn):
+    own_room_strategy = joinedload('own_room')
+    own_room_strategy.load_only('building', 'floor', 'number', 'name')
+    own_room_strategy.lazyload('owner')
+    own_venue_strategy = joinedload('own_venue').load_only('name')
+    events = (Event.query
+              .filter(Event.id.in_(event_ids))
+              .options(load_only('id', 'category_id', 'start_dt', 'end_dt', 'title', 'description', 'own_venue_name',
+                                 'own_room_name', 'protection_mode', 'access_key'),
+                       subqueryload('acl_entries'),
+                       joinedload('person_links'),
+                       own_room_strategy,
+                       own_venue_strategy)
+              .all())
+    # keep the order in which the event ids were queried
+    positions = {event_id: i for i, event_id in enumerate(event_ids)}
+    events.sort(key=lambda e: positions[e.id])
     if event_filter_fn:
-        it = ifilter(event_filter_fn, it)
-    events = list(it)
+        events = filter(event_filter_fn, events)
     # make sure the parent categories are in sqlalchemy's identity cache.
     # this avoids query spam from `protection_parent` lookups
     _parent_categs = (Category._get_chain_query(Category.id.in_({e.category_id for e in events}))
                       .options(load_only('id', 'parent_id', 'protection_mode'),
                                joinedload('acl_entries'))
                       .all())
-    cal = ical.Calendar()
-    cal.add('version', '2.0')
-    cal.add('prodid', '-//CERN//INDICO//EN')
-
-    now = now_utc(False)
-    for event in events:
-        if not event.can_access(user):
-            continue
-        location = ('{} ({})'.format(event.room_name, event.venue_name)
-                    if event.venue_name and event.room_name
-                    else (event.venue_name or event.room_name))
-        cal_event = ical.Event()
-        cal_event.add('uid', u'indico-event-{}@{}'.format(event.id, url_parse(config.BASE_URL).host))
-        cal_event.add('dtstamp', now)
-        cal_event.add('dtstart', event.start_dt)
-        cal_event.add('dtend', event.end_dt)
-        cal_event.add('url', event.external_url)
-        cal_event.add('summary', event.title)
-        cal_event.add('location', location)
-        description = []
-        if event.person_links:
-            speakers = [u'{} ({})'.format(x.full_name, x.affiliation) if x.affiliation else x.full_name
-                        for x in event.person_links]
-            description.append(u'Speakers: {}'.format(u', '.join(speakers)))
-
-        if event.description:
-            desc_text = unicode(event.description) or u'<p/>'  # get rid of RichMarkup
-            try:
-                description.append(unicode(html.fromstring(desc_text).text_content()))
-            except ParserError:
-                # this happens e.g. if desc_text contains only a html comment
-                pass
-        description.append(event.external_url)
-        cal_event.add('description', u'\n'.join(description))
-        cal.add_component(cal_event)
-    return BytesIO(cal.to_ical())
+    return Event.filter_accessible(events, user)
+
+
+def _serialize_event_ical(event, now):
+    location = ('{} ({})'.format(event.room_name, event.venue_name)
+                if event.venue_name and event.room_name
+                else (event.venue_name or event.room_name))
+    cal_event = ical.Event()
+    cal_event.add('uid', u'indico-event-{}@{}'.format(event.id, url_parse(config.BASE_URL).host))
+    cal_event.add('dtstamp', now)
+    cal_event.add('dtstart', event.start_dt)
+    cal_event.add('dtend', event.end_dt)
+    cal_event.add('url', event.external_url)
+    cal_event.add('summary', event.title)
+    cal_event.add('location', location)
+    description = []
+    if event.person_links:
+        speakers = [u'{} ({})'.format(x.full_name, x.affiliation) if x.affiliation else x.full_name
+                    for x in event.person_links]
+        description.append(u'Speakers: {}'.format(u', '.join(speakers)))
+
+    if event.description:
+        desc_text = unicode(event.description) or u'<p/>'  # get rid of RichMarkup
+        try:
+            description.append(unicode(html.fromstring(desc_text).text_content()))
+        except ParserError:
+            # this happens e.g. if desc_text contains only a html comment
+            pass
+    description.append(event.external_url)
+    cal_event.add('description', u'\n'.join(description))
+    return cal_event.to_ical()
 
 
 def serialize_category_atom(category, url, user, event_filter):
@@ -128,7 +156,7 @@ def serialize_category_atom(category, url, user, event_filter):
                                 'access_key'),
                       subqueryload('acl_entries'))
              .order_by(Event.start_dt))
-    events = [e for e in query if e.can_access(user)]
+    events = Event.filter_accessible(query, user)
 
     feed = AtomFeed(feed_url=url, title='Indico Feed [{}]'.format(category.title))
     for event in events:
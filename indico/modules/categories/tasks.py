@@ -24,6 +24,7 @@ from indico.core.celery import celery
 from indico.core.config import config
 from indico.core.db import db
 from indico.modules.categories import Category, logger
+from indico.modules.categories.util import update_category_stats
 from indico.modules.users import User, UserSetting
 from indico.modules.users.models.suggestions import SuggestedCategory
 from indico.modules.users.util import get_related_categories
@@ -84,3 +85,35 @@ def category_cleanup():
             if i % 100 == 0:
                 db.session.commit()
         db.session.commit()
+
+
+@celery.periodic_task(name='category_stats', run_every=crontab(minute='0', hour='3'))
+def category_stats():
+    """Recalculate the statistics of all categories.
+
+    The statistics are usually updated whenever something changes,
+    but recalculating them regularly ensures that they never stay
+    incorrect e.g. when changes are made directly in the database.
+    """
+    update_category_stats()
+    db.session.commit()
+
+
+@celery.task(name='category_stats_update')
+def category_stats_update(category_ids=(), event_ids=()):
+    """Recalculate the statistics of some categories.
+
+    :param category_ids: The IDs of the categories to update
+    :param event_ids: The IDs of events whose categories should be
+                      updated
+    """
+    from indico.modules.events import Event
+    category_ids = set(category_ids)
+    if event_ids:
+        category_ids |= {category_id
+                         for category_id, in (db.session.query(Event.category_id)
+                                              .filter(Event.id.in_(event_ids),
+                                                      Event.category_id.isnot(None)))}
+    logger.debug('Updating statistics of categories %r', category_ids)
+    update_category_stats(category_ids)
+    db.session.commit()
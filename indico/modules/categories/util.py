@@ -16,7 +16,7 @@
 
 from __future__ import unicode_literals
 
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from datetime import timedelta
 
 from pytz import timezone
@@ -29,7 +29,8 @@ from indico.core.db.sqlalchemy.links import LinkType
 from indico.core.db.sqlalchemy.protection import ProtectionMode
 from indico.modules.attachments import Attachment
 from indico.modules.attachments.models.folders import AttachmentFolder
-from indico.modules.categories import upcoming_events_settings
+from indico.modules.categories import Category, upcoming_events_settings
+from indico.modules.categories.models.statistics import CategoryStatistics
 from indico.modules.events import Event
 from indico.modules.events.contributions import Contribution
 from indico.modules.events.contributions.models.subcontributions import SubContribution
@@ -42,92 +43,123 @@ from indico.util.i18n import _, ngettext
 from indico.util.struct.iterables import materialize_iterable
 
 
-def get_events_by_year(category_id=None):
-    """Get the number of events for each year.
+def _get_events_by_year(category_filter):
+    year = db.cast(db.extract('year', Event.start_dt), db.Integer)
+    return (db.session
+            .query(Event.category_id, year, db.func.count())
+            .filter(~Event.is_deleted,
+                    category_filter)
+            .group_by(Event.category_id, year))
 
-    :param category_id: The category ID to get statistics for. Events
-                        from subcategories are also included.
-    :return: An `OrderedDict` mapping years to event counts.
-    """
-    category_filter = Event.category_chain_overlaps(category_id) if category_id else True
-    query = (db.session
-             .query(db.cast(db.extract('year', Event.start_dt), db.Integer).label('year'),
-                    db.func.count())
-             .filter(~Event.is_deleted,
-                     category_filter)
-             .order_by('year')
-             .group_by('year'))
-    return OrderedDict(query)
 
+def _get_contribs_by_year(category_filter):
+    year = db.cast(db.extract('year', TimetableEntry.start_dt), db.Integer)
+    return (db.session
+            .query(Event.category_id, year, db.func.count())
+            .join(TimetableEntry.event)
+            .filter(TimetableEntry.type == TimetableEntryType.CONTRIBUTION,
+                    ~Event.is_deleted,
+                    category_filter)
+            .group_by(Event.category_id, year))
 
-def get_contribs_by_year(category_id=None):
-    """Get the number of contributions for each year.
 
-    :param category_id: The category ID to get statistics for.
-                        Contributions from subcategories are also
-                        included.
-    :return: An `OrderedDict` mapping years to contribution counts.
+def _get_attachments_by_year(category_filter):
+    year = db.cast(db.extract('year', Event.start_dt), db.Integer)
+    subcontrib_contrib = db.aliased(Contribution)
+    return (db.session
+            .query(Event.category_id, year, db.func.count(Attachment.id))
+            .join(Attachment.folder)
+            .join(AttachmentFolder.event)
+            .outerjoin(AttachmentFolder.session)
+            .outerjoin(AttachmentFolder.contribution)
+            .outerjoin(AttachmentFolder.subcontribution)
+            .outerjoin(subcontrib_contrib, subcontrib_contrib.id == SubContribution.contribution_id)
+            .filter(AttachmentFolder.link_type != LinkType.category,
+                    ~Attachment.is_deleted,
+                    ~AttachmentFolder.is_deleted,
+                    ~Event.is_deleted,
+                    # we have exactly one of those or none if the attachment is on the event itself
+                    ~db.func.coalesce(Session.is_deleted, Contribution.is_deleted, SubContribution.is_deleted, False),
+                    # in case of a subcontribution we also need to check that the contrib is not deleted
+                    (subcontrib_contrib.is_deleted.is_(None) | ~subcontrib_contrib.is_deleted),
+                    category_filter)
+            .group_by(Event.category_id, year))
+
+
+def update_category_stats(category_ids=None):
+    """Recalculate the precomputed category statistics.
+
+    Only the counts of events directly inside the categories are
+    recalculated; the statistics of a category containing the
+    subcategories are calculated from these when reading them.
+
+    :param category_ids: The IDs of the categories to update.  If
+                         not specified, the statistics of all
+                         categories are recalculated.
     """
-    category_filter = Event.category_chain_overlaps(category_id) if category_id else True
-    query = (db.session
-             .query(db.cast(db.extract('year', TimetableEntry.start_dt), db.Integer).label('year'),
-                    db.func.count())
-             .join(TimetableEntry.event)
-             .filter(TimetableEntry.type == TimetableEntryType.CONTRIBUTION,
-                     ~Event.is_deleted,
-                     category_filter)
-             .order_by('year')
-             .group_by('year'))
-    return OrderedDict(query)
-
+    if category_ids is None:
+        category_filter = Event.category_id.isnot(None)
+        stats_filter = True
+    elif not category_ids:
+        return
+    else:
+        category_filter = Event.category_id.in_(category_ids)
+        stats_filter = CategoryStatistics.category_id.in_(category_ids)
+    stats = defaultdict(lambda: {'events': 0, 'contributions': 0, 'attachments': 0})
+    for name, query in (('events', _get_events_by_year(category_filter)),
+                        ('contributions', _get_contribs_by_year(category_filter)),
+                        ('attachments', _get_attachments_by_year(category_filter))):
+        for category_id, year, count in query:
+            stats[category_id, year][name] = count
+    CategoryStatistics.query.filter(stats_filter).delete(synchronize_session='fetch')
+    now = now_utc()
+    rows = [dict(counts, category_id=category_id, year=year, updated_dt=now)
+            for (category_id, year), counts in stats.iteritems()]
+    if rows:
+        db.session.execute(CategoryStatistics.__table__.insert(), rows)
+    db.session.flush()
 
-def get_attachment_count(category_id=None):
-    """Get the number of attachments in events in a category.
 
-    :param category_id: The category ID to get statistics for.
-                        Attachments from subcategories are also
-                        included.
-    :return: The number of attachments
-    """
-    category_filter = Event.category_chain_overlaps(category_id) if category_id else True
-    subcontrib_contrib = db.aliased(Contribution)
-    query = (db.session
-             .query(db.func.count(Attachment.id))
-             .join(Attachment.folder)
-             .join(AttachmentFolder.event)
-             .outerjoin(AttachmentFolder.session)
-             .outerjoin(AttachmentFolder.contribution)
-             .outerjoin(AttachmentFolder.subcontribution)
-             .outerjoin(subcontrib_contrib, subcontrib_contrib.id == SubContribution.contribution_id)
-             .filter(AttachmentFolder.link_type != LinkType.category,
-                     ~Attachment.is_deleted,
-                     ~AttachmentFolder.is_deleted,
-                     ~Event.is_deleted,
-                     # we have exactly one of those or none if the attachment is on the event itself
-                     ~db.func.coalesce(Session.is_deleted, Contribution.is_deleted, SubContribution.is_deleted, False),
-                     # in case of a subcontribution we also need to check that the contrib is not deleted
-                     (subcontrib_contrib.is_deleted.is_(None) | ~subcontrib_contrib.is_deleted),
-                     category_filter))
-    return query.scalar()
-
-
-@memoize_redis(86400)
 def get_category_stats(category_id=None):
     """Get category statistics.
 
-    This function is mainly a helper so we can get and cache
-    all values at once and keep a last-update timestamp.
+    The statistics are calculated from the precomputed statistics
+    stored in :class:`CategoryStatistics`, which are updated by a
+    Celery task whenever events in a category change.
 
     :param category_id: The category ID to get statistics for.
                         Subcategories are also included.
     """
-    return {'events_by_year': get_events_by_year(category_id),
-            'contribs_by_year': get_contribs_by_year(category_id),
-            'attachments': get_attachment_count(category_id),
-            'updated': now_utc()}
-
-
-@memoize_redis(3600)
+    query = (db.session
+             .query(CategoryStatistics.year,
+                    db.func.sum(CategoryStatistics.events),
+                    db.func.sum(CategoryStatistics.contributions),
+                    db.func.sum(CategoryStatistics.attachments),
+                    db.func.max(CategoryStatistics.updated_dt))
+             .group_by(CategoryStatistics.year)
+             .order_by(CategoryStatistics.year))
+    if category_id is not None:
+        query = (query
+                 .join(Category, Category.id == CategoryStatistics.category_id)
+                 .filter(Category.chain_ids.contains([category_id])))
+    events_by_year = OrderedDict()
+    contribs_by_year = OrderedDict()
+    attachments = 0
+    updated = None
+    for year, events, contribs, year_attachments, year_updated in query:
+        if events:
+            events_by_year[year] = events
+        if contribs:
+            contribs_by_year[year] = contribs
+        attachments += year_attachments
+        updated = max(updated, year_updated) if updated else year_updated
+    return {'events_by_year': events_by_year,
+            'contribs_by_year': contribs_by_year,
+            'attachments': attachments,
+            'updated': updated or now_utc()}
+
+
+@memoize_redis(3600, single_flight=True, stale_ttl=3600)
 @materialize_iterable()
 def get_upcoming_events():
     """Get the global list of upcoming events"""
@@ -0,0 +1,57 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+from pytz import utc
+
+from indico.modules.categories.models.statistics import CategoryStatistics
+from indico.modules.categories.util import get_category_stats, update_category_stats
+
+
+def _dt(year):
+    return datetime(year, 1, 1, 12, 0, tzinfo=utc)
+
+
+def test_category_stats(db, create_category, create_event):
+    cat = create_category(1, title='cat')
+    subcat = create_category(2, title='subcat', parent=cat)
+    other = create_category(3, title='other')
+    create_event(start_dt=_dt(2017), end_dt=_dt(2017), category=cat)
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=subcat)
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=subcat)
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=other)
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=cat, is_deleted=True)
+    update_category_stats()
+    assert CategoryStatistics.query.count() == 3
+    assert dict(get_category_stats(cat.id)['events_by_year']) == {2017: 1, 2018: 2}
+    assert dict(get_category_stats(subcat.id)['events_by_year']) == {2018: 2}
+    assert dict(get_category_stats()['events_by_year']) == {2017: 1, 2018: 3}
+
+
+def test_category_stats_partial_update(db, create_category, create_event):
+    cat = create_category(1, title='cat')
+    other = create_category(2, title='other')
+    create_event(start_dt=_dt(2017), end_dt=_dt(2017), category=cat)
+    update_category_stats()
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=cat)
+    create_event(start_dt=_dt(2018), end_dt=_dt(2018), category=other)
+    update_category_stats([cat.id])
+    assert dict(get_category_stats(cat.id)['events_by_year']) == {2017: 1, 2018: 1}
+    assert dict(get_category_stats(other.id)['events_by_year']) == {}
+    assert get_category_stats(other.id)['attachments'] == 0
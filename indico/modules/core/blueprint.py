@@ -17,7 +17,8 @@
 from __future__ import unicode_literals
 
 from indico.modules.core.controllers import (RHChangeLanguage, RHChangeTimezone, RHContact, RHPrincipals, RHReportError,
-                                             RHReportErrorAPI, RHSettings, RHVersionCheck)
+                                             RHReportErrorAPI, RHSettings, RHVersionCheck, export_metrics,
+                                             export_stack_samples)
 from indico.web.flask.util import redirect_view
 from indico.web.flask.wrappers import IndicoBlueprint
 
@@ -42,3 +43,7 @@ _bp.add_url_rule('/report-error/api/<error_id>', 'report_error_api', RHReportErr
 
 # Allow loadbalancers etc to easily check whether the service is alive
 _bp.add_url_rule('/ping', 'ping', lambda: ('', 204))
+
+# Local monitoring of request latencies and hot code paths
+_bp.add_url_rule('/metrics', 'metrics', export_metrics)
+_bp.add_url_rule('/metrics/stacks', 'stack_samples', export_stack_samples)
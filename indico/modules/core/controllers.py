@@ -17,9 +17,10 @@
 from __future__ import unicode_literals
 
 import re
+from ipaddress import ip_address
 
 import requests
-from flask import flash, jsonify, redirect, request, session
+from flask import current_app, flash, jsonify, redirect, request, session
 from packaging.version import Version
 from pkg_resources import DistributionNotFound, get_distribution
 from pytz import common_timezones_set
@@ -43,6 +44,8 @@ from indico.modules.core.views import WPContact, WPSettings
 from indico.util.i18n import _, get_all_locales
 from indico.util.marshmallow import PrincipalList
 from indico.web.errors import load_error_data
+from indico.web.flask.profiler import render_stack_samples
+from indico.web.flask.stats import render_request_metrics
 from indico.web.flask.templating import get_template_module
 from indico.web.flask.util import url_for
 from indico.web.forms.base import FormDefaults
@@ -258,3 +261,26 @@ class RHPrincipals(RHProtected):
     })
     def _process(self, values):
         return jsonify({x.identifier: self._serialize_principal(x) for x in values})
+
+
+def _require_local_request():
+    if not request.remote_addr or not ip_address(unicode(request.remote_addr)).is_loopback:
+        raise NotFound
+
+
+def export_metrics():
+    """Export the request latency histograms in the Prometheus format.
+
+    Only requests from the server itself may access the metrics.
+    """
+    _require_local_request()
+    return current_app.response_class(render_request_metrics(), mimetype='text/plain')
+
+
+def export_stack_samples():
+    """Export the stacks sampled by the profiler in the folded format.
+
+    Only requests from the server itself may access the samples.
+    """
+    _require_local_request()
+    return current_app.response_class(render_stack_samples(), mimetype='text/plain')
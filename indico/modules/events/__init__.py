@@ -21,12 +21,14 @@ from werkzeug.exceptions import BadRequest, NotFound
 
 from indico.core import signals
 from indico.core.db.sqlalchemy.principals import PrincipalType
+from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
 from indico.core.logger import Logger
 from indico.core.permissions import ManagementPermission, check_permissions, get_available_permissions
 from indico.modules.events.cloning import get_event_cloners
 from indico.modules.events.logs import EventLogKind, EventLogRealm
 from indico.modules.events.models.events import Event
 from indico.modules.events.models.legacy_mapping import LegacyEventMapping
+from indico.modules.events.models.settings import EventSetting
 from indico.util.i18n import _, ngettext, orig_string
 from indico.util.string import is_legacy_id
 from indico.web.flask.templating import template_hook
@@ -58,6 +60,12 @@ event_management_object_url_prefixes = {
 }
 
 
+@signals.model_committed.connect_via(EventSetting)
+def _event_setting_committed(sender, obj, change, **kwargs):
+    # settings such as the session coordinator privileges affect management permissions
+    invalidate_acl_cache(Event.get(obj.event_id))
+
+
 @signals.users.merged.connect
 def _merge_users(target, source, **kwargs):
     from indico.modules.events.models.persons import EventPerson
@@ -81,23 +81,25 @@ def generate_spreadsheet_from_abstracts(abstracts, static_item_ids, dynamic_item
     ])
     field_names.extend(unique_col(item.title, item.id) for item in dynamic_items)
     field_names.extend(title for name, (title, fn) in static_item_mapping.iteritems() if name in static_item_ids)
-    rows = []
-    for abstract in abstracts:
-        data = abstract.data_by_field
-        abstract_dict = {
-            'Id': abstract.friendly_id,
-            'Title': abstract.title
-        }
-        for item in dynamic_items:
-            key = unique_col(item.title, item.id)
-            abstract_dict[key] = data[item.id].friendly_data if item.id in data else ''
-        for name, (title, fn) in static_item_mapping.iteritems():
-            if name not in static_item_ids:
-                continue
-            value = fn(abstract)
-            abstract_dict[title] = value
-        rows.append(abstract_dict)
-    return field_names, rows
+
+    def _iter_rows():
+        for abstract in abstracts:
+            data = abstract.data_by_field
+            abstract_dict = {
+                'Id': abstract.friendly_id,
+                'Title': abstract.title
+            }
+            for item in dynamic_items:
+                key = unique_col(item.title, item.id)
+                abstract_dict[key] = data[item.id].friendly_data if item.id in data else ''
+            for name, (title, fn) in static_item_mapping.iteritems():
+                if name not in static_item_ids:
+                    continue
+                value = fn(abstract)
+                abstract_dict[title] = value
+            yield abstract_dict
+
+    return field_names, _iter_rows()
 
 
 @no_autoflush
@@ -18,6 +18,7 @@ import fnmatch
 import re
 from datetime import datetime
 from hashlib import md5
+from itertools import ifilter
 from operator import attrgetter
 
 import pytz
@@ -472,7 +473,7 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
                              Event.happens_between(self._fromDT, self._toDT))
                      .options(*self._get_query_options(self._detail_level)))
         query = self._update_query(query)
-        return self.serialize_events(x for x in query if self._filter_event(x) and x.can_access(self.user))
+        return self.serialize_events(Event.filter_accessible(ifilter(self._filter_event, query), self.user))
 
     def category_extra(self, ids):
         if self._toDT is None:
@@ -491,7 +492,7 @@ class CategoryEventFetcher(IteratedDataFetcher, SerializerBase):
                             Event.happens_between(self._fromDT, self._toDT))
                  .options(*self._get_query_options(self._detail_level)))
         query = self._update_query(query)
-        return self.serialize_events(x for x in query if self._filter_event(x) and x.can_access(self.user))
+        return self.serialize_events(Event.filter_accessible(ifilter(self._filter_event, query), self.user))
 
     def _filter_event(self, event):
         if self._room or self._location or self._eventType:
@@ -107,30 +107,32 @@ def generate_spreadsheet_from_contributions(contributions):
     contribution values"""
 
     headers = ['Id', 'Title', 'Description', 'Date', 'Duration', 'Type', 'Session', 'Track', 'Presenters', 'Materials']
-    rows = []
-    for c in sorted(contributions, key=attrgetter('friendly_id')):
-        contrib_data = {'Id': c.friendly_id, 'Title': c.title, 'Description': c.description,
-                        'Duration': format_human_timedelta(c.duration),
-                        'Date': c.timetable_entry.start_dt if c.timetable_entry else None,
-                        'Type': c.type.name if c.type else None,
-                        'Session': c.session.title if c.session else None,
-                        'Track': c.track.title if c.track else None,
-                        'Materials': None,
-                        'Presenters': ', '.join(speaker.full_name for speaker in c.speakers)}
-
-        attachments = []
-        attached_items = get_attached_items(c)
-        for attachment in attached_items.get('files', []):
-            attachments.append(attachment.absolute_download_url)
-
-        for folder in attached_items.get('folders', []):
-            for attachment in folder.attachments:
+
+    def _iter_rows():
+        for c in sorted(contributions, key=attrgetter('friendly_id')):
+            contrib_data = {'Id': c.friendly_id, 'Title': c.title, 'Description': c.description,
+                            'Duration': format_human_timedelta(c.duration),
+                            'Date': c.timetable_entry.start_dt if c.timetable_entry else None,
+                            'Type': c.type.name if c.type else None,
+                            'Session': c.session.title if c.session else None,
+                            'Track': c.track.title if c.track else None,
+                            'Materials': None,
+                            'Presenters': ', '.join(speaker.full_name for speaker in c.speakers)}
+
+            attachments = []
+            attached_items = get_attached_items(c)
+            for attachment in attached_items.get('files', []):
                 attachments.append(attachment.absolute_download_url)
 
-        if attachments:
-            contrib_data['Materials'] = ', '.join(attachments)
-        rows.append(contrib_data)
-    return headers, rows
+            for folder in attached_items.get('folders', []):
+                for attachment in folder.attachments:
+                    attachments.append(attachment.absolute_download_url)
+
+            if attachments:
+                contrib_data['Materials'] = ', '.join(attachments)
+            yield contrib_data
+
+    return headers, _iter_rows()
 
 
 def make_contribution_form(event):
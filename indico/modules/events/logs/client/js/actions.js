@@ -87,8 +87,8 @@ export function viewNextEntry() {
     };
 }
 
-export function updateEntries(entries, pages, totalPageCount) {
-    return {type: UPDATE_ENTRIES, entries, pages, totalPageCount};
+export function updateEntries(entries, hasMore) {
+    return {type: UPDATE_ENTRIES, entries, hasMore};
 }
 
 export function fetchStarted() {
@@ -104,17 +104,19 @@ export function fetchLogEntries() {
         dispatch(fetchStarted());
 
         const {
-            logs: {filters, keyword, currentPage},
+            logs: {filters, keyword, currentPage, cursors},
             staticData: {fetchLogsUrl},
         } = getStore();
 
         const params = {
-            page: currentPage,
             filters: [],
         };
         if (keyword) {
             params.q = keyword;
         }
+        if (cursors[currentPage - 1] !== null) {
+            params.before = cursors[currentPage - 1];
+        }
 
         Object.entries(filters).forEach(([item, active]) => {
             if (active) {
@@ -130,7 +132,7 @@ export function fetchLogEntries() {
             dispatch(fetchFailed());
             return;
         }
-        const {entries, pages, total_page_count: totalPageCount} = response.data;
-        dispatch(updateEntries(entries, pages, totalPageCount));
+        const {entries, has_more: hasMore} = response.data;
+        dispatch(updateEntries(entries, hasMore));
     };
 }
@@ -30,6 +30,9 @@ const initialState = {
         participants: true,
         reviewing: true
     },
+    // the id of the last entry of each known page, used to load the
+    // following page (the first page does not need one)
+    cursors: [null],
     pages: [],
     totalPageCount: 0,
     currentViewIndex: null
@@ -38,19 +41,28 @@ const initialState = {
 export default function logReducer(state = initialState, action) {
     switch (action.type) {
         case actions.SET_KEYWORD:
-            return {...state, keyword: action.keyword};
+            return {...state, keyword: action.keyword, cursors: [null]};
         case actions.SET_FILTER:
-            return {...state, filters: {...state.filters, ...action.filter}};
+            return {...state, filters: {...state.filters, ...action.filter}, cursors: [null]};
         case actions.SET_PAGE:
             return {...state, currentPage: action.currentPage};
-        case actions.UPDATE_ENTRIES:
+        case actions.UPDATE_ENTRIES: {
+            let cursors = state.cursors.slice(0, state.currentPage);
+            if (action.hasMore) {
+                const lastId = action.entries[action.entries.length - 1].id;
+                // keep the following pages we already know about unless this page changed
+                cursors = state.cursors[state.currentPage] === lastId ? state.cursors : [...cursors, lastId];
+            }
+            const pages = cursors.map((cursor, index) => index + 1);
             return {
                 ...state,
                 entries: action.entries,
-                pages: action.pages,
-                totalPageCount: action.totalPageCount,
+                cursors,
+                pages,
+                totalPageCount: pages.length,
                 isFetching: false,
             };
+        }
         case actions.FETCH_STARTED:
             return {...state, isFetching: true};
         case actions.FETCH_FAILED:
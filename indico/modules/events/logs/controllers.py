@@ -17,6 +17,7 @@
 from __future__ import unicode_literals
 
 from flask import jsonify, request
+from werkzeug.exceptions import NotFound
 
 from indico.core.db import db
 from indico.core.db.sqlalchemy.util.queries import preprocess_ts_string
@@ -29,11 +30,6 @@ from indico.modules.events.management.controllers import RHManageEventBase
 LOG_PAGE_SIZE = 15
 
 
-def _contains(field, text):
-    return (db.func.to_tsvector('simple', db.func.indico.indico_unaccent(field))
-            .match(db.func.indico.indico_unaccent(preprocess_ts_string(text)), postgresql_regconfig='simple'))
-
-
 class RHEventLogs(RHManageEventBase):
     """Shows the modification/action log for the event"""
 
@@ -44,32 +40,34 @@ class RHEventLogs(RHManageEventBase):
 
 class RHEventLogsJSON(RHManageEventBase):
     def _process(self):
-        page = int(request.args.get('page', 1))
         filters = request.args.getlist('filters')
         text = request.args.get('q')
+        before_id = request.args.get('before', type=int)
 
         if not filters:
-            return jsonify(current_page=1, pages=[], entries=[], total_page_count=0)
+            return jsonify(entries=[], has_more=False)
 
-        query = self.event.log_entries.order_by(EventLogEntry.logged_dt.desc())
+        query = self.event.log_entries.order_by(EventLogEntry.logged_dt.desc(), EventLogEntry.id.desc())
         realms = {EventLogRealm.get(f) for f in filters if EventLogRealm.get(f)}
         if realms:
             query = query.filter(EventLogEntry.realm.in_(realms))
 
         if text:
-            query = query.filter(
-                db.or_(_contains(EventLogEntry.module, text),
-                       _contains(EventLogEntry.type, text),
-                       _contains(EventLogEntry.summary, text),
-                       _contains(db.m.User.first_name + " " + db.m.User.last_name, text),
-                       _contains(EventLogEntry.data['body'].astext, text),
-                       _contains(EventLogEntry.data['subject'].astext, text),
-                       _contains(EventLogEntry.data['from'].astext, text),
-                       _contains(EventLogEntry.data['to'].astext, text),
-                       _contains(EventLogEntry.data['cc'].astext, text))
-            ).outerjoin(db.m.User)
-
-        query = query.paginate(page, LOG_PAGE_SIZE)
+            query = query.filter(EventLogEntry.search_vector.match(
+                db.func.indico.indico_unaccent(preprocess_ts_string(text)), postgresql_regconfig='simple'
+            ))
+
+        if before_id is not None:
+            # keyset pagination: only get entries older than the last one
+            # on the previous page instead of counting and skipping rows
+            before_dt = (db.session.query(EventLogEntry.logged_dt)
+                         .filter_by(id=before_id, event_id=self.event.id)
+                         .scalar())
+            if before_dt is None:
+                raise NotFound
+            query = query.filter(db.tuple_(EventLogEntry.logged_dt, EventLogEntry.id) < (before_dt, before_id))
+
+        items = query.limit(LOG_PAGE_SIZE + 1).all()
         entries = [dict(serialize_log_entry(entry), index=index, html=entry.render())
-                   for index, entry in enumerate(query.items)]
-        return jsonify(current_page=page, pages=list(query.iter_pages()), total_page_count=query.pages, entries=entries)
+                   for index, entry in enumerate(items[:LOG_PAGE_SIZE])]
+        return jsonify(entries=entries, has_more=(len(items) > LOG_PAGE_SIZE))
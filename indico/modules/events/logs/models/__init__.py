@@ -0,0 +1,48 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import textwrap
+
+from sqlalchemy import DDL
+
+from indico.core import signals
+
+
+@signals.db_schema_created.connect_via('events')
+def _create_update_log_search_vector(sender, connection, **kwargs):
+    sql = textwrap.dedent("""
+        CREATE FUNCTION events.update_log_search_vector() RETURNS trigger AS
+        $BODY$
+        BEGIN
+            NEW.search_vector := to_tsvector('simple', indico.indico_unaccent(concat_ws(' ',
+                NEW.module,
+                NEW.type,
+                NEW.summary,
+                (SELECT first_name || ' ' || last_name FROM users.users WHERE id = NEW.user_id),
+                NEW.data->>'body',
+                NEW.data->>'subject',
+                NEW.data->>'from',
+                NEW.data->>'to',
+                NEW.data->>'cc'
+            )));
+            RETURN NEW;
+        END;
+        $BODY$
+        LANGUAGE plpgsql
+    """)
+    DDL(sql).execute(connection)
@@ -16,7 +16,9 @@
 
 from __future__ import unicode_literals
 
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import DDL
+from sqlalchemy.dialects.postgresql import JSON, TSVECTOR
+from sqlalchemy.event import listens_for
 
 from indico.core.db import db
 from indico.core.db.sqlalchemy import PyIntEnum, UTCDateTime
@@ -45,7 +47,9 @@ class EventLogKind(int, IndicoEnum):
 class EventLogEntry(db.Model):
     """Log entries for events"""
     __tablename__ = 'logs'
-    __table_args__ = {'schema': 'events'}
+    __table_args__ = (db.Index(None, 'event_id', 'logged_dt', 'id'),
+                      db.Index(None, 'search_vector', postgresql_using='gin'),
+                      {'schema': 'events'})
 
     #: The ID of the log entry
     id = db.Column(
@@ -105,6 +109,15 @@ class EventLogEntry(db.Model):
         JSON,
         nullable=False
     )
+    #: The searchable text of the entry (module, type, summary, user
+    #: name and email headers/body).  This is maintained by a database
+    #: trigger whenever a log entry is created or modified.
+    search_vector = db.deferred(db.Column(
+        TSVECTOR,
+        nullable=False,
+        server_default=db.FetchedValue(),
+        server_onupdate=db.FetchedValue()
+    ))
 
     #: The user associated with the log entry
     user = db.relationship(
@@ -148,3 +161,15 @@ class EventLogEntry(db.Model):
         realm = self.realm.name if self.realm is not None else None
         return '<EventLogEntry({}, {}, {}, {}, {}): {}>'.format(self.id, self.event_id, self.logged_dt, realm,
                                                                 self.module, self.summary)
+
+
+@listens_for(EventLogEntry.__table__, 'after_create')
+def _add_search_vector_trigger(target, conn, **kw):
+    sql = """
+        CREATE TRIGGER update_search_vector
+        BEFORE INSERT OR UPDATE OF module, type, summary, user_id, data
+        ON {table}
+        FOR EACH ROW
+        EXECUTE PROCEDURE events.update_log_search_vector();
+    """.format(table=target.fullname)
+    DDL(sql).execute(conn)
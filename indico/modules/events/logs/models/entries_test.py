@@ -0,0 +1,40 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from indico.modules.events.logs.models.entries import EventLogEntry, EventLogKind, EventLogRealm
+
+
+def test_search_vector(db, dummy_event, dummy_user):
+    dummy_user.first_name = 'Guinea'
+    dummy_user.last_name = 'Pig'
+    dummy_event.log(EventLogRealm.management, EventLogKind.change, 'Timetable', 'Entry moved', dummy_user)
+    dummy_event.log(EventLogRealm.emails, EventLogKind.other, 'Reminders', 'Sent reminder', type_='email',
+                    data={'subject': 'Z\xfcrich meeting', 'body': 'Hello world', 'to': ['someone@example.com']})
+    db.session.flush()
+
+    def _search(text):
+        query = dummy_event.log_entries.filter(EventLogEntry.search_vector.match(
+            db.func.indico.indico_unaccent(text), postgresql_regconfig='simple'
+        ))
+        return {entry.summary for entry in query}
+
+    assert _search('timetable') == {'Entry moved'}
+    assert _search('pig') == {'Entry moved'}
+    assert _search('zurich & hello') == {'Sent reminder'}
+    assert _search('someone:*') == {'Sent reminder'}
+    assert _search('nothing') == set()
@@ -464,3 +464,100 @@ def test_has_management_permission_db(create_event, create_user, dummy_user):
     assert not _find().count()
     assert _find('foo').one() == entry
     assert _find('ANY').count() == 2
+
+
+@pytest.mark.usefixtures('request_context')
+def test_can_access_cached(mock_cache, db, create_event, dummy_user):
+    from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
+    mock_cache('indico.core.db.sqlalchemy.protection._acl_cache')
+    event = create_event(protection_mode=ProtectionMode.protected)
+    db.session.flush()
+    assert not event.can_access(dummy_user)
+    # without invalidating the cache the new acl entry is not used
+    event.update_principal(dummy_user, read_access=True)
+    assert not event.can_access(dummy_user)
+    invalidate_acl_cache()
+    assert event.can_access(dummy_user)
+    # access keys are checked without involving the cache
+    event.update_principal(dummy_user, read_access=False)
+    event.access_key = 'secret'
+    invalidate_acl_cache()
+    assert not event.can_access(dummy_user)
+    event.set_session_access_key('secret')
+    assert event.can_access(dummy_user)
+
+
+@pytest.mark.usefixtures('request_context')
+def test_can_access_cache_scope(mock_cache, db, create_event, create_category, dummy_user):
+    from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
+    mock_cache('indico.core.db.sqlalchemy.protection._acl_cache')
+    category = create_category(protection_mode=ProtectionMode.protected)
+    event = create_event(category=category, protection_mode=ProtectionMode.protected)
+    other_event = create_event(category=category, protection_mode=ProtectionMode.protected)
+    db.session.flush()
+    assert not event.can_access(dummy_user)
+    assert not other_event.can_access(dummy_user)
+    event.update_principal(dummy_user, read_access=True)
+    other_event.update_principal(dummy_user, read_access=True)
+    # invalidating an event does not affect other events
+    invalidate_acl_cache(event)
+    assert event.can_access(dummy_user)
+    assert not other_event.can_access(dummy_user)
+    # invalidating a category affects the events inside it
+    invalidate_acl_cache(category)
+    assert other_event.can_access(dummy_user)
+
+
+@pytest.mark.usefixtures('request_context')
+def test_can_access_not_cached_with_signal(mock_cache, db, create_event, dummy_user):
+    mock_cache('indico.core.db.sqlalchemy.protection._acl_cache')
+    event = create_event(protection_mode=ProtectionMode.protected)
+    db.session.flush()
+    assert not event.can_access(dummy_user)
+    with signals.acl.can_access.connected_to(lambda *a, **kw: None, sender=Event):
+        event.update_principal(dummy_user, read_access=True)
+        assert event.can_access(dummy_user)
+
+
+@pytest.mark.parametrize('inherited', (True, False))
+def test_filter_accessible(db, create_event, create_category, dummy_user, inherited):
+    category = create_category(protection_mode=ProtectionMode.public)
+    public = create_event(category=category, protection_mode=ProtectionMode.public)
+    inheriting = create_event(category=category, protection_mode=ProtectionMode.inheriting)
+    protected = create_event(category=category, protection_mode=ProtectionMode.protected)
+    allowed = create_event(category=category, protection_mode=ProtectionMode.protected)
+    allowed.update_principal(dummy_user, read_access=True)
+    if inherited:
+        category.protection_mode = ProtectionMode.protected
+    db.session.flush()
+    events = [public, inheriting, protected, allowed]
+    expected = [public, allowed] if inherited else [public, inheriting, allowed]
+    assert Event.filter_accessible(events, dummy_user) == expected
+    assert Event.filter_accessible(events, dummy_user) == [e for e in events if e.can_access(dummy_user)]
+    assert Event.filter_accessible([], dummy_user) == []
+
+
+def test_filter_accessible_acl_query(db, mocker, create_event, create_category, create_user, dummy_user,
+                                     dummy_group):
+    from indico.modules.events.models.roles import EventRole
+    category = create_category(protection_mode=ProtectionMode.protected)
+    by_user = create_event(category=category, protection_mode=ProtectionMode.protected)
+    by_user.update_principal(dummy_user, read_access=True)
+    by_group = create_event(category=category, protection_mode=ProtectionMode.inheriting)
+    by_group.update_principal(dummy_group, read_access=True)
+    by_role = create_event(category=category, protection_mode=ProtectionMode.protected)
+    role = EventRole(event=by_role, name='Role', code='ROLE', color='ff0000', members={dummy_user})
+    by_role.update_principal(role, read_access=True)
+    by_email = create_event(category=category, protection_mode=ProtectionMode.protected)
+    by_email.update_principal(EmailPrincipal(dummy_user.email), read_access=True)
+    other_user = create_event(category=category, protection_mode=ProtectionMode.protected)
+    other_user.update_principal(create_user(123), read_access=True)
+    dummy_group.group.members.add(dummy_user)
+    db.session.flush()
+    events = [by_user, by_group, by_role, by_email, other_user]
+    expected = {by_user.id, by_group.id, by_role.id, by_email.id}
+    assert Event._query_acl_granted_ids({e.id for e in events}, dummy_user) == expected
+    can_access = mocker.spy(Event, 'can_access')
+    assert Event.filter_accessible(events, dummy_user) == [by_user, by_group, by_role, by_email]
+    # only the event whose acl does not contain the user is checked separately
+    assert can_access.call_count == 1
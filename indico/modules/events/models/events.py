@@ -436,8 +436,8 @@ class Event(SearchableTitleMixin, DescriptionMixin, LocationMixin, ProtectionMan
         from indico.modules.categories import Category
         if not isinstance(category_ids, (list, tuple, set)):
             category_ids = [category_ids]
-        cte = Category.get_tree_cte()
-        return (cte.c.id == Event.category_id) & cte.c.path.overlap(category_ids)
+        query = select([Category.id]).where(Category.chain_ids.overlap(list(category_ids))).correlate(None)
+        return Event.category_id.in_(query)
 
     @classmethod
     def is_visible_in(cls, category):
@@ -498,6 +498,18 @@ class Event(SearchableTitleMixin, DescriptionMixin, LocationMixin, ProtectionMan
     def protection_parent(self):
         return self.category
 
+    def _get_acl_cache_scope(self):
+        scope = super(Event, self)._get_acl_cache_scope()
+        return scope + [('Event', self.id)] if scope is not None else None
+
+    @classmethod
+    def _get_public_ids(cls, events):
+        if signals.acl.can_access.has_receivers_for(Category):
+            # the effective protection mode comes from the categories
+            # whose access checks may be overridden
+            return set()
+        return cls._query_public_ids(events)
+
     @property
     def start_dt_local(self):
         return self.start_dt.astimezone(self.tzinfo)
@@ -892,8 +904,7 @@ def _mappers_configured():
 
     # Event.category_chain -- the category ids of the event, starting
     # with the root category down to the event's immediate parent.
-    cte = Category.get_tree_cte()
-    query = select([cte.c.path]).where(cte.c.id == Event.category_id).correlate_except(cte)
+    query = select([Category.chain_ids]).where(Category.id == Event.category_id).correlate_except(Category)
     Event.category_chain = column_property(query, deferred=True)
 
     # Event.effective_protection_mode -- the effective protection mode
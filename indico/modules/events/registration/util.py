@@ -325,32 +325,34 @@ def generate_spreadsheet_from_registrations(registrations, regform_items, static
             field_names.append(unique_col('{} ({})'.format(item.title, 'Arrival'), item.id))
             field_names.append(unique_col('{} ({})'.format(item.title, 'Departure'), item.id))
     field_names.extend(title for name, (title, fn) in special_item_mapping.iteritems() if name in static_items)
-    rows = []
-    for registration in registrations:
-        data = registration.data_by_field
-        registration_dict = {
-            'ID': registration.friendly_id,
-            'Name': "{} {}".format(registration.first_name, registration.last_name)
-        }
-        for item in regform_items:
-            key = unique_col(item.title, item.id)
-            if item.input_type == 'accommodation':
-                registration_dict[key] = data[item.id].friendly_data.get('choice') if item.id in data else ''
-                key = unique_col('{} ({})'.format(item.title, 'Arrival'), item.id)
-                arrival_date = data[item.id].friendly_data.get('arrival_date') if item.id in data else None
-                registration_dict[key] = format_date(arrival_date) if arrival_date else ''
-                key = unique_col('{} ({})'.format(item.title, 'Departure'), item.id)
-                departure_date = data[item.id].friendly_data.get('departure_date') if item.id in data else None
-                registration_dict[key] = format_date(departure_date) if departure_date else ''
-            else:
-                registration_dict[key] = data[item.id].friendly_data if item.id in data else ''
-        for name, (title, fn) in special_item_mapping.iteritems():
-            if name not in static_items:
-                continue
-            value = fn(registration)
-            registration_dict[title] = value
-        rows.append(registration_dict)
-    return field_names, rows
+
+    def _iter_rows():
+        for registration in registrations:
+            data = registration.data_by_field
+            registration_dict = {
+                'ID': registration.friendly_id,
+                'Name': "{} {}".format(registration.first_name, registration.last_name)
+            }
+            for item in regform_items:
+                key = unique_col(item.title, item.id)
+                if item.input_type == 'accommodation':
+                    registration_dict[key] = data[item.id].friendly_data.get('choice') if item.id in data else ''
+                    key = unique_col('{} ({})'.format(item.title, 'Arrival'), item.id)
+                    arrival_date = data[item.id].friendly_data.get('arrival_date') if item.id in data else None
+                    registration_dict[key] = format_date(arrival_date) if arrival_date else ''
+                    key = unique_col('{} ({})'.format(item.title, 'Departure'), item.id)
+                    departure_date = data[item.id].friendly_data.get('departure_date') if item.id in data else None
+                    registration_dict[key] = format_date(departure_date) if departure_date else ''
+                else:
+                    registration_dict[key] = data[item.id].friendly_data if item.id in data else ''
+            for name, (title, fn) in special_item_mapping.iteritems():
+                if name not in static_items:
+                    continue
+                value = fn(registration)
+                registration_dict[title] = value
+            yield registration_dict
+
+    return field_names, _iter_rows()
 
 
 def get_registrations_with_tickets(user, event):
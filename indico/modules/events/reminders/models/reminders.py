@@ -29,6 +29,12 @@ from indico.util.date_time import now_utc
 from indico.util.string import format_repr, return_ascii
 
 
+#: The maximum number of recipients of a single reminder email.  Reminders
+#: with more recipients are split into multiple emails since many mail
+#: servers do not accept messages with too many recipients.
+MAX_RECIPIENTS_PER_EMAIL = 500
+
+
 class EventReminder(db.Model):
     """Email reminders for events"""
     __tablename__ = 'reminders'
@@ -144,9 +150,15 @@ class EventReminder(db.Model):
         This includes both explicit recipients and, if enabled,
         participants of the event.
         """
+        from indico.modules.events.registration.models.forms import RegistrationForm
         recipients = set(self.recipients)
         if self.send_to_participants:
-            recipients.update(reg.email for reg in Registration.get_all_for_event(self.event))
+            query = (db.session.query(Registration.email)
+                     .join(Registration.registration_form)
+                     .filter(Registration.is_active,
+                             ~RegistrationForm.is_deleted,
+                             RegistrationForm.event_id == self.event_id))
+            recipients.update(email for email, in query)
         recipients.discard('')  # just in case there was an empty email address somewhere
         return recipients
 
@@ -171,8 +183,14 @@ class EventReminder(db.Model):
             logger.info('Notification %s has no recipients; not sending anything', self)
             return
         email_tpl = make_reminder_email(self.event, self.include_summary, self.include_description, self.message)
-        email = make_email(bcc_list=recipients, from_address=self.reply_to_address, template=email_tpl)
-        send_email(email, self.event, 'Reminder', self.creator)
+        # the email is the same for all recipients, so we only render it once
+        subject = email_tpl.get_subject()
+        body = email_tpl.get_body()
+        recipients = sorted(recipients)
+        for i in xrange(0, len(recipients), MAX_RECIPIENTS_PER_EMAIL):
+            email = make_email(bcc_list=recipients[i:i + MAX_RECIPIENTS_PER_EMAIL], from_address=self.reply_to_address,
+                               subject=subject, body=body)
+            send_email(email, self.event, 'Reminder', self.creator)
 
     @return_ascii
     def __repr__(self):
@@ -0,0 +1,67 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import pytest
+
+from indico.modules.events.registration.models.forms import RegistrationForm
+from indico.modules.events.registration.models.registrations import Registration, RegistrationState
+from indico.modules.events.reminders.models.reminders import MAX_RECIPIENTS_PER_EMAIL
+
+
+pytest_plugins = 'indico.modules.events.reminders.testing.fixtures'
+
+
+def _create_registration(regform, email, state=RegistrationState.complete):
+    return Registration(registration_form=regform, email=email, first_name='Guinea', last_name='Pig', state=state,
+                        currency='USD')
+
+
+def test_all_recipients(db, dummy_event, create_reminder):
+    regform = RegistrationForm(event=dummy_event, title='Registration Form', currency='USD')
+    deleted_regform = RegistrationForm(event=dummy_event, title='Deleted', currency='USD', is_deleted=True)
+    _create_registration(regform, 'active@example.com')
+    _create_registration(regform, 'withdrawn@example.com', RegistrationState.withdrawn)
+    _create_registration(regform, 'deleted@example.com').is_deleted = True
+    _create_registration(deleted_regform, 'deletedform@example.com')
+    db.session.flush()
+    reminder = create_reminder(recipients=['foo@example.com', ''])
+    assert reminder.all_recipients == {'foo@example.com'}
+    # only active registrations in forms which have not been deleted
+    reminder.send_to_participants = True
+    assert reminder.all_recipients == {'foo@example.com', 'active@example.com'}
+
+
+@pytest.mark.parametrize(('num_recipients', 'chunk_sizes'), (
+    (0, []),
+    (1, [1]),
+    (MAX_RECIPIENTS_PER_EMAIL, [MAX_RECIPIENTS_PER_EMAIL]),
+    (2 * MAX_RECIPIENTS_PER_EMAIL + 1, [MAX_RECIPIENTS_PER_EMAIL, MAX_RECIPIENTS_PER_EMAIL, 1]),
+))
+def test_send_chunks(mocker, create_reminder, mock_reminder_email, num_recipients, chunk_sizes):
+    send_email = mocker.patch('indico.modules.events.reminders.models.reminders.send_email')
+    recipients = ['user{}@example.com'.format(i) for i in xrange(num_recipients)]
+    reminder = create_reminder(recipients=recipients)
+    reminder.send()
+    assert reminder.is_sent
+    # the email is only rendered once for all chunks
+    assert mock_reminder_email.call_count == (1 if num_recipients else 0)
+    emails = [args[0] for args, kwargs in send_email.call_args_list]
+    assert [len(email['bcc']) for email in emails] == chunk_sizes
+    assert all(not email['to'] for email in emails)
+    assert set().union(*(email['bcc'] for email in emails)) == set(recipients)
+    assert all(email['subject'] == 'Reminder' and email['body'] == 'Hello world' for email in emails)
@@ -20,6 +20,7 @@ from celery.schedules import crontab
 
 from indico.core.celery import celery
 from indico.core.db import db
+from indico.core.notifications import flush_email_queue, init_email_queue
 from indico.modules.events import Event
 from indico.modules.events.reminders import logger
 from indico.modules.events.reminders.models.reminders import EventReminder
@@ -31,7 +32,14 @@ def send_event_reminders():
     reminders = EventReminder.find_all(~EventReminder.is_sent, ~Event.is_deleted,
                                        EventReminder.scheduled_dt <= now_utc(),
                                        _join=EventReminder.event)
+    # queue the emails so they are only sent after the commit and
+    # are passed on to the batched email task
+    init_email_queue()
     for reminder in reminders:
         logger.info('Sending event reminder: %s', reminder)
         reminder.send()
-    db.session.commit()
+        # commit and dispatch the emails after each reminder so a
+        # failure does not result in already sent reminders being
+        # sent again
+        db.session.commit()
+        flush_email_queue()
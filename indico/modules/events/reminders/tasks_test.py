@@ -0,0 +1,46 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import pytest
+
+from indico.modules.events.reminders.models.reminders import MAX_RECIPIENTS_PER_EMAIL
+from indico.modules.events.reminders.tasks import send_event_reminders
+
+
+pytest_plugins = 'indico.modules.events.reminders.testing.fixtures'
+
+
+@pytest.mark.usefixtures('app_context', 'mock_reminder_email')
+def test_send_event_reminders(mocker, create_reminder):
+    config = mocker.patch('indico.core.notifications.config')
+    config.SMTP_USE_CELERY = True
+    config.DEBUG = False
+    send_email_task = mocker.patch('indico.core.emails.send_email_task')
+    send_emails_task = mocker.patch('indico.core.emails.send_emails_task')
+    recipients = ['user{}@example.com'.format(i) for i in xrange(MAX_RECIPIENTS_PER_EMAIL + 1)]
+    reminder = create_reminder(recipients=recipients)
+    send_event_reminders.run()
+    assert reminder.is_sent
+    # the chunks are queued and sent together in a batch instead of
+    # being passed on to celery individually
+    assert not send_email_task.delay.called
+    assert send_emails_task.delay.call_count == 1
+    emails, log_entry_ids = send_emails_task.delay.call_args[0]
+    assert [len(email['bcc']) for email in emails] == [MAX_RECIPIENTS_PER_EMAIL, 1]
+    assert len(log_entry_ids) == 2
+    assert all(log_entry_ids)
@@ -0,0 +1,47 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+import pytest
+from pytz import utc
+
+from indico.modules.events.reminders.models.reminders import EventReminder
+
+
+@pytest.fixture
+def create_reminder(db, dummy_event, dummy_user):
+    """Returns a callable which lets you create reminders"""
+    def _create_reminder(**kwargs):
+        kwargs.setdefault('scheduled_dt', datetime(2018, 1, 1, 8, tzinfo=utc))
+        kwargs.setdefault('reply_to_address', 'noreply@example.com')
+        reminder = EventReminder(event=dummy_event, creator=dummy_user, **kwargs)
+        db.session.add(reminder)
+        db.session.flush()
+        return reminder
+
+    return _create_reminder
+
+
+@pytest.fixture
+def mock_reminder_email(mocker):
+    """Mocks the rendering of the reminder email"""
+    make_reminder_email = mocker.patch('indico.modules.events.reminders.models.reminders.make_reminder_email')
+    make_reminder_email.return_value.get_subject.return_value = 'Reminder'
+    make_reminder_email.return_value.get_body.return_value = 'Hello world'
+    return make_reminder_email
@@ -19,7 +19,10 @@ from __future__ import unicode_literals
 from flask import session
 
 from indico.core import signals
+from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
 from indico.core.logger import Logger
+from indico.modules.events.models.events import Event
+from indico.modules.events.models.roles import EventRole
 from indico.util.i18n import _
 from indico.web.flask.util import url_for
 from indico.web.menu import SideMenuItem
@@ -33,3 +36,9 @@ def _sidemenu_items(sender, event, **kwargs):
     if event.can_manage(session.user):
         roles_section = 'organization' if event.type == 'conference' else 'advanced'
         return SideMenuItem('roles', _('Roles Setup'), url_for('event_roles.manage', event), section=roles_section)
+
+
+@signals.model_committed.connect_via(EventRole)
+def _event_role_committed(sender, obj, change, **kwargs):
+    # role members may have been added or removed
+    invalidate_acl_cache(Event.get(obj.event_id))
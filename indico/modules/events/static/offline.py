@@ -19,10 +19,11 @@ import itertools
 import os
 import posixpath
 import re
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 from tempfile import NamedTemporaryFile
-from zipfile import ZipFile
 
-from flask import g, request, session
+from flask import current_app, g, request, session
 from flask.helpers import get_root_path
 from werkzeug.utils import secure_filename
 
@@ -48,11 +49,12 @@ from indico.modules.events.models.events import EventType
 from indico.modules.events.registration.controllers.display import RHParticipantList
 from indico.modules.events.sessions.controllers.display import RHDisplaySession
 from indico.modules.events.sessions.util import get_session_ical_file, get_session_timetable_pdf
-from indico.modules.events.static.util import collect_static_files, override_request_endpoint, rewrite_css_urls
+from indico.modules.events.static.util import (cache_latex_pdf, collect_static_files, get_cached_latex_pdf,
+                                               override_request_endpoint, rewrite_css_urls, rewrite_static_css_urls)
 from indico.modules.events.timetable.controllers.display import RHTimetable
 from indico.modules.events.timetable.util import get_timetable_offline_pdf_generator
 from indico.modules.events.tracks.controllers import RHDisplayTracks
-from indico.util.fs import chmod_umask
+from indico.util.fs import FileObjZipFile, chmod_umask
 from indico.util.string import strip_tags
 from indico.web.assets.vars_js import generate_global_file, generate_i18n_file, generate_user_file
 from indico.web.flask.util import url_for
@@ -88,14 +90,21 @@ class StaticEventCreator(object):
         self.event = event
         self._display_tz = self.event.display_tzinfo.zone
         self._zip_file = None
+        self._latex_pdfs = []
         self._content_dir = _normalize_path(u'OfflineWebsite-{}'.format(event.title))
         self._web_dir = os.path.join(get_root_path('indico'), 'web')
         self._static_dir = os.path.join(self._web_dir, 'static')
 
     def create(self):
-        """Trigger the creation of a ZIP file containing the site."""
+        """Trigger the creation of a ZIP file containing the site.
+
+        The site is always built from scratch.  Only LaTeX PDFs and
+        stylesheets which did not change are taken from the cache; the
+        HTML pages are rendered again one after another since they need
+        the request context and the database session.
+        """
         temp_file = NamedTemporaryFile(suffix='indico.tmp', dir=config.TEMP_DIR)
-        self._zip_file = ZipFile(temp_file.name, 'w', allowZip64=True)
+        self._zip_file = FileObjZipFile(temp_file.name, 'w', allowZip64=True)
 
         with collect_static_files() as used_assets:
             # create the home page html
@@ -108,6 +117,7 @@ class StaticEventCreator(object):
             # Materials and additional pages
             self._copy_all_material()
             self._create_other_pages()
+            self._add_latex_pdfs()
 
             # Create index.html file (main page for the event)
             index_path = os.path.join(self._content_dir, 'index.html')
@@ -142,7 +152,7 @@ class StaticEventCreator(object):
         css_files = {url for url in used_assets if re.match('static/dist/.*\.css$', url)}
         for file_path in css_files:
             with open(os.path.join(self._web_dir, file_path)) as f:
-                rewritten_css, used_urls, __ = rewrite_css_urls(self.event, f.read())
+                rewritten_css, used_urls = rewrite_static_css_urls(self.event, f.read())
                 used_assets |= used_urls
                 self._zip_file.writestr(os.path.join(self._content_dir, file_path), rewritten_css)
         for file_path in used_assets - css_files:
@@ -157,7 +167,7 @@ class StaticEventCreator(object):
             plugin_name, path = re.match(r'static/plugins/([^/]+)/(.+.css)', file_path).groups()
             plugin = plugin_engine.get_plugin(plugin_name)
             with open(os.path.join(plugin.root_path, 'static', path)) as f:
-                rewritten_css, used_urls, __ = rewrite_css_urls(self.event, f.read())
+                rewritten_css, used_urls = rewrite_static_css_urls(self.event, f.read())
                 used_assets |= used_urls
                 self._zip_file.writestr(os.path.join(self._content_dir, file_path), rewritten_css)
         for file_path in used_assets - css_files:
@@ -177,7 +187,7 @@ class StaticEventCreator(object):
         css_files = {url for url in used_assets if re.match('static/custom/.*\.css$', url)}
         for file_path in css_files:
             with open(os.path.join(config.CUSTOMIZATION_DIR, self._strip_custom_prefix(file_path))) as f:
-                rewritten_css, used_urls, __ = rewrite_css_urls(self.event, f.read())
+                rewritten_css, used_urls = rewrite_static_css_urls(self.event, f.read())
                 used_assets |= used_urls
                 self._zip_file.writestr(os.path.join(self._content_dir, file_path), rewritten_css)
         for file_path in used_assets - css_files:
@@ -213,8 +223,8 @@ class StaticEventCreator(object):
                 if attachment.type == AttachmentType.file:
                     dst_path = posixpath.join(self._content_dir, "material", type_,
                                               "{}-{}".format(attachment.id, attachment.file.filename))
-                    with attachment.file.get_local_path() as file_path:
-                        self._copy_file(dst_path, file_path)
+                    with attachment.file.open() as fd:
+                        self._zip_file.add_fileobj(dst_path, fd, attachment.file.size)
 
     def _copy_file(self, dest, src):
         """Copy a file from a source path to a destination inside the ZIP."""
@@ -227,6 +237,36 @@ class StaticEventCreator(object):
                 src_filepath = os.path.join(src, root, filename)
                 self._zip_file.write(src_filepath, os.path.join(dst_dirpath, filename))
 
+    def _add_latex_pdfs(self):
+        """Compile the LaTeX PDFs and add them to the ZIP file.
+
+        PDFs whose LaTeX source did not change since they have been
+        compiled for a previous build are taken from the cache.
+        """
+        pending = []
+        for latex, filename in self._latex_pdfs:
+            cached_path = get_cached_latex_pdf(latex)
+            if cached_path:
+                self._zip_file.write(cached_path, filename)
+            else:
+                pending.append((latex, filename))
+        del self._latex_pdfs[:]
+        if not pending:
+            return
+        app = current_app._get_current_object()
+
+        def _compile(latex):
+            with app.app_context():
+                return latex.compile()
+
+        pool = ThreadPool(min(cpu_count(), len(pending)))
+        try:
+            for (latex, filename), pdf_path in itertools.izip(pending, pool.imap(_compile, [x[0] for x in pending])):
+                self._zip_file.write(pdf_path, filename)
+                cache_latex_pdf(latex, pdf_path)
+        finally:
+            pool.terminate()
+
 
 class StaticConferenceCreator(StaticEventCreator):
     def __init__(self, rh, event):
@@ -382,6 +422,10 @@ class StaticConferenceCreator(StaticEventCreator):
         if hasattr(pdf, 'getPDFBin'):
             # Got legacy reportlab PDF generator instead of the LaTex-based one
             self._add_file(pdf.getPDFBin(), uh_or_endpoint, target)
+        elif hasattr(pdf, 'prepare'):
+            # LaTeX PDFs are compiled in parallel once all pages have been created
+            filename = os.path.join(self._content_dir, self._get_url(uh_or_endpoint, target))
+            self._latex_pdfs.append((pdf.prepare(), filename))
         else:
             with open(pdf.generate()) as f:
                 self._add_file(f, uh_or_endpoint, target)
@@ -17,10 +17,16 @@
 from __future__ import unicode_literals
 
 import base64
+import hashlib
+import json
 import mimetypes
+import os
 import re
+import shutil
 import urlparse
 from contextlib import contextmanager
+from datetime import date
+from tempfile import NamedTemporaryFile
 
 import requests
 from flask import current_app, g, request
@@ -29,8 +35,10 @@ from flask_webpackext.manifest import JinjaManifestEntry
 from pywebpack import Manifest
 from werkzeug.urls import url_parse
 
+import indico
 from indico.core.config import config
 from indico.modules.events.layout.models.images import ImageFile
+from indico.util.fs import chmod_umask
 from indico.web.flask.util import endpoint_for_url
 
 
@@ -39,6 +47,7 @@ _url_has_extension_re = re.compile(r'.*\.([^/]+)$')
 _plugin_url_pattern = r'(?:{})?/static/plugins/([^/]+)/(.*?)(?:__v[0-9a-f]+)?\.([^.]+)$'
 _static_url_pattern = r'(?:{})?/(images|dist|fonts)(.*)/(.+?)(?:__v[0-9a-f]+)?\.([^.]+)$'
 _custom_url_pattern = r'(?:{})?/static/custom/(.+)$'
+_latex_graphics_re = re.compile(r'(?P<command>\\includegraphics(?:\[[^\]]*\])?)\{(?P<path>[^}]+)\}')
 
 
 def rewrite_static_url(path):
@@ -124,6 +133,100 @@ def rewrite_css_urls(event, css):
     return re.sub(_css_url_pattern.format(indico_path), _replace_url, css, flags=re.MULTILINE), used_urls, used_images
 
 
+def rewrite_static_css_urls(event, css):
+    """Rewrite the URLs in a static CSS file, reusing previous results.
+
+    Unless the CSS references assets of an event, the rewritten CSS
+    only depends on the original CSS and the Indico URL, so it is kept
+    in the cache directory and shared between static site builds.
+
+    :return: A tuple containing the rewritten CSS as bytes and the set
+             of used static URLs
+    """
+    if '/event/' in css:
+        rewritten_css, used_urls, __ = rewrite_css_urls(event, css)
+        return _to_bytes(rewritten_css), used_urls
+    cache_path = _get_cache_path('css', indico.__version__, config.BASE_URL, css)
+    try:
+        with open(cache_path, 'rb') as f:
+            data = json.load(f)
+    except (IOError, ValueError):
+        pass
+    else:
+        # update file mtime so it's not deleted during cache cleanup
+        os.utime(cache_path, None)
+        return data['css'].encode('utf-8'), set(data['used_urls'])
+    rewritten_css, used_urls, __ = rewrite_css_urls(event, css)
+    with _write_cache_file(cache_path) as f:
+        json.dump({'css': rewritten_css, 'used_urls': sorted(used_urls)}, f)
+    return _to_bytes(rewritten_css), used_urls
+
+
+def get_cached_latex_pdf(latex):
+    """Get a PDF compiled from the same LaTeX source before.
+
+    :param latex: A `LatexRunner` which has been prepared
+    :return: The path to the cached PDF or ``None``
+    """
+    cache_path = _get_latex_pdf_cache_path(latex)
+    if not os.path.exists(cache_path):
+        return None
+    os.utime(cache_path, None)
+    return cache_path
+
+
+def cache_latex_pdf(latex, pdf_path):
+    """Keep a compiled PDF to reuse it for the same LaTeX source.
+
+    :param latex: The `LatexRunner` which compiled the PDF
+    :param pdf_path: The path to the compiled PDF
+    """
+    with _write_cache_file(_get_latex_pdf_cache_path(latex)) as f, open(pdf_path, 'rb') as pdf:
+        shutil.copyfileobj(pdf, f)
+
+
+def _get_latex_pdf_cache_path(latex):
+    """Get the cache path of the PDF compiled from a LaTeX source.
+
+    Images such as the event logo are included from temporary files
+    with random names, so their paths are replaced with a hash of the
+    file content.  PDFs showing the current date are only reused on
+    the same day.
+    """
+    def _replace_path(match):
+        try:
+            with open(match.group('path'), 'rb') as f:
+                checksum = hashlib.sha1(f.read()).hexdigest()
+        except IOError:
+            return match.group(0)
+        return '{}{{{}}}'.format(match.group('command'), checksum)
+
+    source = _latex_graphics_re.sub(_replace_path, latex.source)
+    data = [unicode(latex.has_toc), source]
+    if r'\today' in source:
+        data.append(date.today().isoformat())
+    return _get_cache_path('pdf', *data)
+
+
+def _get_cache_path(kind, *data):
+    checksum = hashlib.sha1(b'\0'.join(_to_bytes(x) for x in data)).hexdigest()
+    return os.path.join(config.CACHE_DIR, 'static-site-{}-{}'.format(kind, checksum))
+
+
+@contextmanager
+def _write_cache_file(path):
+    # write to a temporary file first so concurrent builds never
+    # see an incomplete file
+    with NamedTemporaryFile(dir=config.CACHE_DIR, suffix='.tmp', delete=False) as f:
+        yield f
+    chmod_umask(f.name)
+    os.rename(f.name, path)
+
+
+def _to_bytes(s):
+    return s.encode('utf-8') if isinstance(s, unicode) else s
+
+
 def url_to_static_filename(endpoint, url):
     """Handle special endpoint/URLs so that they link to offline content."""
     if re.match('(events)?\.display(_overview)?$', endpoint):
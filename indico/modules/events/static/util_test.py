@@ -0,0 +1,56 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import os
+
+import pytest
+from mock import MagicMock
+
+from indico.core.config import config
+from indico.modules.events.static import util
+from indico.modules.events.static.util import rewrite_static_css_urls
+
+
+@pytest.mark.usefixtures('app_context')
+def test_rewrite_static_css_urls_cached(mocker):
+    css = b"body { background: url('/images/foo__v123abc.png'); }"
+    expected = b"body { background: url('../../../static/images/foo.png'); }"
+    assert rewrite_static_css_urls(None, css) == (expected, {'static/images/foo.png'})
+    assert any(f.startswith('static-site-css-') for f in os.listdir(config.CACHE_DIR))
+    rewrite_css_urls = mocker.patch.object(util, 'rewrite_css_urls')
+    assert rewrite_static_css_urls(None, css) == (expected, {'static/images/foo.png'})
+    assert not rewrite_css_urls.called
+    # CSS referencing event assets is never cached
+    rewrite_css_urls.return_value = (b'', set(), set())
+    rewrite_static_css_urls(None, b"body { background: url('/event/1/images/1-foo.png'); }")
+    assert rewrite_css_urls.called
+
+
+@pytest.mark.usefixtures('app_context')
+def test_latex_pdf_cache_path(tmpdir):
+    def _make_latex(image_path):
+        source = r'\includegraphics[max width=\linewidth]{%s} \today' % image_path
+        return MagicMock(has_toc=False, source=source)
+
+    tmpdir.join('a.png').write(b'logo')
+    tmpdir.join('b.png').write(b'logo')
+    tmpdir.join('c.png').write(b'other logo')
+    path = util._get_latex_pdf_cache_path(_make_latex(tmpdir.join('a.png').strpath))
+    # images are identified by their content, not their temporary path
+    assert util._get_latex_pdf_cache_path(_make_latex(tmpdir.join('b.png').strpath)) == path
+    assert util._get_latex_pdf_cache_path(_make_latex(tmpdir.join('c.png').strpath)) != path
@@ -95,20 +95,22 @@ def generate_spreadsheet_from_survey(survey, submission_ids):
     field_names += [unique_col(_format_title(question), question.id) for question in sorted_questions]
 
     submissions = _filter_submissions(survey, submission_ids)
-    rows = []
-    for submission in submissions:
-        submission_dict = {
-            'Submitter': submission.user.full_name if not submission.is_anonymous else None,
-            'Submitter Email': submission.user.email if not submission.is_anonymous else None,
-            'Submission Date': submission.submitted_dt,
-        }
-        for key in field_names:
-            submission_dict.setdefault(key, '')
-        for answer in submission.answers:
-            key = unique_col(_format_title(answer.question), answer.question.id)
-            submission_dict[key] = answer.answer_data
-        rows.append(submission_dict)
-    return field_names, rows
+
+    def _iter_rows():
+        for submission in submissions:
+            submission_dict = {
+                'Submitter': submission.user.full_name if not submission.is_anonymous else None,
+                'Submitter Email': submission.user.email if not submission.is_anonymous else None,
+                'Submission Date': submission.submitted_dt,
+            }
+            for key in field_names:
+                submission_dict.setdefault(key, '')
+            for answer in submission.answers:
+                key = unique_col(_format_title(answer.question), answer.question.id)
+                submission_dict[key] = answer.answer_data
+            yield submission_dict
+
+    return field_names, _iter_rows()
 
 
 def _format_title(question):
@@ -16,9 +16,12 @@
 
 from __future__ import unicode_literals
 
-from flask import render_template, session
+from flask import g, render_template, session
+from sqlalchemy import inspect, orm
+from sqlalchemy.event import listen, listens_for
 
 from indico.core import signals
+from indico.core.db import db
 from indico.core.logger import Logger
 from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
 from indico.util.date_time import now_utc
@@ -48,6 +51,123 @@ def _extend_event_management_menu(sender, event, **kwargs):
                             icon='calendar')
 
 
+@signals.model_committed.connect
+def _model_committed(sender, obj, change, **kwargs):
+    from indico.core.db.sqlalchemy.links import LinkType
+    from indico.modules.attachments.models.attachments import Attachment
+    from indico.modules.attachments.models.folders import AttachmentFolder
+    from indico.modules.events import Event
+    from indico.modules.events.contributions.models.contributions import Contribution
+    from indico.modules.events.contributions.models.persons import ContributionPersonLink
+    from indico.modules.events.contributions.models.references import ContributionReference
+    from indico.modules.events.models.persons import EventPerson
+    from indico.modules.events.sessions.models.blocks import SessionBlock
+    from indico.modules.events.sessions.models.persons import SessionBlockPersonLink
+    from indico.modules.events.sessions.models.sessions import Session
+    from indico.modules.events.sessions.models.types import SessionType
+    from indico.modules.events.timetable.legacy import invalidate_timetable_cache
+    from indico.modules.events.timetable.models.breaks import Break
+    from indico.modules.rb.models.locations import Location
+    from indico.modules.rb.models.rooms import Room
+    if change == 'delete':
+        # deleted timetable entries are not part of the cache key anymore
+        # and everything else is soft-deleted or updates its parent, too
+        return
+    if isinstance(obj, (Room, Location)):
+        # most changes (e.g. new bookings) do not affect the timetable,
+        # so we only care about the names recorded by the listeners below
+        _invalidate_renamed_locations()
+        return
+    if isinstance(obj, Attachment):
+        obj = obj.folder
+    if isinstance(obj, AttachmentFolder):
+        # only the attachments of sessions and contributions are shown in the timetable
+        obj = obj.object if obj.link_type in (LinkType.session, LinkType.contribution) else None
+    elif isinstance(obj, (ContributionPersonLink, ContributionReference)):
+        obj = obj.contribution
+    elif isinstance(obj, SessionBlockPersonLink):
+        obj = obj.session_block
+    if isinstance(obj, Event):
+        invalidate_timetable_cache(obj.id)
+    elif isinstance(obj, (Session, SessionType, EventPerson)):
+        invalidate_timetable_cache(obj.event_id)
+    elif isinstance(obj, TimetableEntry):
+        invalidate_timetable_cache(obj.event_id, obj)
+    elif isinstance(obj, (Contribution, SessionBlock, Break)) and obj.timetable_entry is not None:
+        invalidate_timetable_cache(obj.timetable_entry.event_id, obj.timetable_entry)
+
+
+def _get_location_event_ids(room_ids, venue_ids):
+    """Get the ids of all events which use some rooms or venues.
+
+    Items inheriting their location do not need to be checked since
+    the object they inherit it from uses the same room or venue.
+
+    :param room_ids: A collection of room ids
+    :param venue_ids: A collection of venue (location) ids
+    """
+    from indico.modules.events import Event
+    from indico.modules.events.contributions.models.contributions import Contribution
+    from indico.modules.events.sessions.models.blocks import SessionBlock
+    from indico.modules.events.sessions.models.sessions import Session
+    from indico.modules.events.timetable.models.breaks import Break
+
+    def _uses_location(cls):
+        criteria = []
+        if room_ids:
+            criteria.append(cls.own_room_id.in_(room_ids))
+        if venue_ids:
+            criteria.append(cls.own_venue_id.in_(venue_ids))
+        return db.or_(*criteria)
+
+    if not room_ids and not venue_ids:
+        return set()
+    queries = [db.session.query(Event.id).filter(_uses_location(Event), ~Event.is_deleted),
+               db.session.query(Session.event_id).filter(_uses_location(Session), ~Session.is_deleted),
+               db.session.query(Contribution.event_id).filter(_uses_location(Contribution), ~Contribution.is_deleted),
+               db.session.query(Session.event_id).join(SessionBlock.session).filter(_uses_location(SessionBlock)),
+               db.session.query(TimetableEntry.event_id).join(TimetableEntry.break_).filter(_uses_location(Break))]
+    return {event_id for event_id, in queries[0].union(*queries[1:])}
+
+
+def _invalidate_renamed_locations():
+    """Invalidate the cached timetables showing renamed rooms or venues."""
+    from indico.modules.events.timetable.legacy import invalidate_timetable_cache
+    from indico.modules.rb.models.rooms import Room
+    changes = g.pop('timetable_renamed_locations', None)
+    if not changes:
+        return
+    room_ids = {id_ for kind, id_ in changes if kind == 'room'}
+    venue_ids = {id_ for kind, id_ in changes if kind == 'venue'}
+    # the room name format of a location affects the names of all its rooms
+    format_location_ids = {id_ for kind, id_ in changes if kind == 'room_name_format'}
+    if format_location_ids:
+        room_ids |= {id_ for id_, in db.session.query(Room.id).filter(Room.location_id.in_(format_location_ids))}
+    for event_id in _get_location_event_ids(room_ids, venue_ids):
+        invalidate_timetable_cache(event_id)
+
+
+def _make_location_renamed_listener(kind):
+    def _location_renamed(target, value, oldvalue, *unused):
+        # new rooms/locations are not used anywhere yet
+        if value == oldvalue or not inspect(target).persistent:
+            return
+        g.setdefault('timetable_renamed_locations', set()).add((kind, target.id))
+
+    return _location_renamed
+
+
+@listens_for(orm.mapper, 'after_configured', once=True)
+def _mappers_configured():
+    from indico.modules.rb.models.locations import Location
+    from indico.modules.rb.models.rooms import Room
+    for attr in (Room.building, Room.floor, Room.number, Room.verbose_name):
+        listen(attr, 'set', _make_location_renamed_listener('room'), active_history=True)
+    listen(Location.name, 'set', _make_location_renamed_listener('venue'), active_history=True)
+    listen(Location._room_name_format, 'set', _make_location_renamed_listener('room_name_format'),
+           active_history=True)
+
+
 @signals.event_management.get_cloners.connect
 def _get_timetable_cloner(sender, **kwargs):
     from indico.modules.events.timetable.clone import TimetableCloner
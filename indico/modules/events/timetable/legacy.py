@@ -19,10 +19,15 @@ from __future__ import unicode_literals
 from collections import defaultdict
 from hashlib import md5
 from itertools import chain
+from uuid import uuid4
 
-from flask import has_request_context, session
+from flask import g, has_request_context, request, session
+from pytz import utc
 from sqlalchemy.orm import defaultload
 
+from indico.core.db import db
+from indico.core.db.sqlalchemy.protection import get_acl_cache_version
+from indico.legacy.common.cache import GenericCache
 from indico.modules.events.contributions.models.persons import AuthorType
 from indico.modules.events.models.events import EventType
 from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
@@ -30,6 +35,50 @@ from indico.util.date_time import iterdays
 from indico.web.flask.util import url_for
 
 
+#: How long (in seconds) serialized timetable days are cached
+TIMETABLE_CACHE_TTL = 86400
+
+_timetable_cache = GenericCache('timetable')
+
+
+def invalidate_timetable_cache(event_id, entry=None):
+    """Invalidate the cached serialized timetable of an event.
+
+    This needs to be called whenever something shown in the timetable
+    changes without changing the times of its timetable entries, e.g.
+    the title of a contribution or the attachments of a session.
+
+    :param event_id: The ID of the event
+    :param entry: A `TimetableEntry`.  If specified, only the days on
+                  which it takes place are invalidated instead of the
+                  whole timetable.
+    """
+    if entry is None:
+        keys = {'version:{}'.format(event_id)}
+    else:
+        keys = _get_day_version_keys(event_id, entry.start_dt, entry.end_dt)
+    _timetable_cache.set_multi({key: uuid4().hex for key in keys})
+
+
+def _get_day_version_keys(event_id, start_dt, end_dt):
+    """Get the cache version keys of the days an entry takes place on.
+
+    The days are always in UTC since the timetable may be shown in
+    different timezones.
+    """
+    return {'version:{}:{}'.format(event_id, dt.astimezone(utc).strftime('%Y%m%d'))
+            for dt in (start_dt, end_dt) if dt is not None}
+
+
+def _get_timetable_cache_versions(keys):
+    versions = _timetable_cache.get_multi(keys)
+    for key, version in versions.iteritems():
+        if version is None:
+            _timetable_cache.add(key, uuid4().hex)
+            versions[key] = _timetable_cache.get(key)
+    return versions
+
+
 class TimetableSerializer(object):
     def __init__(self, event, management=False, user=None):
         self.management = management
@@ -39,12 +88,29 @@ class TimetableSerializer(object):
 
     def serialize_timetable(self, days=None, hide_weekends=False, strip_empty_days=False):
         tzinfo = self.event.tzinfo if self.management else self.event.display_tzinfo
-        self.event.preload_all_acl_entries()
         timetable = {}
         for day in iterdays(self.event.start_dt.astimezone(tzinfo), self.event.end_dt.astimezone(tzinfo),
                             skip_weekends=hide_weekends, day_whitelist=days):
             date_str = day.strftime('%Y%m%d')
             timetable[date_str] = {}
+        cache_scope = self._get_cache_scope()
+        if cache_scope is None:
+            self._serialize_days(timetable, tzinfo)
+        else:
+            self._serialize_days_cached(timetable, tzinfo, cache_scope)
+        if strip_empty_days:
+            timetable = self._strip_empty_days(timetable)
+        return timetable
+
+    def _serialize_days(self, timetable, tzinfo, entry_ids=None):
+        """Serialize the timetable entries taking place on some days.
+
+        :param timetable: A dict mapping the days to serialize to empty
+                          dicts which will be populated with the entries
+        :param tzinfo: The timezone used to determine the day of an entry
+        :param entry_ids: If specified, only these entries are loaded
+        """
+        self.event.preload_all_acl_entries()
         contributions_strategy = defaultload('contribution')
         contributions_strategy.subqueryload('person_links')
         contributions_strategy.subqueryload('references')
@@ -53,27 +119,119 @@ class TimetableSerializer(object):
         query = (TimetableEntry.query.with_parent(self.event)
                  .options(*query_options)
                  .order_by(TimetableEntry.type != TimetableEntryType.SESSION_BLOCK))
+        if entry_ids is not None:
+            query = query.filter(TimetableEntry.id.in_(entry_ids))
+        blocks = {}
         for entry in query:
-            day = entry.start_dt.astimezone(tzinfo).date()
-            date_str = day.strftime('%Y%m%d')
-            if date_str not in timetable:
+            if entry.parent_id is not None:
+                # entries inside a session block are shown wherever the block is shown
+                block_data = blocks.get(entry.parent_id)
+                if block_data is not None and entry.can_view(self.user):
+                    block_data['entries'][self._get_entry_key(entry)] = self.serialize_timetable_entry(entry)
                 continue
-            if not entry.can_view(self.user):
+            date_strs = self._get_entry_days(entry.type, entry.start_dt, entry.end_dt, tzinfo) & timetable.viewkeys()
+            if not date_strs or not entry.can_view(self.user):
                 continue
             data = self.serialize_timetable_entry(entry, load_children=False)
-            key = self._get_entry_key(entry)
-            if entry.parent:
-                parent_code = 's{}'.format(entry.parent_id)
-                timetable[date_str][parent_code]['entries'][key] = data
+            for date_str in date_strs:
+                timetable[date_str][self._get_entry_key(entry)] = data
+            if entry.type == TimetableEntryType.SESSION_BLOCK:
+                blocks[entry.id] = data
+
+    def _serialize_days_cached(self, timetable, tzinfo, cache_scope):
+        """Serialize the timetable entries taking place on some days using the cache.
+
+        Each day is cached separately.  Its cache key contains the
+        ids and times of its entries, so adding, deleting or moving
+        entries only invalidates the days affected by the change.
+        Other changes bump the cache versions of either the whole
+        event or the days touched by the modified entry (see
+        :func:`invalidate_timetable_cache`).
+        """
+        event_id = self.event.id
+        query = (db.session.query(TimetableEntry.id, TimetableEntry.parent_id, TimetableEntry.type,
+                                  TimetableEntry.start_dt, TimetableEntry.end_dt)
+                 .filter(TimetableEntry.event_id == event_id))
+        top_level_entries = []
+        children = defaultdict(list)
+        for entry in query:
+            if entry.parent_id is None:
+                top_level_entries.append(entry)
             else:
-                if (entry.type == TimetableEntryType.SESSION_BLOCK and
-                        entry.start_dt.astimezone(tzinfo).date() != entry.end_dt.astimezone(tzinfo).date()):
-                    # If a session block lasts into another day we need to add it to that day, too
-                    timetable[entry.end_dt.astimezone(tzinfo).date().strftime('%Y%m%d')][key] = data
-                timetable[date_str][key] = data
-        if strip_empty_days:
-            timetable = self._strip_empty_days(timetable)
-        return timetable
+                children[entry.parent_id].append(entry)
+        day_entries = defaultdict(list)
+        for entry in top_level_entries:
+            for date_str in self._get_entry_days(entry.type, entry.start_dt, entry.end_dt, tzinfo):
+                if date_str in timetable:
+                    day_entries[date_str].append(entry)
+                    day_entries[date_str] += children[entry.id]
+        if not day_entries:
+            return
+        version_keys = {date_str: ['version:{}'.format(event_id)] +
+                        sorted(set(chain.from_iterable(_get_day_version_keys(event_id, entry.start_dt, entry.end_dt)
+                                                       for entry in entries)))
+                        for date_str, entries in day_entries.iteritems()}
+        versions = _get_timetable_cache_versions(set(chain.from_iterable(version_keys.itervalues())))
+        cache_keys = {}
+        for date_str, entries in day_entries.iteritems():
+            state = (cache_scope, self.management, unicode(tzinfo), date_str,
+                     sorted((entry.id, entry.parent_id, entry.start_dt, entry.end_dt) for entry in entries),
+                     [versions[key] for key in version_keys[date_str]])
+            cache_keys[date_str] = '{}:{}'.format(event_id, md5(repr(state)).hexdigest())
+        cached = _timetable_cache.get_multi(cache_keys.values())
+        missing = {}
+        for date_str, cache_key in cache_keys.iteritems():
+            if cached[cache_key] is None:
+                missing[date_str] = {}
+            else:
+                timetable[date_str] = cached[cache_key]
+        if not missing:
+            return
+        self._serialize_days(missing, tzinfo,
+                             entry_ids={entry.id for date_str in missing for entry in day_entries[date_str]})
+        timetable.update(missing)
+        if cache_scope != 'manage' and g.get('acl_uncacheable'):
+            # access to some of the entries depends on something
+            # specific to the current request, e.g. an access key
+            return
+        _timetable_cache.set_multi({cache_keys[date_str]: data for date_str, data in missing.iteritems()},
+                                   TIMETABLE_CACHE_TTL)
+
+    def _get_cache_scope(self):
+        """Get the scope in which the serialized timetable may be cached.
+
+        Entries the user cannot access are not included in the
+        timetable, so the cache can only be shared between users who
+        see everything (event managers) and between users who are not
+        logged in.  For anyone else the timetable is not cached.
+        """
+        if not has_request_context() or self.user != session.user:
+            # attachments are always filtered for the current user
+            return None
+        elif request.method not in {'GET', 'HEAD'}:
+            # the request may have modified the timetable and the
+            # cache is only invalidated once the changes are committed
+            return None
+        elif self.can_manage_event:
+            return 'manage'
+        elif self.user is None and not g.get('acl_uncacheable'):
+            # the public scope is only as fresh as the ACL cache version:
+            # whatever bumps it (protection changes of the event, its
+            # categories, sessions and contributions, event settings and
+            # role memberships) also invalidates the cached public days
+            acl_version = get_acl_cache_version(self.event)
+            return 'public:{}'.format(acl_version) if acl_version is not None else None
+        else:
+            return None
+
+    @staticmethod
+    def _get_entry_days(entry_type, start_dt, end_dt, tzinfo):
+        """Get the days on which a top-level entry is shown."""
+        date_strs = {start_dt.astimezone(tzinfo).strftime('%Y%m%d')}
+        if entry_type == TimetableEntryType.SESSION_BLOCK:
+            # If a session block lasts into another day we need to add it to that day, too
+            date_strs.add(end_dt.astimezone(tzinfo).strftime('%Y%m%d'))
+        return date_strs
 
     def serialize_session_timetable(self, session_, without_blocks=False, strip_empty_days=False):
         event_tz = self.event.tzinfo
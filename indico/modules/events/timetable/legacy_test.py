@@ -0,0 +1,108 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g, session
+from pytz import utc
+
+from indico.modules.events.timetable import _get_location_event_ids
+from indico.modules.events.timetable.legacy import TimetableSerializer, invalidate_timetable_cache
+from indico.modules.events.timetable.models.breaks import Break
+from indico.modules.rb.models.rooms import Room
+
+
+pytest_plugins = ('indico.modules.events.timetable.testing.fixtures', 'indico.modules.rb.testing.fixtures')
+
+
+@pytest.mark.usefixtures('request_context')
+def test_serialize_timetable_cached(mocker, mock_cache, db, dummy_event, dummy_user, create_contribution, create_entry):
+    mock_cache('indico.modules.events.timetable.legacy._timetable_cache')
+    spy = mocker.spy(TimetableSerializer, 'serialize_contribution_entry')
+    session.user = dummy_user
+    dummy_event.update_principal(dummy_user, full_access=True)
+    dummy_event.start_dt = datetime(2018, 1, 1, 8, tzinfo=utc)
+    dummy_event.end_dt = datetime(2018, 1, 2, 18, tzinfo=utc)
+    contrib = create_contribution(dummy_event, 'Talk', timedelta(minutes=20))
+    entry = create_entry(contrib, datetime(2018, 1, 1, 10, tzinfo=utc))
+    other_entry = create_entry(create_contribution(dummy_event, 'Other', timedelta(minutes=20)),
+                               datetime(2018, 1, 2, 10, tzinfo=utc))
+    key = 'c{}'.format(entry.id)
+    other_key = 'c{}'.format(other_entry.id)
+
+    def _serialize():
+        return TimetableSerializer(dummy_event).serialize_timetable()
+
+    timetable = _serialize()
+    assert timetable['20180101'][key]['title'] == 'Talk'
+    assert timetable['20180102'][other_key]['title'] == 'Other'
+    assert spy.call_count == 2
+    # nothing changed, so everything comes from the cache
+    assert _serialize() == timetable
+    assert spy.call_count == 2
+    # changes not affecting the times of any entries need an explicit invalidation
+    contrib.title = 'Changed'
+    assert _serialize()['20180101'][key]['title'] == 'Talk'
+    invalidate_timetable_cache(dummy_event.id, entry)
+    assert _serialize()['20180101'][key]['title'] == 'Changed'
+    # only the day of the modified entry has been serialized again
+    assert spy.call_count == 3
+    # moving an entry affects both the old and the new day
+    entry.start_dt = datetime(2018, 1, 2, 11, tzinfo=utc)
+    db.session.flush()
+    timetable = _serialize()
+    assert timetable['20180101'] == {}
+    assert set(timetable['20180102']) == {key, other_key}
+    assert spy.call_count == 5
+
+
+def test_get_location_event_ids(dummy_event, create_event, create_contribution, create_entry, create_room,
+                                dummy_location):
+    room = create_room()
+    other_room = create_room(number='4')
+    other_event = create_event()
+    dummy_event.own_room = room
+    contrib = create_contribution(other_event, 'Talk', timedelta(minutes=20))
+    contrib.own_room = other_room
+    create_entry(Break(title='Coffee', duration=timedelta(minutes=30), own_room=room),
+                 datetime(2018, 1, 1, 10, tzinfo=utc))
+    assert _get_location_event_ids({room.id}, set()) == {dummy_event.id}
+    assert _get_location_event_ids({other_room.id}, set()) == {other_event.id}
+    assert _get_location_event_ids({room.id, other_room.id}, set()) == {dummy_event.id, other_event.id}
+    assert _get_location_event_ids(set(), {dummy_location.id}) == set()
+    other_event.own_venue = dummy_location
+    assert _get_location_event_ids(set(), {dummy_location.id}) == {other_event.id}
+    assert _get_location_event_ids(set(), set()) == set()
+
+
+@pytest.mark.usefixtures('app_context')
+def test_location_renamed(dummy_user, create_room, dummy_location):
+    room = create_room()
+    # changes not affecting the displayed names are ignored
+    room.building = '1'
+    room.favorite_of.add(dummy_user)
+    room.max_advance_days = 30
+    assert 'timetable_renamed_locations' not in g
+    room.verbose_name = 'Main Amphitheatre'
+    dummy_location.name = 'Somewhere else'
+    assert g.timetable_renamed_locations == {('room', room.id), ('venue', dummy_location.id)}
+    # new rooms are not used anywhere yet
+    del g.timetable_renamed_locations
+    Room(building='1', floor='2', number='4', verbose_name='Test')
+    assert 'timetable_renamed_locations' not in g
@@ -22,7 +22,7 @@ from operator import attrgetter
 from flask import render_template, session
 from pytz import utc
 from sqlalchemy import Date, cast
-from sqlalchemy.orm import contains_eager, joinedload, subqueryload, undefer
+from sqlalchemy.orm import joinedload, subqueryload, undefer
 
 from indico.core.db import db
 from indico.modules.events.contributions.models.contributions import Contribution
@@ -31,7 +31,6 @@ from indico.modules.events.models.persons import EventPersonLink
 from indico.modules.events.sessions.models.blocks import SessionBlock
 from indico.modules.events.sessions.models.sessions import Session
 from indico.modules.events.timetable.legacy import TimetableSerializer, serialize_event_info
-from indico.modules.events.timetable.models.breaks import Break
 from indico.modules.events.timetable.models.entries import TimetableEntry, TimetableEntryType
 from indico.util.caching import memoize_request
 from indico.util.date_time import format_time, get_day_end, iterdays
@@ -41,38 +40,52 @@ from indico.web.flask.templating import get_template_module
 from indico.web.forms.colors import get_colors
 
 
-def _query_events(categ_ids, day_start, day_end):
-    event = db.aliased(Event)
+def _query_events(categ_ids, day_start, day_end, tz=None):
+    """Query the events which have anything happening in a time range.
+
+    :param tz: If specified, the query contains one row for each day
+               (in this timezone) on which the event has timetable
+               entries, consisting of the event id, the local date and
+               the start of the earliest entry on that day.  Events
+               without any timetable entries in the range have a single
+               row with both the date and start time set to ``None``.
+               Otherwise the query only contains the event ids.
+    """
     dates_overlap = lambda t: (t.start_dt >= day_start) & (t.start_dt <= day_end)
-    return (db.session.query(Event.id, TimetableEntry.start_dt)
-            .filter(
-                Event.category_chain_overlaps(categ_ids),
+    criteria = (Event.category_chain_overlaps(categ_ids),
                 ~Event.is_deleted,
-                ((Event.timetable_entries.any(dates_overlap(TimetableEntry))) |
-                 (Event.query.exists().where(
-                     Event.happens_between(day_start, day_end) &
-                     (Event.id == event.id)))))
-            .group_by(Event.id, TimetableEntry.start_dt)
-            .order_by(Event.id, TimetableEntry.start_dt)
-            .join(TimetableEntry,
-                  (TimetableEntry.event_id == Event.id) & (dates_overlap(TimetableEntry)),
-                  isouter=True))
+                Event.timetable_entries.any(dates_overlap(TimetableEntry)) | Event.happens_between(day_start, day_end))
+    if tz is None:
+        return db.session.query(Event.id).filter(*criteria)
+    local_date = cast(TimetableEntry.start_dt.astimezone(tz), Date)
+    return (db.session.query(Event.id, local_date, db.func.min(TimetableEntry.start_dt))
+            .filter(*criteria)
+            .outerjoin(TimetableEntry, (TimetableEntry.event_id == Event.id) & dates_overlap(TimetableEntry))
+            .group_by(Event.id, local_date))
 
 
-def _query_blocks(event_ids, dates_overlap, detail_level='session'):
-    options = [subqueryload('session').joinedload('blocks').joinedload('person_links')]
+def _query_entries(event_ids, dates_overlap, detail_level, tz):
+    """Query the timetable entries of some events.
 
+    The query returns tuples containing the `TimetableEntry` (with
+    its block, contribution or break loaded) and its local start date.
+    """
+    types = [TimetableEntryType.SESSION_BLOCK]
+    options = [joinedload(TimetableEntry.session_block)
+               .joinedload(SessionBlock.session)
+               .subqueryload(Session.blocks)
+               .joinedload(SessionBlock.person_links)]
     if detail_level == 'contribution':
-        options.append(contains_eager(SessionBlock.timetable_entry).joinedload(TimetableEntry.children))
-    else:
-        options.append(contains_eager(SessionBlock.timetable_entry))
-
-    return (SessionBlock.find(~Session.is_deleted,
-                              Session.event_id.in_(event_ids),
-                              dates_overlap(TimetableEntry))
-            .options(*options)
-            .join(TimetableEntry)
-            .join(Session))
+        types += [TimetableEntryType.CONTRIBUTION, TimetableEntryType.BREAK]
+        options += [joinedload(TimetableEntry.contribution).joinedload(Contribution.person_links),
+                    subqueryload(TimetableEntry.children)]
+    return (db.session.query(TimetableEntry, cast(TimetableEntry.start_dt.astimezone(tz), Date))
+            .filter(TimetableEntry.event_id.in_(event_ids),
+                    TimetableEntry.type.in_(types),
+                    dates_overlap(TimetableEntry),
+                    ~TimetableEntry.session_block.has(SessionBlock.session.has(Session.is_deleted)),
+                    ~TimetableEntry.contribution.has(Contribution.is_deleted))
+            .options(*options))
 
 
 def find_latest_entry_end_dt(obj, day=None):
@@ -139,6 +152,14 @@ def find_next_start_dt(duration, obj, day=None, force=False):
     return start_dt
 
 
+_entry_keys = {TimetableEntryType.SESSION_BLOCK: 'blocks',
+               TimetableEntryType.CONTRIBUTION: 'contributions',
+               TimetableEntryType.BREAK: 'breaks'}
+_grouped_entry_keys = {TimetableEntryType.SESSION_BLOCK: 'blocks',
+                       TimetableEntryType.CONTRIBUTION: 'contribs',
+                       TimetableEntryType.BREAK: 'breaks'}
+
+
 def get_category_timetable(categ_ids, start_dt, end_dt, detail_level='event', tz=utc, from_categ=None, grouped=True):
     """Retrieve time blocks that fall within a specific time interval
        for a given set of categories.
@@ -161,21 +182,25 @@ def get_category_timetable(categ_ids, start_dt, end_dt, detail_level='event', tz
     day_end = end_dt.astimezone(utc)
     dates_overlap = lambda t: (t.start_dt >= day_start) & (t.start_dt <= day_end)
 
-    items = defaultdict(lambda: defaultdict(list))
-
-    # first of all, query TimetableEntries/events that fall within
-    # specified range of dates (and category set)
-    events = _query_events(categ_ids, day_start, day_end)
+    # first of all, query the events that have anything happening
+    # in the specified range of dates (and category set)
+    events = _query_events(categ_ids, day_start, day_end, tz=(tz if grouped else None))
     if from_categ:
         events = events.filter(Event.is_visible_in(from_categ))
-    for eid, tt_start_dt in events:
-        if tt_start_dt:
-            items[eid][tt_start_dt.astimezone(tz).date()].append(tt_start_dt)
-        else:
-            items[eid] = None
+    if grouped:
+        # event_id -> {date: earliest timetable entry start_dt} or None if
+        # the event has no timetable entries in the interval
+        items = {}
+        for eid, local_date, tt_start_dt in events:
+            if local_date is None:
+                items[eid] = None
+            else:
+                items.setdefault(eid, {})[local_date] = tt_start_dt
+        event_ids = set(items)
+    else:
+        event_ids = {eid for eid, in events}
 
     # then, retrieve detailed information about the events
-    event_ids = set(items)
     query = (Event.find(Event.id.in_(event_ids))
              .options(subqueryload(Event.person_links).joinedload(EventPersonLink.person),
                       joinedload(Event.own_room).noload('owner'),
@@ -198,8 +223,8 @@ def get_category_timetable(categ_ids, start_dt, end_dt, detail_level='event', tz
                     else:
                         ongoing_events.append(e)
             else:
-                for start_d, start_dts in items[e.id].viewitems():
-                    scheduled_events[start_d].append((start_dts[0], e))
+                for start_d, tt_start_dt in items[e.id].viewitems():
+                    scheduled_events[start_d].append((tt_start_dt, e))
         else:
             events.append(e)
 
@@ -217,41 +242,14 @@ def get_category_timetable(categ_ids, start_dt, end_dt, detail_level='event', tz
     })
 
     # according to detail level, ask for extra information from the DB
-    if detail_level != 'event':
-        query = _query_blocks(event_ids, dates_overlap, detail_level)
-        if grouped:
-            for b in query:
-                start_date = b.timetable_entry.start_dt.astimezone(tz).date()
-                result[b.session.event_id]['blocks'][start_date].append((b.timetable_entry, b))
-        else:
-            for b in query:
-                result[b.session.event_id]['blocks'].append(b)
-
-    if detail_level == 'contribution':
-        query = (Contribution.find(Contribution.event_id.in_(event_ids),
-                                   dates_overlap(TimetableEntry),
-                                   ~Contribution.is_deleted)
-                 .options(contains_eager(Contribution.timetable_entry),
-                          joinedload(Contribution.person_links))
-                 .join(TimetableEntry))
-        if grouped:
-            for c in query:
-                start_date = c.timetable_entry.start_dt.astimezone(tz).date()
-                result[c.event_id]['contribs'][start_date].append((c.timetable_entry, c))
-        else:
-            for c in query:
-                result[c.event_id]['contributions'].append(c)
-
-        query = (Break.find(TimetableEntry.event_id.in_(event_ids), dates_overlap(TimetableEntry))
-                 .options(contains_eager(Break.timetable_entry))
-                 .join(TimetableEntry))
-        if grouped:
-            for b in query:
-                start_date = b.timetable_entry.start_dt.astimezone(tz).date()
-                result[b.timetable_entry.event_id]['breaks'][start_date].append((b.timetable_entry, b))
-        else:
-            for b in query:
-                result[b.timetable_entry.event_id]['breaks'].append(b)
+    if detail_level != 'event' and event_ids:
+        keys = _grouped_entry_keys if grouped else _entry_keys
+        for entry, start_date in _query_entries(event_ids, dates_overlap, detail_level, tz):
+            obj = entry.object
+            if grouped:
+                result[entry.event_id][keys[entry.type]][start_date].append((entry, obj))
+            else:
+                result[entry.event_id][keys[entry.type]].append(obj)
     return result
 
 
@@ -14,12 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
 import pytest
 from pytz import utc
 
-from indico.modules.events.timetable.util import find_latest_entry_end_dt
+from indico.modules.events.sessions.models.blocks import SessionBlock
+from indico.modules.events.sessions.models.sessions import Session
+from indico.modules.events.timetable.models.breaks import Break
+from indico.modules.events.timetable.util import find_latest_entry_end_dt, get_category_timetable
 
 
 pytest_plugins = ('indico.modules.events.timetable.testing.fixtures',)
@@ -39,3 +42,68 @@ def test_find_latest_entry_end_dt_valid_day(dummy_event, event_start_dt, event_e
     if not valid:
         with pytest.raises(ValueError):
             find_latest_entry_end_dt(obj=dummy_event, day=day)
+
+
+def _group_items(data, grouped):
+    # the order of the items on a day is not defined
+    if grouped:
+        return {day: set(items) for day, items in data.iteritems()}
+    return set(data)
+
+
+@pytest.mark.parametrize('grouped', (True, False))
+@pytest.mark.parametrize('detail_level', ('event', 'session', 'contribution'))
+def test_get_category_timetable(db, dummy_category, dummy_event, create_event, create_contribution, create_entry,
+                                detail_level, grouped):
+    day1 = date(2018, 1, 1)
+    day2 = date(2018, 1, 2)
+    dummy_event.start_dt = datetime(2018, 1, 1, 8, tzinfo=utc)
+    dummy_event.end_dt = datetime(2018, 1, 2, 18, tzinfo=utc)
+    # an event without any timetable entries spanning both days
+    other_event = create_event(1, start_dt=datetime(2018, 1, 1, 9, tzinfo=utc),
+                               end_dt=datetime(2018, 1, 2, 12, tzinfo=utc))
+    block = SessionBlock(session=Session(event=dummy_event, title='Session'), duration=timedelta(hours=2))
+    block_entry = create_entry(block, datetime(2018, 1, 1, 10, tzinfo=utc))
+    child_contrib = create_contribution(dummy_event, 'Child', timedelta(minutes=20))
+    child_entry = create_entry(child_contrib, datetime(2018, 1, 1, 10, tzinfo=utc))
+    child_entry.parent = block_entry
+    contrib = create_contribution(dummy_event, 'Talk', timedelta(minutes=20))
+    contrib_entry = create_entry(contrib, datetime(2018, 1, 2, 9, tzinfo=utc))
+    break_ = Break(title='Coffee', duration=timedelta(minutes=30))
+    break_entry = create_entry(break_, datetime(2018, 1, 2, 11, tzinfo=utc))
+    # entries of deleted sessions and contributions are never included
+    deleted_block = SessionBlock(session=Session(event=dummy_event, title='Deleted', is_deleted=True),
+                                 duration=timedelta(hours=1))
+    create_entry(deleted_block, datetime(2018, 1, 1, 14, tzinfo=utc))
+    deleted_contrib = create_contribution(dummy_event, 'Deleted', timedelta(minutes=20))
+    create_entry(deleted_contrib, datetime(2018, 1, 2, 15, tzinfo=utc))
+    deleted_contrib.is_deleted = True
+    db.session.flush()
+
+    result = get_category_timetable([dummy_category.id], datetime(2018, 1, 1, tzinfo=utc),
+                                    datetime(2018, 1, 2, 23, 59, tzinfo=utc), detail_level=detail_level,
+                                    grouped=grouped)
+    if grouped:
+        assert _group_items(result['events'], grouped) == {
+            day1: {(block_entry.start_dt, dummy_event), (other_event.start_dt, other_event)},
+            day2: {(contrib_entry.start_dt, dummy_event)}
+        }
+        assert result['ongoing_events'] == [other_event]
+    else:
+        assert set(result['events']) == {dummy_event, other_event}
+        assert result['ongoing_events'] == []
+    assert other_event.id not in result
+    if detail_level == 'event':
+        assert dummy_event.id not in result
+        return
+    if grouped:
+        expected = {'blocks': {day1: {(block_entry, block)}}}
+        if detail_level == 'contribution':
+            expected['contribs'] = {day1: {(child_entry, child_contrib)}, day2: {(contrib_entry, contrib)}}
+            expected['breaks'] = {day2: {(break_entry, break_)}}
+    else:
+        expected = {'blocks': {block}}
+        if detail_level == 'contribution':
+            expected['contributions'] = {child_contrib, contrib}
+            expected['breaks'] = {break_}
+    assert {key: _group_items(data, grouped) for key, data in result[dummy_event.id].iteritems()} == expected
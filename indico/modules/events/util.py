@@ -25,7 +25,6 @@ from contextlib import contextmanager
 from copy import deepcopy
 from mimetypes import guess_extension
 from tempfile import NamedTemporaryFile
-from zipfile import ZipFile
 
 from flask import current_app, flash, g, redirect, request, session
 from sqlalchemy import inspect
@@ -49,7 +48,7 @@ from indico.modules.events.sessions.models.sessions import Session
 from indico.modules.events.timetable.models.breaks import Break
 from indico.modules.events.timetable.models.entries import TimetableEntry
 from indico.modules.networks import IPNetworkGroup
-from indico.util.fs import chmod_umask, secure_filename
+from indico.util.fs import iter_zip_file, secure_filename
 from indico.util.i18n import _
 from indico.util.string import strip_tags
 from indico.util.user import principal_from_fossil
@@ -648,26 +647,29 @@ class ZipGeneratorMixin:
     def _generate_zip_file(self, files_holder, name_prefix='material', name_suffix=None):
         """Generate a zip file containing the files passed.
 
+        The zip file is streamed to the client while the files are read
+        from the storage, so nothing is written to disk.
+
         :param files_holder: An iterable (or an iterable containing) object that
                              contains the files to be added in the zip file.
         :param name_prefix: The prefix to the zip file name
         :param name_suffix: The suffix to the zip file name
-        :return: The generated zip file.
+        :return: A response streaming the generated zip file.
         """
-
-        temp_file = NamedTemporaryFile(suffix='indico.tmp', dir=config.TEMP_DIR)
-        with ZipFile(temp_file.name, 'w', allowZip64=True) as zip_handler:
-            self.used_filenames = set()
-            for item in self._iter_items(files_holder):
-                name = self._prepare_folder_structure(item)
-                self.used_filenames.add(name)
-                with item.storage.get_local_path(item.storage_file_id) as filepath:
-                    zip_handler.write(filepath.encode('utf-8'), name)
-
-        temp_file.delete = False
+        self.used_filenames = set()
+        files = []
+        for item in self._iter_items(files_holder):
+            name = self._prepare_folder_structure(item)
+            self.used_filenames.add(name)
+            files.append((name, item.storage, item.storage_file_id, item.size))
         zip_file_name = '{}-{}.zip'.format(name_prefix, name_suffix) if name_suffix else '{}.zip'.format(name_prefix)
-        chmod_umask(temp_file.name)
-        return send_file(zip_file_name, temp_file.name, 'application/zip', inline=False)
+        return send_file(zip_file_name, iter_zip_file(self._iter_zip_entries(files)), 'application/zip',
+                         inline=False)
+
+    def _iter_zip_entries(self, files):
+        for name, storage, file_id, size in files:
+            with storage.open(file_id) as fd:
+                yield name, fd, size
 
     def _prepare_folder_structure(self, item):
         file_name = secure_filename('{}_{}'.format(unicode(item.id), item.filename), item.filename)
@@ -19,7 +19,9 @@ from __future__ import unicode_literals
 from flask import session
 
 from indico.core import signals
+from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
 from indico.modules.groups.core import GroupProxy
+from indico.modules.groups.models.groups import LocalGroup
 from indico.util.i18n import _
 from indico.web.flask.util import url_for
 from indico.web.menu import SideMenuItem
@@ -34,6 +36,12 @@ def _extend_admin_menu(sender, **kwargs):
         return SideMenuItem('groups', _("Groups"), url_for('groups.groups'), section='user_management')
 
 
+@signals.model_committed.connect_via(LocalGroup)
+def _local_group_committed(sender, obj, change, **kwargs):
+    # group members may have been added or removed
+    invalidate_acl_cache()
+
+
 @signals.users.merged.connect
 def _merge_users(target, source, **kwargs):
     target.local_groups |= source.local_groups
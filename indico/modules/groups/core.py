@@ -241,7 +241,7 @@ class _MultipassGroupProxy(GroupProxy):
     def has_member(self, user):
         if not user:
             return False
-        cache = GenericCache('group-membership')
+        cache = GenericCache('group-membership', local=True)
         key = '{}:{}:{}'.format(self.provider, self.name, user.id)
         rv = cache.get(key)
         if rv is not None:
@@ -18,7 +18,10 @@ from datetime import datetime
 from math import ceil
 
 from dateutil import rrule
+from psycopg2.extras import DateTimeRange
 from sqlalchemy import Date, or_
+from sqlalchemy.dialects.postgresql import ARRAY, TSRANGE
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import defaultload
 from sqlalchemy.sql import cast
@@ -47,8 +50,13 @@ class ReservationOccurrenceState(int, IndicoEnum):
 
 class ReservationOccurrence(db.Model, Serializer):
     __tablename__ = 'reservation_occurrences'
-    __table_args__ = (db.CheckConstraint("rejection_reason != ''", 'rejection_reason_not_empty'),
-                      {'schema': 'roombooking'})
+
+    @declared_attr
+    def __table_args__(cls):
+        return (db.CheckConstraint("rejection_reason != ''", 'rejection_reason_not_empty'),
+                db.Index('ix_reservation_occurrences_tsrange', db.func.tsrange(cls.start_dt, cls.end_dt),
+                         postgresql_using='gist'),
+                {'schema': 'roombooking'})
     __api_public__ = (('start_dt', 'startDT'), ('end_dt', 'endDT'), 'is_cancelled', 'is_rejected')
 
     #: A relationship loading strategy that will avoid loading the
@@ -165,8 +173,22 @@ class ReservationOccurrence(db.Model, Serializer):
 
     @staticmethod
     def filter_overlap(occurrences):
-        return or_(db_dates_overlap(ReservationOccurrence, 'start_dt', occ.start_dt, 'end_dt', occ.end_dt)
-                   for occ in occurrences)
+        """Create a filter for occurrences overlapping any of the given ones.
+
+        Instead of building one condition for each occurrence, their time
+        ranges are sent as a single array which is joined against the
+        indexed ``tsrange`` of the stored occurrences.
+        """
+        if not occurrences:
+            return db.false()
+        ranges = [DateTimeRange(occ.start_dt, occ.end_dt) for occ in occurrences]
+        ranges_param = db.bindparam('overlap_ranges', ranges, type_=ARRAY(TSRANGE), unique=True)
+        candidates = db.func.unnest(ranges_param).alias('candidate')
+        occ_alias = db.aliased(ReservationOccurrence)
+        query = (db.select([occ_alias.reservation_id, occ_alias.start_dt])
+                 .select_from(candidates)
+                 .where(db.func.tsrange(occ_alias.start_dt, occ_alias.end_dt).op('&&')(db.column('candidate'))))
+        return db.tuple_(ReservationOccurrence.reservation_id, ReservationOccurrence.start_dt).in_(query)
 
     @classmethod
     def find_overlapping_with(cls, room, occurrences, skip_reservation_id=None):
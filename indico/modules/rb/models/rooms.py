@@ -53,7 +53,7 @@ from indico.util.user import unify_user_args
 from indico.web.flask.util import url_for
 
 
-_cache = GenericCache('Rooms')
+_cache = GenericCache('Rooms', local=True)
 
 
 class Room(versioned_cache(_cache, 'id'), ProtectionManagersMixin, db.Model, Serializer):
@@ -688,6 +688,9 @@ class Room(versioned_cache(_cache, 'id'), ProtectionManagersMixin, db.Model, Ser
     def protection_parent(self):
         return None
 
+    def _get_acl_cache_scope(self):
+        return [('Room', self.id)]
+
     @staticmethod
     def is_user_admin(user):
         return rb_is_admin(user)
@@ -824,11 +827,15 @@ class Room(versioned_cache(_cache, 'id'), ProtectionManagersMixin, db.Model, Ser
 
     @classmethod
     def get_owned_by(cls, user):
-        return [room for room in cls.find(is_active=True) if room.is_owned_by(user)]
+        rooms = cls.find_all(is_active=True)
+        cls.is_owned_by.queue(rooms, user)
+        return [room for room in rooms if room.is_owned_by(user)]
 
     @classmethod
     def user_owns_rooms(cls, user):
-        return any(room for room in cls.find(is_active=True) if room.is_owned_by(user))
+        rooms = cls.find_all(is_active=True)
+        cls.is_owned_by.queue(rooms, user)
+        return any(room for room in rooms if room.is_owned_by(user))
 
     def check_advance_days(self, end_date, user=None, quiet=False):
         if not self.max_advance_days:
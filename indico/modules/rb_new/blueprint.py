@@ -68,6 +68,7 @@ _bp.add_url_rule('/api/user/favorite-rooms/<int:room_id>', 'favorite_rooms', roo
 
 # Calendar/timeline
 _bp.add_url_rule('/api/calendar', 'calendar', bookings.RHCalendar, methods=('GET', 'POST'))
+_bp.add_url_rule('/api/calendar/matrix', 'calendar_matrix', bookings.RHCalendarMatrix, methods=('GET', 'POST'))
 _bp.add_url_rule('/api/timeline', 'timeline', bookings.RHTimeline, methods=('GET', 'POST'))
 
 # Bookings
@@ -20,7 +20,7 @@ from datetime import date, datetime, time
 
 import dateutil
 from flask import jsonify, request, session
-from marshmallow import fields
+from marshmallow import fields, validate
 from marshmallow_enum import EnumField
 from webargs.flaskparser import use_args, use_kwargs
 from werkzeug.exceptions import BadRequest, Forbidden, NotFound
@@ -37,8 +37,8 @@ from indico.modules.rb.models.rooms import Room
 from indico.modules.rb_new.controllers.backend.common import search_room_args
 from indico.modules.rb_new.operations.bookings import (get_active_bookings, get_booking_occurrences,
                                                        get_matching_events, get_room_bookings, get_room_calendar,
-                                                       get_rooms_availability, has_same_dates, should_split_booking,
-                                                       split_booking)
+                                                       get_room_occupancy_matrix, get_rooms_availability,
+                                                       has_same_dates, should_split_booking, split_booking)
 from indico.modules.rb_new.operations.suggestions import get_suggestions
 from indico.modules.rb_new.schemas import (create_booking_args, reservation_details_schema,
                                            reservation_linked_object_data_schema, reservation_occurrences_schema,
@@ -54,6 +54,8 @@ from indico.web.util import ExpectedError
 
 
 NUM_SUGGESTIONS = 5
+#: The maximum number of days in a room occupancy matrix
+MAX_MATRIX_DAYS = 31
 
 
 def _serialize_availability(availability):
@@ -144,6 +146,28 @@ class RHCalendar(RHRoomBookingBase):
         return jsonify(_serialize_availability(calendar).values())
 
 
+class RHCalendarMatrix(RHRoomBookingBase):
+    @use_kwargs({
+        'start_date': fields.Date(missing=date.today),
+        'end_date': fields.Date(missing=None),
+        'room_ids': fields.List(fields.Int(), missing=None),
+        'granularity': fields.Int(missing=15, validate=validate.OneOf([5, 10, 15, 20, 30, 60]))
+    })
+    def _process(self, start_date, end_date, room_ids, granularity):
+        if end_date is None:
+            end_date = start_date
+        elif end_date < start_date:
+            raise BadRequest('The end date cannot be before the start date')
+        elif (end_date - start_date).days >= MAX_MATRIX_DAYS:
+            raise BadRequest('The date range cannot be longer than {} days'.format(MAX_MATRIX_DAYS))
+        dates, matrix = get_room_occupancy_matrix(start_date, end_date, room_ids, granularity)
+        for data in matrix.viewvalues():
+            for key in ('bookings', 'pre_bookings'):
+                data[key] = {day.isoformat(): bitmap for day, bitmap in data[key].iteritems()}
+        return jsonify(date_range=[day.isoformat() for day in dates], granularity=granularity,
+                       rooms=matrix.values())
+
+
 class RHActiveBookings(RHRoomBookingBase):
     @use_kwargs({
         'room_ids': fields.List(fields.Int(), missing=None),
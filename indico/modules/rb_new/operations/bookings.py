@@ -16,8 +16,9 @@
 
 from __future__ import unicode_literals
 
+import math
 from collections import OrderedDict, defaultdict
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta
 from itertools import groupby
 from operator import attrgetter, itemgetter
 
@@ -34,7 +35,7 @@ from indico.modules.events.models.events import Event
 from indico.modules.events.models.principals import EventPrincipal
 from indico.modules.rb import rb_settings
 from indico.modules.rb.models.reservation_occurrences import ReservationOccurrence
-from indico.modules.rb.models.reservations import RepeatFrequency, Reservation, ReservationLink
+from indico.modules.rb.models.reservations import RepeatFrequency, Reservation, ReservationLink, ReservationState
 from indico.modules.rb.models.room_nonbookable_periods import NonBookablePeriod
 from indico.modules.rb.models.rooms import Room
 from indico.modules.rb_new.operations.blockings import get_rooms_blockings
@@ -231,6 +232,76 @@ def get_room_calendar(start_date, end_date, room_ids, include_inactive=False, **
     return calendar
 
 
+def _encode_slots(slots, num_slots):
+    """Encode occupied time slots as a hex string.
+
+    The string is read from left to right, i.e. the most significant
+    bit of the first hex digit corresponds to the first slot of the day.
+    """
+    bitmap = 0
+    for slot in slots:
+        bitmap |= 1 << (num_slots - slot - 1)
+    num_digits = (num_slots + 3) // 4
+    return '{:0{}x}'.format(bitmap << (num_digits * 4 - num_slots), num_digits)
+
+
+def get_room_occupancy_matrix(start_date, end_date, room_ids=None, granularity=15):
+    """Get a compact room occupancy matrix for a date range.
+
+    Rather than loading and serializing the occurrences of each room,
+    only the relevant columns are retrieved in a single query and each
+    day is turned into a bitmap with one bit per time slot.
+
+    :param start_date: The first day of the matrix
+    :param end_date: The last day of the matrix
+    :param room_ids: The rooms to include; all active rooms if omitted
+    :param granularity: The length of a time slot in minutes; it needs
+                        to evenly divide a day
+    :return: A tuple containing the list of dates and an ordered dict
+             mapping room ids to a dict with the ``bookings`` and
+             ``pre_bookings`` bitmaps of each day that has any
+    """
+    if (24 * 60) % granularity:
+        raise ValueError('Invalid granularity: {}'.format(granularity))
+    num_slots = 24 * 60 // granularity
+    start_dt = datetime.combine(start_date, time.min)
+    end_dt = datetime.combine(end_date, time.max)
+    room_query = (db.session.query(Room.id)
+                  .filter(Room.is_active, Room.id.in_(room_ids) if room_ids else True)
+                  .order_by(db.func.indico.natsort(Room.full_name)))
+    query = (db.session.query(Reservation.room_id, Reservation.state, ReservationOccurrence.start_dt,
+                              ReservationOccurrence.end_dt)
+             .select_from(ReservationOccurrence)
+             .join(ReservationOccurrence.reservation)
+             .join(Reservation.room)
+             .filter(Room.is_active,
+                     Room.id.in_(room_ids) if room_ids else True,
+                     ReservationOccurrence.is_valid,
+                     db_dates_overlap(ReservationOccurrence, 'start_dt', start_dt, 'end_dt', end_dt)))
+
+    slots = defaultdict(lambda: defaultdict(set))
+    for room_id, state, occ_start_dt, occ_end_dt in query:
+        key = 'bookings' if state == ReservationState.accepted else 'pre_bookings'
+        for day in iterdays(max(occ_start_dt, start_dt), min(occ_end_dt, end_dt)):
+            day_start_dt = datetime.combine(day.date(), time.min)
+            start_minutes = (max(occ_start_dt, day_start_dt) - day_start_dt).total_seconds() / 60
+            end_minutes = (min(occ_end_dt, day_start_dt + timedelta(days=1)) - day_start_dt).total_seconds() / 60
+            first_slot = int(start_minutes // granularity)
+            last_slot = int(math.ceil(end_minutes / granularity))
+            if last_slot > first_slot:
+                # nothing is occupied on the next day if it ends at midnight
+                slots[room_id, key][day.date()].update(xrange(first_slot, last_slot))
+
+    matrix = OrderedDict()
+    for room_id, in room_query:
+        matrix[room_id] = {'room_id': room_id}
+        for key in ('bookings', 'pre_bookings'):
+            matrix[room_id][key] = {day: _encode_slots(day_slots, num_slots)
+                                    for day, day_slots in slots[room_id, key].iteritems()}
+    dates = [d.date() for d in iterdays(start_dt, end_dt)]
+    return dates, matrix
+
+
 def get_room_details_availability(room, start_dt, end_dt):
     dates = [d.date() for d in iterdays(start_dt, end_dt)]
 
@@ -71,3 +71,41 @@ def past_booking_occurrences_are_cancelled(dummy_user, create_reservation):
     number_of_cancelled_occurrences = [occ for occ in reservation.occurrences if occ.is_cancelled]
     assert number_of_cancelled_occurrences == 2
     assert len(new_reservation.occurrences) == 4
+
+
+@pytest.mark.parametrize(('slots', 'num_slots', 'expected'), (
+    ((), 8, '00'),
+    ((0,), 8, '80'),
+    ((7,), 8, '01'),
+    ((0, 1, 2, 3), 8, 'f0'),
+    ((0, 5), 6, '84'),
+    (range(96), 96, 'f' * 24),
+))
+def test_encode_slots(slots, num_slots, expected):
+    from indico.modules.rb_new.operations.bookings import _encode_slots
+    assert _encode_slots(slots, num_slots) == expected
+
+
+def test_room_occupancy_matrix(create_reservation, dummy_room):
+    from indico.modules.rb_new.operations.bookings import get_room_occupancy_matrix
+
+    day = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    create_reservation(start_dt=day.replace(hour=8), end_dt=day.replace(hour=9, minute=10),
+                       repeat_frequency=RepeatFrequency.NEVER)
+    dates, matrix = get_room_occupancy_matrix(day.date(), day.date() + timedelta(days=1), [dummy_room.id],
+                                              granularity=60)
+    assert dates == [day.date(), day.date() + timedelta(days=1)]
+    assert matrix.keys() == [dummy_room.id]
+    assert matrix[dummy_room.id]['bookings'] == {day.date(): '00c000'}
+    assert matrix[dummy_room.id]['pre_bookings'] == {}
+
+
+def test_room_occupancy_matrix_midnight(create_reservation, dummy_room):
+    from indico.modules.rb_new.operations.bookings import get_room_occupancy_matrix
+
+    day = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    create_reservation(start_dt=day.replace(hour=22), end_dt=day + timedelta(days=1),
+                       repeat_frequency=RepeatFrequency.NEVER)
+    dates, matrix = get_room_occupancy_matrix(day.date(), day.date() + timedelta(days=1), [dummy_room.id],
+                                              granularity=60)
+    assert matrix[dummy_room.id]['bookings'] == {day.date(): '000003'}
@@ -17,6 +17,7 @@
 from __future__ import unicode_literals
 
 from collections import defaultdict
+from datetime import timedelta
 
 from flask import session
 from sqlalchemy.orm import contains_eager
@@ -26,7 +27,7 @@ from indico.modules.rb.models.reservations import Reservation
 from indico.modules.rb.models.rooms import Room
 from indico.modules.rb.util import rb_is_admin
 from indico.modules.rb_new.util import TempReservationOccurrence
-from indico.util.date_time import get_overlap
+from indico.util.date_time import get_overlap, iter_overlaps
 from indico.util.struct.iterables import group_list
 
 
@@ -60,15 +61,16 @@ def get_rooms_conflicts(rooms, start_dt, end_dt, repeat_frequency, repeat_interv
         rooms_conflicting_candidates[room_id] |= conflicting_candidates
 
     if not (allow_admin and rb_is_admin(session.user)):
+        rooms_by_id = {room.id: room for room in rooms}
         for room_id, occurrences in nonbookable_periods.iteritems():
-            room = Room.get_one(room_id)
+            room = rooms_by_id.get(room_id) or Room.get_one(room_id)
             if not room.can_override(session.user, allow_admin=allow_admin):
                 conflicts, conflicting_candidates = get_room_nonbookable_periods_conflicts(candidates, occurrences)
                 rooms_conflicts[room_id] += conflicts
                 rooms_conflicting_candidates[room_id] |= conflicting_candidates
 
         for room_id, occurrences in unbookable_hours.iteritems():
-            room = Room.get_one(room_id)
+            room = rooms_by_id.get(room_id) or Room.get_one(room_id)
             if not room.can_override(session.user, allow_admin=allow_admin):
                 conflicts, conflicting_candidates = get_room_unbookable_hours_conflicts(candidates, occurrences)
                 rooms_conflicts[room_id] += conflicts
@@ -77,50 +79,55 @@ def get_rooms_conflicts(rooms, start_dt, end_dt, repeat_frequency, repeat_interv
     return rooms_conflicts, rooms_pre_conflicts, rooms_conflicting_candidates
 
 
+def _iter_overlapping(candidates, occurrences):
+    """Iterate over all overlapping candidate/occurrence pairs."""
+    candidate_ranges = [(candidate.start_dt, candidate.end_dt) for candidate in candidates]
+    occurrence_ranges = [(occurrence.start_dt, occurrence.end_dt) for occurrence in occurrences]
+    for i, j in iter_overlaps(candidate_ranges, occurrence_ranges):
+        yield candidates[i], occurrences[j]
+
+
 def get_room_bookings_conflicts(candidates, occurrences, room_id, skip_conflicts_with=frozenset()):
     conflicts = []
     pre_conflicts = []
     conflicting_candidates = set()
-    for candidate in candidates:
-        for occurrence in occurrences:
-            if occurrence.reservation.id in skip_conflicts_with:
-                continue
-            if candidate.overlaps(occurrence):
-                conflicting_candidates.add(candidate)
-                overlap = candidate.get_overlap(occurrence)
-                obj = TempReservationOccurrence(*overlap, reservation=occurrence.reservation)
-                if occurrence.reservation.is_accepted:
-                    conflicts.append(obj)
-                else:
-                    pre_conflicts.append(obj)
+    occurrences = [occ for occ in occurrences if occ.reservation.id not in skip_conflicts_with]
+    for candidate, occurrence in _iter_overlapping(candidates, occurrences):
+        conflicting_candidates.add(candidate)
+        overlap = candidate.get_overlap(occurrence)
+        obj = TempReservationOccurrence(*overlap, reservation=occurrence.reservation)
+        if occurrence.reservation.is_accepted:
+            conflicts.append(obj)
+        else:
+            pre_conflicts.append(obj)
     return conflicts, pre_conflicts, conflicting_candidates
 
 
 def get_room_blockings_conflicts(room_id, candidates, occurrences):
     conflicts = []
     conflicting_candidates = set()
-    for candidate in candidates:
-        for occurrence in occurrences:
-            blocking = occurrence.blocking
-            if blocking.start_date <= candidate.start_dt.date() <= blocking.end_date:
-                if blocking.can_be_overridden(session.user, room=Room.get(room_id)):
-                    continue
-                conflicting_candidates.add(candidate)
-                obj = TempReservationOccurrence(candidate.start_dt, candidate.end_dt, None)
-                conflicts.append(obj)
+    room = Room.get(room_id)
+    occurrences = [occ for occ in occurrences if not occ.blocking.can_be_overridden(session.user, room=room)]
+    # blockings cover full days, so we compare the candidate's day with the blocked days
+    candidate_ranges = [(candidate.start_dt.date(), candidate.start_dt.date() + timedelta(days=1))
+                        for candidate in candidates]
+    blocking_ranges = [(occ.blocking.start_date, occ.blocking.end_date + timedelta(days=1)) for occ in occurrences]
+    for i, __ in iter_overlaps(candidate_ranges, blocking_ranges):
+        candidate = candidates[i]
+        conflicting_candidates.add(candidate)
+        obj = TempReservationOccurrence(candidate.start_dt, candidate.end_dt, None)
+        conflicts.append(obj)
     return conflicts, conflicting_candidates
 
 
 def get_room_nonbookable_periods_conflicts(candidates, occurrences):
     conflicts = []
     conflicting_candidates = set()
-    for candidate in candidates:
-        for occurrence in occurrences:
-            overlap = get_overlap((candidate.start_dt, candidate.end_dt), (occurrence.start_dt, occurrence.end_dt))
-            if overlap.count(None) != len(overlap):
-                conflicting_candidates.add(candidate)
-                obj = TempReservationOccurrence(overlap[0], overlap[1], None)
-                conflicts.append(obj)
+    for candidate, occurrence in _iter_overlapping(candidates, occurrences):
+        overlap = get_overlap((candidate.start_dt, candidate.end_dt), (occurrence.start_dt, occurrence.end_dt))
+        conflicting_candidates.add(candidate)
+        obj = TempReservationOccurrence(overlap[0], overlap[1], None)
+        conflicts.append(obj)
     return conflicts, conflicting_candidates
 
 
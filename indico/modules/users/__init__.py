@@ -19,11 +19,13 @@ from __future__ import unicode_literals
 from flask import render_template, session
 
 from indico.core import signals
+from indico.core.db.sqlalchemy.protection import invalidate_acl_cache
 from indico.core.logger import Logger
 from indico.core.notifications import make_email, send_email
 from indico.core.settings import SettingsProxy
 from indico.core.settings.converters import EnumConverter
 from indico.modules.users.ext import ExtraUserPreferences
+from indico.modules.users.models.emails import UserEmail
 from indico.modules.users.models.settings import UserSetting, UserSettingsProxy
 from indico.modules.users.models.users import NameFormat, User
 from indico.util.i18n import _
@@ -55,6 +57,12 @@ user_management_settings = SettingsProxy('user_management', {
 })
 
 
+@signals.model_committed.connect_via(UserEmail)
+def _user_email_committed(sender, obj, change, **kwargs):
+    # emails are used to check email principals in ACLs
+    invalidate_acl_cache()
+
+
 @signals.category.deleted.connect
 def _category_deleted(category, **kwargs):
     category.favorite_of.clear()
@@ -0,0 +1,73 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import pytest
+
+
+class DictCache(object):
+    """An in-memory cache with the same interface as `GenericCache`"""
+
+    def __init__(self, namespace=None, **kwargs):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def get_multi(self, keys):
+        return {key: self.data.get(key) for key in keys}
+
+    def set(self, key, val, time=0):
+        self.data[key] = val
+
+    def set_multi(self, mapping, time=0):
+        self.data.update(mapping)
+
+    def add(self, key, val, time=0):
+        if key in self.data:
+            return False
+        self.data[key] = val
+        return True
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def dict_cache(mocker):
+    """Replaces all newly created `GenericCache` objects with in-memory caches
+
+    Returns a dict containing the caches for each namespace.
+    """
+    caches = {}
+
+    def _make_cache(namespace, **kwargs):
+        return caches.setdefault(namespace, DictCache(namespace))
+
+    mocker.patch('indico.legacy.common.cache.GenericCache', side_effect=_make_cache)
+    return caches
+
+
+@pytest.fixture
+def mock_cache(mocker):
+    """Returns a callable which replaces an existing cache with an in-memory one"""
+    def _mock_cache(target):
+        cache = DictCache()
+        mocker.patch(target, cache)
+        return cache
+
+    return _mock_cache
@@ -29,7 +29,7 @@ import py
 # Ignore config file in case there is one
 os.environ['INDICO_CONFIG'] = os.devnull
 
-pytest_plugins = ('indico.testing.fixtures.app', 'indico.testing.fixtures.category',
+pytest_plugins = ('indico.testing.fixtures.app', 'indico.testing.fixtures.cache', 'indico.testing.fixtures.category',
                   'indico.testing.fixtures.contribution', 'indico.testing.fixtures.database',
                   'indico.testing.fixtures.disallow', 'indico.testing.fixtures.person', 'indico.testing.fixtures.user',
                   'indico.testing.fixtures.event', 'indico.testing.fixtures.smtp', 'indico.testing.fixtures.storage',
@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
+import time
+from datetime import timedelta
 from functools import wraps
 from inspect import getcallargs
 
@@ -22,6 +24,11 @@ from flask import current_app, g, has_request_context
 
 _notset = object()
 
+#: How long a process may compute a `single_flight` memoized value
+_SINGLE_FLIGHT_LOCK_TTL = 300
+#: How long to wait for another process computing the value
+_SINGLE_FLIGHT_MAX_WAIT = 30
+
 
 def make_hashable(obj):
     if isinstance(obj, list):
@@ -70,20 +77,49 @@ def memoize_request(f):
     return memoizer
 
 
-def memoize_redis(ttl):
+class _StaleableValue(object):
+    """A memoized value which may be served after it expired."""
+
+    __slots__ = ('value', 'expires')
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+
+def memoize_redis(ttl, single_flight=False, stale_ttl=None):
     """Memoize a function in redis
 
     The cached value can be cleared by calling the method
     ``clear_cached()`` of the decorated function with the same
     arguments that were used during the function call.  To check
     whether a value has been cached call ``is_cached()`` in the
-    same way.
+    same way.  If the function is about to be called with many
+    different arguments during a request, calling ``queue()`` with
+    each of these arguments first makes sure all the cached values
+    are retrieved from redis at once.
 
     :param ttl: How long the result should be cached.  May be a
                 timedelta or a number (seconds).
+    :param single_flight: Whether only one process should compute
+                          a missing value.  Other processes wait
+                          until the value is available instead of
+                          computing it themselves.
+    :param stale_ttl: How long an expired value may still be returned
+                      after it expired.  When an expired value is
+                      returned, a Celery task is triggered to refresh
+                      it in the background so callers never wait for
+                      the value to be computed again.  This is only
+                      available for module-level functions.  May be
+                      a timedelta or a number (seconds).
     """
     from indico.legacy.common.cache import GenericCache
-    cache = GenericCache('memoize')
+    cache = GenericCache('memoize', local=True)
+    locks = GenericCache('memoize-locks')
+    if isinstance(ttl, timedelta):
+        ttl = int(ttl.total_seconds())
+    if isinstance(stale_ttl, timedelta):
+        stale_ttl = int(stale_ttl.total_seconds())
 
     def decorator(f):
         def _get_key(args, kwargs):
@@ -95,6 +131,35 @@ def memoize_redis(ttl):
         def _is_cached(*args, **kwargs):
             return cache.get(_get_key(args, kwargs), _notset) is not _notset
 
+        def _queue(*args, **kwargs):
+            cache.queue(_get_key(args, kwargs))
+
+        def _compute(key, args, kwargs):
+            value = f(*args, **kwargs)
+            if stale_ttl:
+                cache.set(key, _StaleableValue(value, time.time() + ttl), ttl + stale_ttl)
+            else:
+                cache.set(key, value, ttl)
+            return value
+
+        def _refresh(*args, **kwargs):
+            key = _get_key(args, kwargs)
+            try:
+                return _compute(key, args, kwargs)
+            finally:
+                locks.delete(key)
+
+        def _wait_for_value(key):
+            deadline = time.time() + _SINGLE_FLIGHT_MAX_WAIT
+            while time.time() < deadline:
+                time.sleep(0.1)
+                value = cache.get(key, _notset)
+                if value is not _notset:
+                    return value
+                elif not locks.get(key):
+                    break
+            return _notset
+
         @wraps(f)
         def memoizer(*args, **kwargs):
             if current_app.config['TESTING'] or current_app.config.get('REPL'):
@@ -104,12 +169,25 @@ def memoize_redis(ttl):
             key = _get_key(args, kwargs)
             value = cache.get(key, _notset)
             if value is _notset:
-                value = f(*args, **kwargs)
-                cache.set(key, value, ttl)
+                if not single_flight:
+                    return _compute(key, args, kwargs)
+                elif locks.add(key, True, _SINGLE_FLIGHT_LOCK_TTL):
+                    return _refresh(*args, **kwargs)
+                value = _wait_for_value(key)
+                if value is _notset:
+                    # the other process failed or is taking too long
+                    return _compute(key, args, kwargs)
+            if isinstance(value, _StaleableValue):
+                if value.expires < time.time() and locks.add(key, True, _SINGLE_FLIGHT_LOCK_TTL):
+                    from indico.util.tasks import refresh_memoized
+                    refresh_memoized.delay(f.__module__, f.__name__, args, kwargs)
+                value = value.value
             return value
 
         memoizer.clear_cached = _clear_cached
         memoizer.is_cached = _is_cached
+        memoizer.queue = _queue
+        memoizer.refresh = _refresh
         return memoizer
 
     return decorator
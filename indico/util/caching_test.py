@@ -13,9 +13,11 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
+import time
+
 import pytest
 
-from indico.util.caching import memoize_request
+from indico.util.caching import memoize_redis, memoize_request
 
 
 @pytest.fixture
@@ -82,3 +84,77 @@ def test_memoize_request_legacy_class():
         fn(New)
         fn(new_instance)
     assert calls == [Old, old_instance, New, new_instance]
+
+
+@pytest.mark.usefixtures('not_testing')
+def test_memoize_redis(dict_cache):
+    calls = []
+
+    @memoize_redis(60)
+    def fn(a):
+        calls.append(a)
+        return a * 2
+
+    assert fn(1) == 2
+    assert fn(1) == 2
+    assert fn(2) == 4
+    assert calls == [1, 2]
+    assert fn.is_cached(1)
+    fn.clear_cached(1)
+    assert not fn.is_cached(1)
+    assert fn(1) == 2
+    assert calls == [1, 2, 1]
+
+
+@pytest.mark.usefixtures('not_testing')
+def test_memoize_redis_single_flight(dict_cache, mocker):
+    mocker.patch('indico.util.caching._SINGLE_FLIGHT_MAX_WAIT', 0.3)
+    calls = []
+
+    @memoize_redis(60, single_flight=True)
+    def fn(a):
+        calls.append(a)
+        return a * 2
+
+    assert fn(1) == 2
+    assert calls == [1]
+    assert not dict_cache['memoize-locks'].data
+    # another process is computing the value and finishes while we wait
+    locks = dict_cache['memoize-locks']
+    locks.add = lambda key, val, time=0: False
+    locks.get = lambda key, default=None: True
+    cache = dict_cache['memoize']
+    cache_get = cache.get
+    available = [False, True]
+    cache.get = lambda key, default=None: 4 if available.pop(0) else default
+    assert fn(2) == 4
+    assert calls == [1]
+    # the other process takes too long so we compute it ourselves
+    cache.get = cache_get
+    assert fn(3) == 6
+    assert calls == [1, 3]
+
+
+@pytest.mark.usefixtures('not_testing')
+def test_memoize_redis_stale(dict_cache, mocker):
+    delay = mocker.patch('indico.util.tasks.refresh_memoized.delay')
+    calls = []
+
+    @memoize_redis(60, stale_ttl=60)
+    def fn(a):
+        calls.append(a)
+        return len(calls)
+
+    assert fn(1) == 1
+    assert fn(1) == 1
+    assert not delay.called
+    # value expired, we get the stale value and trigger a refresh
+    cached_value = next(iter(dict_cache['memoize'].data.itervalues()))
+    cached_value.expires = time.time() - 1
+    assert fn(1) == 1
+    assert fn(1) == 1
+    delay.assert_called_once_with(fn.__module__, 'fn', (1,), {})
+    # the celery task refreshes the value and releases the lock
+    assert fn.refresh(1) == 2
+    assert fn(1) == 2
+    assert not dict_cache['memoize-locks'].data
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
+import heapq
 from collections import OrderedDict
 from datetime import datetime
 from datetime import time as dt_time
@@ -347,6 +348,41 @@ def get_overlap(range1, range2):
     return latest_start, earliest_end
 
 
+def iter_overlaps(ranges, other_ranges):
+    """Find all pairs of overlapping ranges in two lists of ranges.
+
+    Instead of comparing each range with every range in the other
+    list, this sorts both lists and sweeps through them, keeping
+    only ranges that may still overlap with the following ones.
+
+    :param ranges: A list of ``(start, end)`` tuples
+    :param other_ranges: A list of ``(start, end)`` tuples
+    :return: An iterator yielding an ``(index, other_index)`` tuple
+             for each pair of overlapping ranges (using the same
+             semantics as :func:`overlaps`), ordered by ``index``
+             and ``other_index``.
+    """
+    order = sorted(xrange(len(ranges)), key=lambda i: ranges[i][0])
+    other_order = sorted(xrange(len(other_ranges)), key=lambda i: other_ranges[i][0])
+    matches = {}
+    active = []  # heap of (end, index) of other ranges which started already
+    pos = 0
+    for i in order:
+        start, end = ranges[i]
+        while pos < len(other_order) and other_ranges[other_order[pos]][0] < end:
+            j = other_order[pos]
+            heapq.heappush(active, (other_ranges[j][1], j))
+            pos += 1
+        # since the ranges are sorted by their start, ranges which ended
+        # already cannot overlap with any of the following ranges either
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        matches[i] = sorted(j for __, j in active if other_ranges[j][0] < end)
+    for i in xrange(len(ranges)):
+        for j in matches[i]:
+            yield i, j
+
+
 def iterdays(start, end, skip_weekends=False, day_whitelist=None, day_blacklist=None):
     tzinfo = start.tzinfo if isinstance(start, datetime) else None
     weekdays = (MO, TU, WE, TH, FR) if skip_weekends else None
@@ -14,12 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
+import random
 from datetime import datetime, timedelta
 
 import pytest
 from pytz import timezone
 
-from indico.util.date_time import as_utc, format_human_timedelta, iterdays, strftime_all_years
+from indico.util.date_time import as_utc, format_human_timedelta, iter_overlaps, iterdays, overlaps, strftime_all_years
 
 
 @pytest.mark.parametrize(('delta', 'granularity', 'expected'), (
@@ -77,3 +78,29 @@ iterdays_test_data = (
                          iterdays_test_data)
 def test_iterdays(from_, to, skip_weekends, day_whitelist, day_blacklist, expected):
     assert len(list(iterdays(from_, to, skip_weekends, day_whitelist, day_blacklist))) == expected
+
+
+@pytest.mark.parametrize(('ranges', 'other_ranges', 'expected'), (
+    ([], [(1, 2)], []),
+    ([(1, 2)], [], []),
+    ([(1, 3), (5, 7)], [(2, 6)], [(0, 0), (1, 0)]),
+    ([(1, 3)], [(3, 4), (0, 1)], []),
+    ([(5, 7), (1, 3)], [(2, 6), (0, 10), (6, 6)], [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1)]),
+    ([(0, 10), (2, 3)], [(4, 5), (1, 2)], [(0, 0), (0, 1)]),
+))
+def test_iter_overlaps(ranges, other_ranges, expected):
+    assert list(iter_overlaps(ranges, other_ranges)) == expected
+
+
+def test_iter_overlaps_random():
+    rnd = random.Random(42)
+
+    def _make_ranges(n):
+        starts = (rnd.randint(0, 100) for __ in xrange(n))
+        return [(start, start + rnd.randint(0, 10)) for start in starts]
+
+    for __ in xrange(100):
+        ranges = _make_ranges(rnd.randint(0, 20))
+        other_ranges = _make_ranges(rnd.randint(0, 20))
+        expected = [(i, j) for i, r in enumerate(ranges) for j, o in enumerate(other_ranges) if overlaps(r, o)]
+        assert list(iter_overlaps(ranges, other_ranges)) == expected
@@ -14,13 +14,16 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
-from __future__ import unicode_literals
+from __future__ import absolute_import, unicode_literals
 
 import errno
 import hashlib
 import os
+import struct
 import time
+import zlib
 from datetime import datetime
+from zipfile import ZIP64_LIMIT, ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
 from werkzeug.utils import secure_filename as _secure_filename
 
@@ -144,3 +147,172 @@ def get_file_checksum(fileobj, chunk_size=1024*1024, algorithm=hashlib.md5):
             break
         checksum.update(chunk)
     return unicode(checksum.hexdigest())
+
+
+class FileObjZipFile(ZipFile):
+    """A `ZipFile` which can add the contents of file-like objects.
+
+    Unlike `ZipFile.write` this does not require the files to exist on
+    disk, so files from any storage backend can be added without
+    copying them to a temporary file first.
+
+    This writes the file entries itself and thus relies on internals
+    of the `zipfile` module of Python 2.7 (``fp``, ``filelist``,
+    ``NameToInfo``, ``_writecheck``, ``_didModify`` and ``_allowZip64``).
+    It needs to be checked when updating Python; starting with Python
+    3.6 the same can be done using ``ZipFile.open(name, 'w')``.
+    """
+
+    def add_fileobj(self, arcname, fileobj, size, chunk_size=1024*1024):
+        """Add the contents of a file-like object.
+
+        The ZIP file needs to be written to a seekable file since the
+        file header is updated once the checksum and sizes are known.
+
+        :param arcname: The name of the file inside the ZIP file
+        :param fileobj: A file-like object containing the file data
+        :param size: The size of the file, used to decide whether
+                     ZIP64 extensions are needed
+        :param chunk_size: The number of bytes to read at once
+        """
+        zinfo, zip64 = self._write_fileobj_header(arcname, size, data_descriptor=False)
+        for chunk in _iter_zip_data(zinfo, fileobj, zip64, chunk_size):
+            self.fp.write(chunk)
+        position = self.fp.tell()
+        self.fp.seek(zinfo.header_offset)
+        self.fp.write(zinfo.FileHeader(zip64))
+        self.fp.seek(position)
+        self._add_fileobj_info(zinfo)
+
+    def iter_add_fileobj(self, arcname, fileobj, size, chunk_size=1024*1024):
+        """Add the contents of a file-like object without seeking.
+
+        The checksum and sizes are written in a "data descriptor" after
+        the file data.  This is a generator which yields after writing
+        each chunk so the caller can consume the data written to the
+        underlying file; it needs to be exhausted to add the file.
+
+        :param arcname: The name of the file inside the ZIP file
+        :param fileobj: A file-like object containing the file data
+        :param size: The size of the file, used to decide whether
+                     ZIP64 extensions are needed
+        :param chunk_size: The number of bytes to read at once
+        """
+        zinfo, zip64 = self._write_fileobj_header(arcname, size, data_descriptor=True)
+        for chunk in _iter_zip_data(zinfo, fileobj, zip64, chunk_size):
+            self.fp.write(chunk)
+            yield
+        self.fp.write(struct.pack(b'<4sLQQ' if zip64 else b'<4sLLL', b'PK\x07\x08', zinfo.CRC, zinfo.compress_size,
+                                  zinfo.file_size))
+        self._add_fileobj_info(zinfo)
+
+    def _write_fileobj_header(self, arcname, size, data_descriptor):
+        zinfo = _make_zip_info(arcname, self.compression)
+        if data_descriptor:
+            zinfo.flag_bits |= 0x08
+        else:
+            zinfo.file_size = size
+        zinfo.header_offset = self.fp.tell()
+        self._writecheck(zinfo)
+        self._didModify = True
+        # without a data descriptor the header is written again once the
+        # checksum and sizes are known, so we need to decide now whether
+        # to use the larger ZIP64 header
+        zip64 = self._allowZip64 and size * 1.05 > ZIP64_LIMIT
+        if zip64:
+            zinfo.extract_version = max(45, zinfo.extract_version)
+        self.fp.write(zinfo.FileHeader(zip64))
+        return zinfo, zip64
+
+    def _add_fileobj_info(self, zinfo):
+        self.filelist.append(zinfo)
+        self.NameToInfo[zinfo.filename] = zinfo
+
+
+def iter_zip_file(files, compression=ZIP_STORED, chunk_size=1024*1024):
+    """Generate a ZIP file on the fly.
+
+    The ZIP file is generated while it is being consumed, so it can be
+    streamed to the client without storing it anywhere.  Since the
+    checksum and size of each file are only known after reading it,
+    they are sent after the file data in a "data descriptor".
+
+    :param files: An iterable yielding ``(arcname, fileobj, size)``
+                  tuples.  The size is used to decide whether ZIP64
+                  extensions are needed for the file.  Each file object
+                  is fully read before the next item is requested, so
+                  the iterable may close it then.
+    :param compression: The compression method (``ZIP_STORED`` or
+                        ``ZIP_DEFLATED``)
+    :param chunk_size: The number of bytes to read at once
+    :return: A generator yielding the contents of the ZIP file
+    """
+    buf = _ZipStreamBuffer()
+    zip_file = FileObjZipFile(buf, 'w', compression, allowZip64=True)
+    for arcname, fileobj, size in files:
+        for __ in zip_file.iter_add_fileobj(arcname, fileobj, size, chunk_size):
+            yield buf.pop()
+    # this only writes the central directory as the files are already in the buffer
+    zip_file.close()
+    yield buf.pop()
+
+
+def _make_zip_info(arcname, compression):
+    zinfo = ZipInfo(arcname, time.localtime()[:6])
+    zinfo.external_attr = 0o644 << 16
+    zinfo.compress_type = compression
+    zinfo.CRC = zinfo.compress_size = zinfo.file_size = 0
+    return zinfo
+
+
+def _iter_zip_data(zinfo, fileobj, zip64, chunk_size):
+    """Read and compress a file, updating the checksum and sizes in `zinfo`"""
+    compressor = None
+    if zinfo.compress_type == ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    crc = file_size = compress_size = 0
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        file_size += len(chunk)
+        crc = zlib.crc32(chunk, crc) & 0xffffffff
+        if compressor:
+            chunk = compressor.compress(chunk)
+        compress_size += len(chunk)
+        yield chunk
+    if compressor:
+        chunk = compressor.flush()
+        compress_size += len(chunk)
+        yield chunk
+    if not zip64 and max(file_size, compress_size) > ZIP64_LIMIT:
+        raise RuntimeError('File is too large for a ZIP file without ZIP64 extensions')
+    zinfo.CRC = crc
+    zinfo.file_size = file_size
+    zinfo.compress_size = compress_size
+
+
+class _ZipStreamBuffer(object):
+    """Write-only file which keeps data until it is consumed.
+
+    This is used as the underlying file of a `ZipFile` which is being
+    streamed, since `ZipFile` needs to know the current position in the
+    file but never needs to seek when files are added using data
+    descriptors.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(data)
+        self._position += len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        del self._chunks[:]
+        return data
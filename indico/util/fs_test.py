@@ -14,9 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Indico; if not, see <http://www.gnu.org/licenses/>.
 
+import os
+from io import BytesIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
 import pytest
 
-from indico.util.fs import secure_filename
+from indico.util.fs import FileObjZipFile, iter_zip_file, secure_filename
 
 
 @pytest.mark.parametrize(('filename', 'expected'), (
@@ -32,3 +36,33 @@ from indico.util.fs import secure_filename
 ))
 def test_secure_filename(filename, expected):
     assert secure_filename(filename, 'fallback') == expected
+
+
+@pytest.mark.parametrize('compression', (ZIP_STORED, ZIP_DEFLATED))
+def test_add_fileobj(tmpdir, compression):
+    files = [('foo.txt', b'hello world'), (u'bar/m\xf6p.bin', os.urandom(3000000)), ('empty.txt', b'')]
+    path = tmpdir.join('test.zip').strpath
+    with FileObjZipFile(path, 'w', compression, allowZip64=True) as zip_file:
+        zip_file.writestr('first.txt', b'test')
+        for name, data in files:
+            zip_file.add_fileobj(name, BytesIO(data), len(data), chunk_size=65536)
+        zip_file.writestr('last.txt', b'test')
+    with ZipFile(path) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == ['first.txt'] + [name for name, __ in files] + ['last.txt']
+        for name, data in files:
+            assert zip_file.read(name) == data
+
+
+@pytest.mark.parametrize('compression', (ZIP_STORED, ZIP_DEFLATED))
+def test_iter_zip_file(compression):
+    files = [('foo.txt', b'hello world'), (u'bar/m\xf6p.bin', os.urandom(3000000)), ('empty.txt', b'')]
+    generator = iter_zip_file(((name, BytesIO(data), len(data)) for name, data in files), compression,
+                              chunk_size=65536)
+    chunks = list(generator)
+    assert len(chunks) > len(files)
+    with ZipFile(BytesIO(b''.join(chunks))) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == [name for name, __ in files]
+        for name, data in files:
+            assert zip_file.read(name) == data
@@ -21,11 +21,13 @@ import re
 from datetime import datetime
 from functools import partial
 from io import BytesIO
+from tempfile import TemporaryFile
 
 from markupsafe import Markup
 from speaklater import is_lazy_string
 from xlsxwriter import Workbook
 
+from indico.core.config import config
 from indico.util.date_time import format_datetime
 from indico.web.flask.util import send_file
 
@@ -64,28 +66,49 @@ def _prepare_csv_data(data, _linebreak_re=re.compile(ur'(\r?\n)+')):
     return _linebreak_re.sub('    ', unicode(data)).encode('utf-8')
 
 
-def generate_csv(headers, rows):
-    """Generates a CSV file from a list of headers and rows.
+def _iter_row_values(headers, rows):
+    """Convert row dicts to lists of values in the order of the headers."""
+    for row in rows:
+        assert len(row) == len(headers)
+        yield [row[name] for name in headers]
+
+
+def iter_csv(headers, rows, chunk_size=100):
+    """Generates CSV data from a list of headers and rows.
+
+    The rows are consumed lazily and the data is yielded in chunks, so
+    it can be streamed without ever keeping the whole file in memory.
 
     While CSV cells may contain multiline data, we replace linebreaks
     with spaces in case someone wants to use it in Excel which does
     *not* handle such cells properly...
 
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
-    :return: an `io.BytesIO` containing the CSV data
+    :param rows: an iterable of dicts mapping captions to values
+    :param chunk_size: the number of rows per chunk
+    :return: a generator yielding the CSV data
     """
     buf = BytesIO()
-    buf.write(b'\xef\xbb\xbf')
     writer = csv.writer(buf)
+    buf.write(b'\xef\xbb\xbf')
     writer.writerow(map(_prepare_header_utf8, headers))
-    header_positions = {name: i for i, name in enumerate(headers)}
-    assert all(len(row) == len(headers) for row in rows)
-    for row in rows:
-        row = sorted(row.items(), key=lambda x: header_positions[x[0]])
-        writer.writerow([_prepare_csv_data(v) for k, v in row])
-    buf.seek(0)
-    return buf
+    for i, values in enumerate(_iter_row_values(headers, rows), 1):
+        writer.writerow([_prepare_csv_data(v) for v in values])
+        if i % chunk_size == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def generate_csv(headers, rows):
+    """Generates a CSV file from a list of headers and rows.
+
+    :param headers: a list of cell captions
+    :param rows: an iterable of dicts mapping captions to values
+    :return: an `io.BytesIO` containing the CSV data
+    """
+    return BytesIO(b''.join(iter_csv(headers, rows)))
 
 
 def _prepare_excel_data(data, tz=None):
@@ -103,48 +126,58 @@ def _prepare_excel_data(data, tz=None):
 def generate_xlsx(headers, rows, tz=None):
     """Generates an XLSX file from a list of headers and rows.
 
+    The workbook is written in xlsxwriter's constant memory mode and
+    stored in a temporary file, so only the current row is kept in
+    memory.
+
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
-    :return: an `io.BytesIO` containing the XLSX data
+    :param rows: an iterable of dicts mapping captions to values
+    :param tz: the timezone for the values that are datetime objects
+    :return: a temporary file containing the XLSX data; it is deleted
+             when it is closed
     """
-    workbook_options = {'in_memory': True, 'strings_to_formulas': False, 'strings_to_numbers': False,
-                        'strings_to_urls': False}
-    buf = BytesIO()
-    header_positions = {name: i for i, name in enumerate(headers)}
-    # convert row dicts to lists
-    rows = [[x[1] for x in sorted(row.items(), key=lambda x: header_positions[x[0]])] for row in rows]
-    assert all(len(row) == len(headers) for row in rows)
-    with Workbook(buf, workbook_options) as workbook:
+    workbook_options = {'constant_memory': True, 'tmpdir': config.TEMP_DIR, 'strings_to_formulas': False,
+                        'strings_to_numbers': False, 'strings_to_urls': False}
+    temp_file = TemporaryFile(suffix='indico.tmp', dir=config.TEMP_DIR)
+    with Workbook(temp_file, workbook_options) as workbook:
         bold = workbook.add_format({'bold': True})
         sheet = workbook.add_worksheet()
         for col, name in enumerate(map(_prepare_header, headers)):
             sheet.write(0, col, name, bold)
-        for row, values in enumerate(rows, 1):
+        for row, values in enumerate(_iter_row_values(headers, rows), 1):
             sheet.write_row(row, 0, [_prepare_excel_data(data, tz) for data in values])
-    buf.seek(0)
-    return buf
+    temp_file.seek(0)
+    return temp_file
 
 
 def send_csv(filename, headers, rows):
     """Sends a CSV file to the client
 
+    The rows are written to a temporary file before sending it, as
+    they usually access database objects which can no longer be used
+    efficiently once the request's transaction has ended.
+
     :param filename: The name of the CSV file
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
+    :param rows: an iterable of dicts mapping captions to values
     :return: a flask response containing the CSV data
     """
-    buf = generate_csv(headers, rows)
-    return send_file(filename, buf, 'text/csv', inline=False)
+    temp_file = TemporaryFile(suffix='indico.tmp', dir=config.TEMP_DIR)
+    for chunk in iter_csv(headers, rows):
+        temp_file.write(chunk)
+    temp_file.seek(0)
+    return send_file(filename, temp_file, 'text/csv', inline=False)
 
 
 def send_xlsx(filename, headers, rows, tz=None):
     """Sends an XLSX file to the client
 
-    :param filename: The name of the CSV file
+    :param filename: The name of the XLSX file
     :param headers: a list of cell captions
-    :param rows: a list of dicts mapping captions to values
+    :param rows: an iterable of dicts mapping captions to values
     :param tz: the timezone for the values that are datetime objects
     :return: a flask response containing the XLSX data
     """
-    buf = generate_xlsx(headers, rows, tz=tz)
-    return send_file(filename, buf, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', inline=False)
+    temp_file = generate_xlsx(headers, rows, tz=tz)
+    return send_file(filename, temp_file, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                     inline=False)
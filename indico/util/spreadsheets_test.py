@@ -0,0 +1,48 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from zipfile import ZipFile
+
+import pytest
+
+from indico.util.spreadsheets import generate_xlsx, iter_csv, unique_col
+
+
+def test_iter_csv():
+    headers = ['B', unique_col('A', 1), 'C']
+    rows = ({'C': i, 'B': ['x', 'y'], ('A', 1): None} for i in range(5))
+    chunks = list(iter_csv(headers, rows, chunk_size=2))
+    assert len(chunks) == 3
+    assert b''.join(chunks) == (b'\xef\xbb\xbfB,A,C\r\n' +
+                                b''.join(b'x; y,,%d\r\n' % i for i in range(5)))
+
+
+def test_iter_csv_missing_column():
+    with pytest.raises(AssertionError):
+        list(iter_csv(['A', 'B'], [{'A': 1}]))
+
+
+@pytest.mark.usefixtures('app')
+def test_generate_xlsx():
+    headers = ['A', 'B']
+    rows = ({'B': 'foo{}'.format(i), 'A': i} for i in range(3))
+    temp_file = generate_xlsx(headers, rows)
+    with ZipFile(temp_file) as zf:
+        sheet = zf.read('xl/worksheets/sheet1.xml')
+    assert b'<c r="A3"><v>1</v></c>' in sheet
+    assert b'foo2' in sheet
@@ -25,6 +25,7 @@ in here but in your module instead.
 from __future__ import unicode_literals
 
 from datetime import timedelta
+from importlib import import_module
 
 from celery.schedules import crontab
 
@@ -47,3 +48,14 @@ def temp_cleanup():
     _log_deleted(logger, 'Deleted from cache: %s', deleted)
     deleted = cleanup_dir(config.TEMP_DIR, timedelta(days=1))
     _log_deleted(logger, 'Deleted from temp: %s', deleted)
+
+
+@celery.task(name='refresh_memoized')
+def refresh_memoized(module_name, func_name, args, kwargs):
+    """Refresh an expired value of a function memoized in redis"""
+    from indico.core.logger import Logger
+    func = getattr(import_module(module_name), func_name, None)
+    if func is None or not hasattr(func, 'refresh'):
+        Logger.get('memoize').error('Cannot refresh memoized function %s.%s', module_name, func_name)
+        return
+    func.refresh(*args, **kwargs)
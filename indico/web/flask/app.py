@@ -96,7 +96,7 @@ def configure_app(app, set_path=False):
         app.config['SERVER_NAME'] = base.netloc
         if base.path:
             app.config['APPLICATION_ROOT'] = base.path
-    configure_xsendfile(app, config.STATIC_FILE_METHOD)
+    configure_xsendfile(app, config.STATIC_FILE_METHOD, config.STATIC_FILE_STORAGE_MAP)
     if config.USE_PROXY:
         app.wsgi_app = ProxyFix(app.wsgi_app)
     configure_webpack(app)
@@ -140,15 +140,15 @@ def configure_webpack(app):
     app.config['WEBPACKEXT_MANIFEST_PATH'] = os.path.join('dist', 'manifest.json')
 
 
-def configure_xsendfile(app, method):
+def configure_xsendfile(app, method, storage_map=None):
+    if isinstance(method, (list, tuple)):
+        method, args = method
+    else:
+        args = None
+    if storage_map and method != 'xaccelredirect':
+        raise ValueError('STATIC_FILE_STORAGE_MAP requires the xaccelredirect static file method')
     if not method:
         return
-    elif isinstance(method, basestring):
-        args = None
-    else:
-        method, args = method
-        if not method:
-            return
     app.config['USE_X_SENDFILE'] = True
     if method == 'xsendfile':  # apache mod_xsendfile, lighttpd
         pass
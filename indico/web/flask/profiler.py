@@ -0,0 +1,157 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+"""A low-overhead sampling profiler for requests.
+
+Instead of tracing every function call like cProfile, a background
+thread periodically looks at the current stack of each request being
+profiled.  The stacks are aggregated across all processes in the
+"folded" format used by flamegraph tools, so they can be turned into
+a flame graph of where Indico spends its time.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from indico.core.config import config
+from indico.web.flask.stats import SharedCounter
+
+
+#: How often (in seconds) the stacks of profiled requests are sampled
+SAMPLING_INTERVAL = 0.005
+
+stack_samples = SharedCounter('stack-samples')
+_profiler_lock = threading.Lock()
+_profiler_state = {'pid': None, 'profiler': None}
+
+
+class SamplingProfiler(threading.Thread):
+    """Sample the stacks of some threads at a fixed interval."""
+
+    def __init__(self, interval):
+        super(SamplingProfiler, self).__init__(name='sampling-profiler')
+        self.daemon = True
+        self.interval = interval
+        self._threads = {}
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+
+    def add_thread(self, ident, name):
+        """Start sampling a thread.
+
+        :param ident: The identifier of the thread
+        :param name: The name used as the root frame of its stacks
+        """
+        with self._lock:
+            self._threads[ident] = name
+
+    def remove_thread(self, ident):
+        """Stop sampling a thread.
+
+        :return: A `Counter` with all stacks sampled since the last
+                 time a thread was removed.
+        """
+        with self._lock:
+            del self._threads[ident]
+            stacks, self._stacks = self._stacks, Counter()
+        return stacks
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sample()
+
+    def sample(self):
+        with self._lock:
+            threads = self._threads.items()
+        if not threads:
+            return
+        frames = sys._current_frames()
+        stacks = Counter()
+        for ident, name in threads:
+            frame = frames.get(ident)
+            if frame is not None:
+                stacks[_format_stack(name, frame)] += 1
+        with self._lock:
+            self._stacks.update(stacks)
+
+
+def _format_stack(name, frame):
+    stack = []
+    while frame is not None:
+        stack.append('{}:{}'.format(frame.f_globals.get('__name__', '?'), frame.f_code.co_name))
+        frame = frame.f_back
+    stack.append(name)
+    return ';'.join(reversed(stack))
+
+
+def _get_profiler():
+    """Get the sampling profiler of the current process.
+
+    It is created lazily since threads do not survive forking the
+    worker processes.
+    """
+    with _profiler_lock:
+        if _profiler_state['pid'] != os.getpid():
+            profiler = SamplingProfiler(SAMPLING_INTERVAL)
+            profiler.start()
+            _profiler_state.update(pid=os.getpid(), profiler=profiler)
+        return _profiler_state['profiler']
+
+
+def should_sample(endpoint):
+    """Check whether a request should be profiled.
+
+    Requests are sampled at `PROFILE_SAMPLE_RATE`.  If any endpoints
+    are listed in `PROFILE_SAMPLE_ENDPOINTS`, requests to other
+    endpoints are never sampled.
+
+    :param endpoint: The endpoint handling the request
+    """
+    if config.PROFILE_SAMPLE_ENDPOINTS and endpoint not in config.PROFILE_SAMPLE_ENDPOINTS:
+        return False
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def sample_stacks(name):
+    """Sample the stacks of the current thread while inside the block.
+
+    The stacks of the current thread are sampled in the background and
+    added to the shared `stack_samples` once the block has finished.
+
+    :param name: The name used as the root frame of the stacks
+    """
+    profiler = _get_profiler()
+    ident = threading.current_thread().ident
+    profiler.add_thread(ident, name)
+    try:
+        yield
+    finally:
+        stack_samples.add(profiler.remove_thread(ident))
+
+
+def render_stack_samples():
+    """Render the sampled stacks in the folded flamegraph format."""
+    samples = stack_samples.get_all()
+    return ''.join('{} {}\n'.format(stack, int(count)) for stack, count in sorted(samples.iteritems()))
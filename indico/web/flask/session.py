@@ -20,6 +20,9 @@ import cPickle
 import uuid
 from datetime import datetime, timedelta
 
+import pytz
+import redis
+import simplejson as json
 from flask import flash, request
 from flask.sessions import SessionInterface, SessionMixin
 from markupsafe import Markup
@@ -27,21 +30,56 @@ from werkzeug.datastructures import CallbackDict
 from werkzeug.utils import cached_property
 
 from indico.core.config import config
+from indico.core.logger import Logger
 from indico.legacy.common.cache import GenericCache
 from indico.modules.users import User
+from indico.util.caching import memoize
 from indico.util.date_time import get_display_tz
 from indico.util.decorators import cached_writable_property
 from indico.util.i18n import _, set_best_lang
 
 
 class BaseSession(CallbackDict, SessionMixin):
-    def __init__(self, initial=None, sid=None, new=False):
+    """A session which can be loaded lazily.
+
+    If a `loader` is specified, the session data is only loaded once
+    the session is actually used.  The loader is called with the
+    session as its only argument and needs to populate it using
+    :meth:`populate`.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, loader=None):
         def on_update(self):
             self.modified = True
+        self._loader = loader
         CallbackDict.__init__(self, initial, on_update)
         self.sid = sid
         self.new = new
         self.modified = False
+        #: The serialized data the session was loaded from
+        self.raw_data = None
+        if loader is None:
+            self._apply_defaults()
+
+    @property
+    def loaded(self):
+        """Whether the session data has been loaded."""
+        return self._loader is None
+
+    def populate(self, data, raw_data=None):
+        """Populate the session without marking it as modified."""
+        dict.update(self, data)
+        self.raw_data = raw_data
+
+    def _load(self):
+        if self._loader is None:
+            return
+        loader = self._loader
+        self._loader = None
+        loader(self)
+        self._apply_defaults()
+
+    def _apply_defaults(self):
         defaults = self._get_defaults()
         if defaults:
             self.update(defaults)
@@ -50,6 +88,41 @@ class BaseSession(CallbackDict, SessionMixin):
         # Note: This is called before there is a DB connection available!
         return None
 
+    def calls_load(name):
+        def oncall(self, *args, **kw):
+            self._load()
+            return getattr(super(BaseSession, self), name)(*args, **kw)
+        oncall.__name__ = str(name)
+        return oncall
+
+    __getitem__ = calls_load('__getitem__')
+    __setitem__ = calls_load('__setitem__')
+    __delitem__ = calls_load('__delitem__')
+    __contains__ = calls_load('__contains__')
+    __iter__ = calls_load('__iter__')
+    __len__ = calls_load('__len__')
+    __eq__ = calls_load('__eq__')
+    __ne__ = calls_load('__ne__')
+    __repr__ = calls_load('__repr__')
+    clear = calls_load('clear')
+    copy = calls_load('copy')
+    get = calls_load('get')
+    has_key = calls_load('has_key')
+    items = calls_load('items')
+    iteritems = calls_load('iteritems')
+    iterkeys = calls_load('iterkeys')
+    itervalues = calls_load('itervalues')
+    keys = calls_load('keys')
+    pop = calls_load('pop')
+    popitem = calls_load('popitem')
+    setdefault = calls_load('setdefault')
+    update = calls_load('update')
+    values = calls_load('values')
+    viewitems = calls_load('viewitems')
+    viewkeys = calls_load('viewkeys')
+    viewvalues = calls_load('viewvalues')
+    del calls_load
+
 
 # Hey, if you intend on adding a custom property to this class:
 # - Only do it if you need logic behind it. Otherwise use the dict API!
@@ -131,14 +204,134 @@ class IndicoSession(BaseSession):
         return get_display_tz(as_timezone=True)
 
 
+class SessionSerializer(object):
+    """Serialize session data as JSON.
+
+    Besides the types natively supported by JSON, tuples, sets,
+    datetimes, markup strings and dicts with non-string keys are
+    supported by wrapping them in tagged objects.  The output is
+    deterministic so it can be compared to check whether the data
+    of a session changed.
+    """
+
+    _datetime_format = '%Y-%m-%dT%H:%M:%S.%f'
+
+    def dumps(self, data):
+        return json.dumps(self._tag(data), sort_keys=True, separators=(',', ':'))
+
+    def loads(self, data):
+        return json.loads(data, object_hook=self._untag)
+
+    def _tag(self, value):
+        if isinstance(value, dict):
+            if all(isinstance(k, basestring) and not k.startswith(' ') for k in value):
+                return {k: self._tag(v) for k, v in value.iteritems()}
+            return {' di': sorted([self._tag(k), self._tag(v)] for k, v in value.iteritems())}
+        elif isinstance(value, list):
+            return [self._tag(x) for x in value]
+        elif isinstance(value, tuple):
+            return {' t': [self._tag(x) for x in value]}
+        elif isinstance(value, (set, frozenset)):
+            return {' s': sorted(self._tag(x) for x in value)}
+        elif isinstance(value, Markup):
+            return {' m': unicode(value)}
+        elif isinstance(value, datetime):
+            if value.tzinfo is None:
+                return {' d': value.strftime(self._datetime_format)}
+            return {' dz': value.astimezone(pytz.utc).strftime(self._datetime_format)}
+        return value
+
+    def _untag(self, obj):
+        if len(obj) != 1:
+            return obj
+        tag, value = next(obj.iteritems())
+        if tag == ' di':
+            return {(tuple(k) if isinstance(k, list) else k): v for k, v in value}
+        elif tag == ' t':
+            return tuple(value)
+        elif tag == ' s':
+            return set(value)
+        elif tag == ' m':
+            return Markup(value)
+        elif tag == ' d':
+            return datetime.strptime(value, self._datetime_format)
+        elif tag == ' dz':
+            return pytz.utc.localize(datetime.strptime(value, self._datetime_format))
+        return obj
+
+
+class CacheSessionStorage(object):
+    """Store sessions in the generic cache."""
+
+    def __init__(self):
+        self._cache = GenericCache('flask-session')
+
+    def get(self, sid):
+        return self._cache.get(sid)
+
+    def set(self, sid, data, ttl):
+        self._cache.set(sid, data, ttl)
+
+    def delete(self, sid):
+        self._cache.delete(sid)
+
+
+class RedisSessionStorage(object):
+    """Store sessions directly in Redis.
+
+    Unlike the generic cache, this stores the serialized session data
+    as it is instead of pickling it again.  The keys are the same ones
+    the generic cache uses, so existing sessions are still found.
+    """
+
+    key_prefix = 'cache/gen/flask-session.'
+
+    def __init__(self, url):
+        self._client = redis.StrictRedis.from_url(url)
+        self._client.connection_pool.connection_kwargs['socket_timeout'] = 1
+
+    def get(self, sid):
+        try:
+            data = self._client.get(self.key_prefix + sid)
+        except redis.RedisError:
+            Logger.get('session').exception('Could not load session %s', sid)
+            return None
+        if data is not None and not data.startswith(b'{'):
+            # stored by the generic cache before sessions were stored directly
+            data = cPickle.loads(data)
+        return data
+
+    def set(self, sid, data, ttl):
+        try:
+            self._client.setex(self.key_prefix + sid, ttl, data)
+        except redis.RedisError:
+            Logger.get('session').exception('Could not store session %s', sid)
+
+    def delete(self, sid):
+        try:
+            self._client.delete(self.key_prefix + sid)
+        except redis.RedisError:
+            Logger.get('session').exception('Could not delete session %s', sid)
+
+
+@memoize
+def _get_redis_session_storage(url):
+    return RedisSessionStorage(url)
+
+
 class IndicoSessionInterface(SessionInterface):
-    pickle_based = True
-    serializer = cPickle
+    serializer = SessionSerializer()
     session_class = IndicoSession
     temporary_session_lifetime = timedelta(days=7)
 
     def __init__(self):
-        self.storage = GenericCache('flask-session')
+        self._cache_storage = CacheSessionStorage()
+
+    @property
+    def storage(self):
+        if config.CACHE_BACKEND == 'redis':
+            return _get_redis_session_storage(config.REDIS_CACHE_URL)
+        return self._cache_storage
 
     def generate_sid(self):
         return str(uuid.uuid4())
@@ -172,12 +365,24 @@ class IndicoSessionInterface(SessionInterface):
         sid = request.cookies.get(app.session_cookie_name)
         if not sid:
             return self.session_class(sid=self.generate_sid(), new=True)
-        data = self.storage.get(sid)
-        if data is not None:
-            return self.session_class(self.serializer.loads(data), sid=sid)
-        return self.session_class(sid=self.generate_sid(), new=True)
+        # the session is only loaded from the storage once it's used
+        return self.session_class(sid=sid, loader=self._load_session)
+
+    def _load_session(self, session):
+        data = self.storage.get(session.sid)
+        if data is None:
+            session.sid = self.generate_sid()
+            session.new = True
+        elif not data.startswith(b'{'):
+            # session stored before sessions were serialized as json
+            session.populate(cPickle.loads(data))
+        else:
+            session.populate(self.serializer.loads(data), data)
 
     def save_session(self, app, session, response):
+        if not session.loaded:
+            # the session has not been used at all during the request
+            return
         domain = self.get_cookie_domain(app)
         secure = self.get_cookie_secure(app)
         refresh_sid = self.should_refresh_sid(app, session)
@@ -187,7 +392,8 @@ class IndicoSessionInterface(SessionInterface):
             response.delete_cookie(app.session_cookie_name, domain=domain)
             return
 
-        if not refresh_sid and not session.modified and not self.should_refresh_session(app, session):
+        refresh_session = self.should_refresh_session(app, session)
+        if not refresh_sid and not session.modified and not refresh_session:
             # If the session has not been modified we only store if it needs to be refreshed
             return
 
@@ -195,6 +401,14 @@ class IndicoSessionInterface(SessionInterface):
             # Setting session.permanent marks the session as modified so we only set it when we
             # are saving the session anyway!
             session.permanent = True
+        session['_secure'] = request.is_secure
+
+        if not refresh_sid and not refresh_session and session.raw_data is not None:
+            # The session may have been marked as modified even though its data did not change,
+            # e.g. when updating a nested dict with the same values.  In that case we would only
+            # update its expiry time, which is not needed until it has to be refreshed anyway.
+            if self.serializer.dumps(dict(session)) == session.raw_data:
+                return
 
         storage_ttl = self.get_storage_lifetime(app, session)
         cookie_lifetime = self.get_expiration_time(app, session)
@@ -204,7 +418,6 @@ class IndicoSessionInterface(SessionInterface):
             self.storage.delete(session.sid)
             session.sid = self.generate_sid()
 
-        session['_secure'] = request.is_secure
         self.storage.set(session.sid, self.serializer.dumps(dict(session)), storage_ttl)
         response.set_cookie(app.session_cookie_name, session.sid, expires=cookie_lifetime, httponly=True,
                             secure=secure)
@@ -0,0 +1,130 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+import pytest
+import pytz
+from flask import Response, request
+from markupsafe import Markup
+
+from indico.web.flask.session import IndicoSession, IndicoSessionInterface, SessionSerializer
+
+
+class _DictStorage(object):
+    def __init__(self):
+        self.data = {}
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, sid):
+        self.reads += 1
+        return self.data.get(sid)
+
+    def set(self, sid, data, ttl):
+        self.writes += 1
+        self.data[sid] = data
+
+    def delete(self, sid):
+        self.data.pop(sid, None)
+
+
+@pytest.fixture
+def session_interface(mocker):
+    storage = _DictStorage()
+    mocker.patch.object(IndicoSessionInterface, 'storage', storage)
+    return IndicoSessionInterface()
+
+
+@pytest.mark.parametrize('value', (
+    {'a': 1, 'b': [1, 'x', None, True], 'c': {'d': 1.5}},
+    {1: 'int', 'x': 'str', (1, 2): 'tuple'},
+    {' t': 'key looking like a tag'},
+    {'tuple': (1, (2, 3)), 'set': {1, 2, 3}, 'markup': Markup('<strong>x</strong>')},
+    {'naive': datetime(2019, 4, 5, 13, 37, 1, 123), 'aware': pytz.utc.localize(datetime(2019, 4, 5, 13, 37))},
+    {'_flashes': [('error', Markup('<em>x</em>')), ('info', 'y')]},
+))
+def test_session_serializer(value):
+    serializer = SessionSerializer()
+    data = serializer.dumps(value)
+    rv = serializer.loads(data)
+    assert rv == value
+    assert [type(v) for v in rv.itervalues()] == [type(v) for v in value.itervalues()]
+    assert serializer.dumps(rv) == data
+
+
+def test_session_serializer_deterministic():
+    serializer = SessionSerializer()
+    a = {'x': 1, 'y': {3: 'c', 1: 'a', 2: 'b'}, 'z': {'b', 'c', 'a'}}
+    b = {'z': {'a', 'b', 'c'}, 'y': {2: 'b', 1: 'a', 3: 'c'}, 'x': 1}
+    assert serializer.dumps(a) == serializer.dumps(b)
+
+
+def test_session_serializer_unsupported():
+    with pytest.raises(TypeError):
+        SessionSerializer().dumps({'x': object()})
+
+
+def test_session_lazy(app, session_interface):
+    storage = session_interface.storage
+    storage.data['foo'] = session_interface.serializer.dumps({'x': 'y'})
+    with app.test_request_context(headers={'Cookie': 'indico_session_http=foo'}):
+        session = session_interface.open_session(app, request)
+        assert isinstance(session, IndicoSession)
+        assert not session.loaded
+        assert storage.reads == 0
+        # nothing to save if the session was never used
+        session_interface.save_session(app, session, Response())
+        assert storage.reads == 0
+        assert storage.writes == 0
+        assert session['x'] == 'y'
+        assert session.loaded
+        assert session.sid == 'foo'
+        assert not session.new
+        assert not session.modified
+        assert storage.reads == 1
+
+
+def test_session_lazy_missing(app, session_interface):
+    with app.test_request_context(headers={'Cookie': 'indico_session_http=foo'}):
+        session = session_interface.open_session(app, request)
+        assert session.sid == 'foo'
+        assert 'x' not in session
+        assert session.sid != 'foo'
+        assert session.new
+
+
+def test_session_save_unchanged(app, session_interface):
+    storage = session_interface.storage
+    with app.test_request_context():
+        session = session_interface.open_session(app, request)
+        session['x'] = {'y': 1}
+        session_interface.save_session(app, session, Response())
+        assert storage.writes == 1
+        sid = session.sid
+        data = storage.data[sid]
+    with app.test_request_context(headers={'Cookie': 'indico_session_http=' + sid}):
+        session = session_interface.open_session(app, request)
+        session['x']['y'] = 1
+        session.modified = True
+        session_interface.save_session(app, session, Response())
+        assert storage.writes == 1
+        session['x']['y'] = 2
+        session_interface.save_session(app, session, Response())
+        assert storage.writes == 2
+        assert storage.data[sid] != data
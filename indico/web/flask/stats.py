@@ -16,12 +16,119 @@
 
 from __future__ import unicode_literals
 
+import os
+import threading
 import time
+from collections import Counter
 
-from flask import g, request_started
+import redis
+from flask import g, request, request_finished, request_started
 from sqlalchemy.engine import Engine
 from sqlalchemy.event import listens_for
 
+from indico.core.config import config
+from indico.core.logger import Logger
+from indico.util.caching import memoize
+
+
+#: The upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+#: How often (in seconds) each process adds its counters to the shared ones
+STATS_FLUSH_INTERVAL = 10
+
+logger = Logger.get('stats')
+
+
+@memoize
+def _get_redis_client(url):
+    return redis.StrictRedis.from_url(url)
+
+
+class SharedCounter(object):
+    """Counters aggregated across all worker processes.
+
+    Values are added up in memory and periodically added to a hash in
+    Redis when using the ``redis`` cache backend, so counting does not
+    need a roundtrip to Redis.  Without Redis, only the counters of the
+    current process are available.
+
+    :param name: The name of the counter, used in the Redis key
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = Counter()
+        self._local = Counter()
+        self._last_flush = time.time()
+
+    def _check_pid(self):
+        # counters inherited from the parent process must not be added again
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def _redis_key(self):
+        return 'stats/{}'.format(self.name)
+
+    @property
+    def _redis(self):
+        return _get_redis_client(config.REDIS_CACHE_URL) if config.CACHE_BACKEND == 'redis' else None
+
+    def add(self, values):
+        """Add values to the counters.
+
+        :param values: A dict mapping counter names to numbers
+        """
+        with self._lock:
+            self._check_pid()
+            self._pending.update(values)
+            flush = time.time() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Add the pending values of this process to the shared counters."""
+        with self._lock:
+            self._check_pid()
+            pending, self._pending = self._pending, Counter()
+            self._local.update(pending)
+            self._last_flush = time.time()
+        client = self._redis
+        if client is None or not pending:
+            return
+        pipe = client.pipeline(transaction=False)
+        for key, value in pending.iteritems():
+            pipe.hincrbyfloat(self._redis_key, key, value)
+        try:
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception('Could not update %s counters', self.name)
+
+    def get_all(self):
+        """Get the current values of all counters."""
+        self.flush()
+        client = self._redis
+        if client is None:
+            with self._lock:
+                return dict(self._local)
+        return {key.decode('utf-8'): float(value) for key, value in client.hgetall(self._redis_key).iteritems()}
+
+    def clear(self):
+        """Reset all counters."""
+        with self._lock:
+            self._reset()
+        client = self._redis
+        if client is not None:
+            client.delete(self._redis_key)
+
+
+request_metrics = SharedCounter('request-metrics')
+
 
 def request_stats_request_started():
     if g.get('request_stats_initialized'):
@@ -51,6 +158,14 @@ def setup_request_stats(app):
         g.query_count += 1
         g.query_duration += total
 
+    @request_finished.connect_via(app)
+    def _request_finished(sender, **kwargs):
+        if not g.get('request_stats_initialized'):
+            return
+        rh = g.get('rh')
+        name = type(rh).__name__ if rh is not None else (request.endpoint or 'unknown')
+        record_request_metrics(name, time.time() - g.req_start_ts, g.query_duration)
+
 
 def get_request_stats():
     initialized = g.get('request_stats_initialized')
@@ -59,3 +174,43 @@ def get_request_stats():
         'query_duration': g.query_duration if initialized else 0,
         'req_duration': (time.time() - g.req_start_ts) if initialized else 0
     }
+
+
+def _observe(values, metric, name, value):
+    for bound in LATENCY_BUCKETS:
+        if value <= bound:
+            values['{}|{}|{}'.format(metric, name, bound)] += 1
+    values['{}|{}|sum'.format(metric, name)] += value
+    values['{}|{}|count'.format(metric, name)] += 1
+
+
+def record_request_metrics(name, duration, query_duration):
+    """Add a request to the latency histograms.
+
+    :param name: The name of the RH (or endpoint) handling the request
+    :param duration: The time (in seconds) it took to handle the request
+    :param query_duration: The time (in seconds) spent running SQL queries
+    """
+    values = Counter()
+    _observe(values, 'indico_request_duration_seconds', name, duration)
+    _observe(values, 'indico_request_sql_duration_seconds', name, query_duration)
+    request_metrics.add(values)
+
+
+def render_request_metrics():
+    """Render the latency histograms in the Prometheus text format."""
+    metrics = {}
+    for key, value in request_metrics.get_all().iteritems():
+        metric, name, suffix = key.split('|')
+        metrics.setdefault(metric, {}).setdefault(name, {})[suffix] = value
+    lines = []
+    for metric, histograms in sorted(metrics.iteritems()):
+        lines.append('# TYPE {} histogram'.format(metric))
+        for name, histogram in sorted(histograms.iteritems()):
+            for bound in LATENCY_BUCKETS:
+                le = '+Inf' if bound == float('inf') else bound
+                lines.append('{}_bucket{{rh="{}",le="{}"}} {}'.format(metric, name, le,
+                                                                      int(histogram.get(unicode(bound), 0))))
+            lines.append('{}_sum{{rh="{}"}} {!r}'.format(metric, name, float(histogram.get('sum', 0))))
+            lines.append('{}_count{{rh="{}"}} {}'.format(metric, name, int(histogram.get('count', 0))))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+# This file is part of Indico.
+# Copyright (C) 2002 - 2018 European Organization for Nuclear Research (CERN).
+#
+# Indico is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 3 of the
+# License, or (at your option) any later version.
+#
+# Indico is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Indico; if not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import unicode_literals
+
+import threading
+
+import pytest
+
+from indico.web.flask.profiler import SamplingProfiler, should_sample
+from indico.web.flask.stats import SharedCounter, record_request_metrics, render_request_metrics
+
+
+@pytest.mark.usefixtures('app_context')
+def test_shared_counter():
+    counter = SharedCounter('test')
+    counter.add({'a': 1})
+    counter.add({'a': 2, 'b': 0.5})
+    assert counter.get_all() == {'a': 3, 'b': 0.5}
+    counter.clear()
+    assert counter.get_all() == {}
+
+
+@pytest.mark.usefixtures('app_context')
+def test_render_request_metrics(mocker):
+    mocker.patch('indico.web.flask.stats.request_metrics', SharedCounter('test'))
+    record_request_metrics('RHFoo', 0.03, 0.002)
+    record_request_metrics('RHFoo', 2, 0.5)
+    lines = render_request_metrics().splitlines()
+    assert '# TYPE indico_request_duration_seconds histogram' in lines
+    assert 'indico_request_duration_seconds_bucket{rh="RHFoo",le="0.025"} 0' in lines
+    assert 'indico_request_duration_seconds_bucket{rh="RHFoo",le="0.05"} 1' in lines
+    assert 'indico_request_duration_seconds_bucket{rh="RHFoo",le="2.5"} 2' in lines
+    assert 'indico_request_duration_seconds_bucket{rh="RHFoo",le="+Inf"} 2' in lines
+    assert 'indico_request_duration_seconds_sum{rh="RHFoo"} 2.03' in lines
+    assert 'indico_request_duration_seconds_count{rh="RHFoo"} 2' in lines
+    assert 'indico_request_sql_duration_seconds_bucket{rh="RHFoo",le="0.005"} 1' in lines
+    assert 'indico_request_sql_duration_seconds_bucket{rh="RHFoo",le="0.25"} 1' in lines
+    assert 'indico_request_sql_duration_seconds_bucket{rh="RHFoo",le="0.5"} 2' in lines
+
+
+def _sampled_function(profiler):
+    profiler.sample()
+
+
+def test_sampling_profiler():
+    profiler = SamplingProfiler(1)
+    ident = threading.current_thread().ident
+    profiler.sample()
+    profiler.add_thread(ident, 'RHFoo')
+    _sampled_function(profiler)
+    _sampled_function(profiler)
+    stacks = profiler.remove_thread(ident)
+    assert len(stacks) == 1
+    stack, count = stacks.items()[0]
+    assert count == 2
+    frames = stack.split(';')
+    assert frames[0] == 'RHFoo'
+    assert frames[-3:] == ['indico.web.flask.stats_test:test_sampling_profiler',
+                           'indico.web.flask.stats_test:_sampled_function',
+                           'indico.web.flask.profiler:sample']
+    profiler.sample()
+    # threads which have been removed are not sampled anymore
+    assert not profiler._stacks
+
+
+@pytest.mark.parametrize(('endpoints', 'rate', 'endpoint', 'expected'), (
+    (set(), 0, 'foo.bar', False),
+    (set(), 1, 'foo.bar', True),
+    ({'foo.bar'}, 1, 'foo.bar', True),
+    ({'foo.bar'}, 1, 'foo.baz', False),
+    ({'foo.bar'}, 0, 'foo.bar', False),
+))
+def test_should_sample(mocker, endpoints, rate, endpoint, expected):
+    config = mocker.patch('indico.web.flask.profiler.config')
+    config.PROFILE_SAMPLE_ENDPOINTS = endpoints
+    config.PROFILE_SAMPLE_RATE = rate
+    assert should_sample(endpoint) == expected
@@ -16,19 +16,22 @@
 
 from __future__ import absolute_import, unicode_literals
 
+import calendar
 import inspect
 import os
 import time
 from importlib import import_module
+from types import GeneratorType
 
 from flask import Blueprint, current_app, g, redirect, request
 from flask import send_file as _send_file
+from flask import stream_with_context
 from flask import url_for as _url_for
 from flask.helpers import get_root_path
 from werkzeug.datastructures import Headers
 from werkzeug.exceptions import HTTPException, NotFound
 from werkzeug.routing import BaseConverter, BuildError, RequestRedirect, UnicodeConverter
-from werkzeug.urls import url_parse
+from werkzeug.urls import url_parse, url_quote
 from werkzeug.wrappers import Response as WerkzeugResponse
 
 from indico.core.config import config
@@ -247,12 +250,36 @@ def _is_office_mimetype(mimetype):
     return False
 
 
+class _GeneratorFile(object):
+    """Minimal file-like wrapper to stream the chunks of a generator.
+
+    ``read`` ignores the requested size and returns the next non-empty
+    chunk, which is all the WSGI file wrapper needs.
+    """
+
+    def __init__(self, generator):
+        self._generator = generator
+
+    def read(self, size=-1):
+        for chunk in self._generator:
+            if chunk:
+                return chunk
+        return b''
+
+    def close(self):
+        close = getattr(self._generator, 'close', None)
+        if close is not None:
+            close()
+
+
 def send_file(name, path_or_fd, mimetype, last_modified=None, no_cache=True, inline=None, conditional=False, safe=True,
               **kwargs):
     """Sends a file to the user.
 
     `name` is required and should be the filename visible to the user.
-    `path_or_fd` is either the physical path to the file or a file-like object (e.g. a StringIO).
+    `path_or_fd` is either the physical path to the file or a file-like object (e.g. a StringIO).  It may also be a
+    generator yielding the file's content in chunks, in which case the file is streamed to the client while it is
+    being generated.
     `mimetype` SHOULD be a proper MIME type such as image/png. It may also be an indico-style file type such as JPG.
     `last_modified` may contain a unix timestamp or datetime object indicating the last modification of the file.
     `no_cache` can be set to False to disable no-cache headers.
@@ -265,6 +292,40 @@ def send_file(name, path_or_fd, mimetype, last_modified=None, no_cache=True, inl
     text/html mimetypes
     """
 
+    name, inline = _get_send_file_options(name, mimetype, inline, safe)
+    if isinstance(path_or_fd, GeneratorType):
+        path_or_fd = _GeneratorFile(stream_with_context(path_or_fd))
+    try:
+        rv = _send_file(path_or_fd, mimetype=mimetype, as_attachment=not inline, attachment_filename=name,
+                        conditional=conditional, **kwargs)
+    except IOError:
+        if not current_app.debug:
+            raise
+        raise NotFound('File not found: %s' % path_or_fd)
+    return _add_send_file_headers(rv, name, inline, last_modified, no_cache, safe)
+
+
+def send_file_via_server(name, uri, mimetype, last_modified=None, no_cache=True, inline=None, safe=True):
+    """Sends a file to the user by letting the web server deliver it.
+
+    Instead of passing the file's content through the WSGI worker, this
+    returns an empty response with an ``X-Accel-Redirect`` header which
+    makes nginx serve the file from one of its internal locations.  The
+    headers related to the file (content type, disposition, caching and
+    the CSP) are the same as the ones sent by `send_file`.
+
+    `uri` is the internal URI of the file in the web server.  All other
+    arguments are the same as in `send_file`.
+    """
+    name, inline = _get_send_file_options(name, mimetype, inline, safe)
+    rv = current_app.response_class(mimetype=mimetype)
+    rv.headers[b'X-Accel-Redirect'] = url_quote(uri)
+    if not inline:
+        rv.headers.add('Content-Disposition', 'attachment', filename=name)
+    return _add_send_file_headers(rv, name, inline, last_modified, no_cache, safe)
+
+
+def _get_send_file_options(name, mimetype, inline, safe):
     name = secure_filename(name, 'file')
     assert '/' in mimetype
     if inline is None:
@@ -276,13 +337,10 @@ def send_file(name, path_or_fd, mimetype, last_modified=None, no_cache=True, inl
         inline = False
     if safe and mimetype in ('text/html', 'image/svg+xml'):
         inline = False
-    try:
-        rv = _send_file(path_or_fd, mimetype=mimetype, as_attachment=not inline, attachment_filename=name,
-                        conditional=conditional, **kwargs)
-    except IOError:
-        if not current_app.debug:
-            raise
-        raise NotFound('File not found: %s' % path_or_fd)
+    return name, inline
+
+
+def _add_send_file_headers(rv, name, inline, last_modified, no_cache, safe):
     if safe:
         rv.headers.add('Content-Security-Policy', "script-src 'self'; object-src 'self'")
     if inline:
@@ -301,6 +359,70 @@ def send_file(name, path_or_fd, mimetype, last_modified=None, no_cache=True, inl
     return rv
 
 
+def is_not_modified(etag, last_modified):
+    """Check whether the client's cached copy of a resource is current.
+
+    This evaluates the ``If-None-Match`` and ``If-Modified-Since``
+    headers of the current request; the latter is only used if the
+    former is missing.
+
+    :param etag: The current entity tag of the resource
+    :param last_modified: The last modification of the resource as a
+                          UNIX timestamp or ``None`` if it is unknown
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified is not None:
+        return last_modified <= calendar.timegm(request.if_modified_since.utctimetuple())
+    return False
+
+
+def add_validators(response, etag, last_modified):
+    """Add the ``ETag`` and ``Last-Modified`` headers to a response.
+
+    :param response: A response object
+    :param etag: The entity tag of the resource
+    :param last_modified: The last modification of the resource as a
+                          UNIX timestamp or ``None`` if it is unknown
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def make_not_modified_response(etag, last_modified):
+    """Create a ``304 Not Modified`` response."""
+    return add_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def make_conditional_file_response(response, etag, last_modified, size):
+    """Make a response sending a file conditional to the request.
+
+    This adds the ``ETag`` and ``Last-Modified`` headers to the response
+    and handles conditional and ``Range`` requests, resulting in a
+    ``304 Not Modified`` or ``206 Partial Content`` response.  Range
+    requests for files delivered by the web server are handled by the
+    web server itself, and responses which do not contain the file
+    (e.g. redirects to an external storage) are left untouched.
+
+    :param response: A response object returned by `send_file` or
+                     `send_file_via_server`
+    :param etag: The entity tag of the file
+    :param last_modified: The last modification of the file as a UNIX
+                          timestamp or ``None`` if it is unknown
+    :param size: The size of the file in bytes
+    """
+    if response.status_code != 200:
+        return response
+    if 'X-Sendfile' in response.headers or 'X-Accel-Redirect' in response.headers:
+        if is_not_modified(etag, last_modified):
+            return make_not_modified_response(etag, last_modified)
+        return add_validators(response, etag, last_modified)
+    add_validators(response, etag, last_modified)
+    return response.make_conditional(request, accept_ranges=True, complete_length=size)
+
+
 def endpoint_for_url(url, base_url=None):
     if base_url is None:
         base_url = config.BASE_URL
@@ -16,9 +16,12 @@
 
 from __future__ import unicode_literals
 
+from io import BytesIO
+
 import pytest
 
-from indico.web.flask.util import endpoint_for_url
+from indico.web.flask.util import (endpoint_for_url, is_not_modified, make_conditional_file_response, send_file,
+                                   send_file_via_server)
 
 
 @pytest.mark.parametrize(('base_url', 'url', 'endpoint'), (
@@ -36,3 +39,64 @@ def test_endpoint_for_url(base_url, url, endpoint):
     else:
         assert data is not None
         assert data[0] == endpoint
+
+
+@pytest.mark.usefixtures('request_context')
+def test_send_file_generator():
+    def _generate():
+        yield b'foo'
+        yield b''
+        yield b'bar'
+
+    rv = send_file('test.txt', _generate(), 'text/plain')
+    assert b''.join(rv.response) == b'foobar'
+
+
+@pytest.mark.parametrize(('headers', 'expected'), (
+    ({}, False),
+    ({'If-None-Match': '"abc"'}, True),
+    ({'If-None-Match': '"xyz", "abc"'}, True),
+    ({'If-None-Match': '*'}, True),
+    ({'If-None-Match': '"xyz"'}, False),
+    ({'If-None-Match': '"xyz"', 'If-Modified-Since': 'Thu, 01 Jan 2015 00:00:00 GMT'}, False),
+    ({'If-Modified-Since': 'Thu, 01 Jan 2015 00:00:00 GMT'}, True),
+    ({'If-Modified-Since': 'Wed, 31 Dec 2014 23:59:59 GMT'}, False),
+))
+def test_is_not_modified(app, headers, expected):
+    with app.test_request_context(headers=headers):
+        assert is_not_modified('abc', 1420070400) == expected
+
+
+@pytest.mark.parametrize(('headers', 'status', 'content_range', 'body'), (
+    ({}, 200, None, b'hello world'),
+    ({'Range': 'bytes=6-'}, 206, 'bytes 6-10/11', b'world'),
+    ({'Range': 'bytes=0-4'}, 206, 'bytes 0-4/11', b'hello'),
+    ({'Range': 'bytes=0-4', 'If-Range': '"abc"'}, 206, 'bytes 0-4/11', b'hello'),
+    ({'Range': 'bytes=0-4', 'If-Range': '"xyz"'}, 200, None, b'hello world'),
+    ({'If-None-Match': '"abc"'}, 304, None, b''),
+    ({'If-Modified-Since': 'Thu, 01 Jan 2015 00:00:00 GMT'}, 304, None, b''),
+))
+def test_make_conditional_file_response(app, headers, status, content_range, body):
+    with app.test_request_context(headers=headers):
+        rv = send_file('test.txt', BytesIO(b'hello world'), 'text/plain')
+        rv = make_conditional_file_response(rv, 'abc', 1420070400, 11)
+        assert rv.status_code == status
+        assert rv.headers['ETag'] == '"abc"'
+        assert rv.headers.get('Content-Range') == content_range
+        if status != 304:
+            assert rv.headers['Accept-Ranges'] == 'bytes'
+            assert b''.join(rv.iter_encoded()) == body
+
+
+@pytest.mark.parametrize(('headers', 'status'), (
+    ({'Range': 'bytes=6-'}, 200),
+    ({'If-None-Match': '"abc"'}, 304),
+))
+def test_make_conditional_file_response_via_server(app, headers, status):
+    with app.test_request_context(headers=headers):
+        rv = send_file_via_server('test.txt', '/.xsf/test.txt', 'text/plain')
+        rv = make_conditional_file_response(rv, 'abc', None, 11)
+        assert rv.status_code == status
+        assert 'Accept-Ranges' not in rv.headers
+        assert 'Last-Modified' not in rv.headers
+        assert ('X-Accel-Redirect' in rv.headers) == (status == 200)
@@ -39,7 +39,7 @@ from indico.modules.api.models.keys import APIKey
 from indico.modules.oauth import oauth
 from indico.modules.oauth.provider import load_token
 from indico.util.string import to_unicode
-from indico.web.flask.util import ResponseUtil
+from indico.web.flask.util import ResponseUtil, add_validators, is_not_modified, make_not_modified_response
 from indico.web.http_api import HTTPAPIHook
 from indico.web.http_api.fossils import IHTTPAPIExportResultFossil
 from indico.web.http_api.metadata.serializer import Serializer
@@ -111,6 +111,15 @@ def checkAK(apiKey, signature, timestamp, path, query):
     return ak, onlyPublic
 
 
+def _get_etag(cache_key, dformat, ts):
+    """Get the ETag for a cached result.
+
+    Since cached results never change, the ETag only depends on the
+    cache entry and the format used to serialize it.
+    """
+    return hashlib.sha1('{}:{}:{}'.format(cache_key, dformat, ts).encode('utf-8')).hexdigest()
+
+
 def handler(prefix, path):
     path = posixpath.join('/', prefix, path)
     clearCache()  # init fossil cache
@@ -159,7 +168,7 @@ def handler(prefix, path):
     if request.method == 'POST' or hook.NO_CACHE:
         noCache = True
 
-    ak = error = result = None
+    ak = error = result = etag = None
     ts = int(time.time())
     typeMap = {}
     responseUtil = ResponseUtil()
@@ -216,6 +225,7 @@ def handler(prefix, path):
             if obj is not None:
                 result, extra, ts, complete, typeMap = obj
                 addToCache = False
+                etag = _get_etag(cacheKey, dformat, ts)
         if result is None:
             g.current_api_user = user
             # Perform the actual exporting
@@ -232,6 +242,7 @@ def handler(prefix, path):
             ttl = api_settings.get('cache_ttl')
             if ttl > 0:
                 cache.set(cacheKey, (result, extra, ts, complete, typeMap), ttl)
+                etag = _get_etag(cacheKey, dformat, ts)
     except HTTPAPIError as e:
         error = e
         if e.getCode():
@@ -259,6 +270,9 @@ def handler(prefix, path):
             logger.info('API request: %s?%s', path, query)
         if is_response:
             return result
+        if error is None and etag is not None and is_not_modified(etag, ts):
+            # the client already has the cached result
+            return make_not_modified_response(etag, ts)
         serializer = Serializer.create(dformat, query_params=queryParams, pretty=pretty, typeMap=typeMap,
                                        **hook.serializer_args)
         if error:
@@ -276,7 +290,10 @@ def handler(prefix, path):
         try:
             data = serializer(result)
             serializer.set_headers(responseUtil)
-            return responseUtil.make_response(data)
+            response = responseUtil.make_response(data)
+            if error is None and etag is not None and isinstance(response, current_app.response_class):
+                add_validators(response, etag, ts)
+            return response
         except:
             logger.exception('Serialization error in request %s?%s', path, query)
             raise
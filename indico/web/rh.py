@@ -41,6 +41,7 @@ from indico.legacy.common import fossilize
 from indico.util.i18n import _
 from indico.util.locators import get_locator
 from indico.util.signals import values_from_signal
+from indico.web.flask.profiler import sample_stacks, should_sample
 from indico.web.flask.util import ResponseUtil, url_for
 
 
@@ -250,6 +251,9 @@ class RH(object):
             profile_path = os.path.join(config.TEMP_DIR, '{}-{}.prof'.format(type(self).__name__, time.time()))
             cProfile.runctx('result[0] = self._process()', globals(), locals(), profile_path)
             rv = result[0]
+        elif should_sample(request.endpoint):
+            with sample_stacks(type(self).__name__):
+                rv = self._process()
         else:
             rv = self._process()
 